@@ -1,5 +1,8 @@
 from typing import Optional, NoReturn
 from enum import IntEnum, unique
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from queue import Full, Queue
+import atexit
 import logging
 
 
@@ -64,7 +67,12 @@ def add_logging_level(level_name: str, level_num: int, method_name: str = None)
 
 
 def add_custom_levels() -> None:
-    """Adds any missing log levels from LogLvl as values and functions to the logging module."""
+    """
+    Adds any missing log levels from LogLvl as values and functions to the logging module.
+
+    This is done when this module is imported, so ``logging.verbose`` and ``logging.sparse``
+    can be used as soon as any of the utilities are.
+    """
     for lvl in LogLvl:
         try:
             add_logging_level(lvl.name.upper(), lvl, lvl.name.lower())
@@ -72,12 +80,93 @@ def add_custom_levels() -> None:
             pass
 
 
-def set_log_level(lvl: LogLvl, filename: Optional[str] = None, filemode: Optional[str] = 'a') -> None:
+class DroppingQueueHandler(QueueHandler):
+    """
+    A ``QueueHandler`` for a bounded queue, which either drops records or waits when it's full.
+
+    The number of records dropped is tracked in ``dropped``.
+    """
+
+    def __init__(self, log_queue: Queue, block: bool = False):
+        """
+        :param log_queue: The queue to place records into.
+        :param block: Whether to wait for space in a full queue, rather than dropping the record.
+        """
+        super().__init__(log_queue)
+        self.block = block
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.block:
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.dropped += 1
+
+
+class _BlockingQueueListener(QueueListener):
+    """A ``QueueListener`` which waits for space in a full queue to stop, rather than raising ``Full``."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+# The listener writing queued records, and the handler feeding it, if a queue is in use.
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[DroppingQueueHandler] = None
+
+
+def stop_log_queue() -> None:
+    """
+    Stops the background logging thread, if there is one, after it writes any queued records.
+
+    The root logger then writes to the thread's handlers directly, so anything logged
+    afterwards is still written. This is called automatically when the interpreter exits.
+    """
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+
+    _listener.stop()
+    if _queue_handler.dropped:
+        record = logging.makeLogRecord({'msg': f'{_queue_handler.dropped} log records were dropped.',
+                                        'levelno': logging.WARNING, 'levelname': 'WARNING'})
+        for handler in _listener.handlers:
+            handler.handle(record)
+
+    root = logging.getLogger()
+    if _queue_handler in root.handlers:
+        root.removeHandler(_queue_handler)
+        for handler in _listener.handlers:
+            root.addHandler(handler)
+    else:
+        # The logging was configured elsewhere since, so nothing writes to the handlers any more.
+        for handler in _listener.handlers:
+            handler.close()
+    _queue_handler.close()
+    _listener = _queue_handler = None
+
+
+atexit.register(stop_log_queue)
+
+
+def set_log_level(lvl: LogLvl, filename: Optional[str] = None, filemode: Optional[str] = 'a',
+                  use_queue: bool = False, queue_size: int = 10000, block: bool = False,
+                  max_bytes: int = 0, backup_count: int = 0, when: Optional[str] = None) -> None:
     """
     Sets the log level, and formats the logging messages and timestamps.
 
     Can be optionally provided with a filename and filemode to output the logging to
-    a file.
+    a file. The file can be rotated once it reaches ``max_bytes``, or on the interval
+    given by ``when`` (see ``logging.handlers.TimedRotatingFileHandler``), keeping
+    ``backup_count`` old files.
+
+    If ``use_queue`` is True, logging calls only place the records in a queue, and a
+    background thread formats and writes them, so callers never wait on the terminal or
+    disk. When the queue is full, records are dropped (and counted) unless ``block`` is
+    True. Any queued records are written when the interpreter exits.
 
     The format of the logging messages will look similar to::
 
@@ -86,14 +175,43 @@ def set_log_level(lvl: LogLvl, filename: Optional[str] = None, filemode: Optiona
     :param lvl: The level to log at.
     :param filename: The filename to output the log to. Uses ``stdout`` if None.
     :param filemode: The filemode to use with the file. Default is 'a', for append.
+    :param use_queue: Whether to write the log from a background thread.
+    :param queue_size: The maximum number of records the queue can hold.
+    :param block: Whether to wait for space in a full queue, rather than dropping records.
+    :param max_bytes: The size (in bytes) to rotate the file at. Never rotates by size if 0.
+    :param backup_count: The number of rotated files to keep.
+    :param when: The interval to rotate the file at (eg. 'midnight'). Never rotates by time if None.
     """
     # noinspection SpellCheckingInspection
     fmt = '[%(asctime)s] %(levelname)-8s: %(message)s'
     date_format = '%Y/%m/%d %H:%M:%S'
-    logging.basicConfig(level=lvl, filename=filename, filemode=filemode, format=fmt, datefmt=date_format, force=True)
-
 
-def auto_log(lvl: LogLvl = LogLvl.SPARSE) -> None:
+    if filename is None:
+        handler = logging.StreamHandler()
+    elif when is not None:
+        handler = TimedRotatingFileHandler(filename, when=when, backupCount=backup_count, encoding='utf-8')
+    elif max_bytes:
+        handler = RotatingFileHandler(filename, filemode, maxBytes=max_bytes, backupCount=backup_count,
+                                      encoding='utf-8')
+    else:
+        handler = logging.FileHandler(filename, filemode)
+    handler.setFormatter(logging.Formatter(fmt, date_format))
+
+    stop_log_queue()
+    if use_queue:
+        global _listener, _queue_handler
+        log_queue = Queue(maxsize=queue_size)
+        _queue_handler = DroppingQueueHandler(log_queue, block)
+        # Only merge the message with its arguments here, leaving the rest of the formatting to the listener.
+        _queue_handler.setFormatter(logging.Formatter('%(message)s'))
+        _listener = _BlockingQueueListener(log_queue, handler)
+        _listener.start()
+        handler = _queue_handler
+
+    logging.basicConfig(level=lvl, handlers=[handler], force=True)
+
+
+def auto_log(lvl: LogLvl = LogLvl.SPARSE, use_queue: bool = False) -> None:
     """
     Adds the custom levels to the logging, and sets the log level and style.
 
@@ -103,9 +221,9 @@ def auto_log(lvl: LogLvl = LogLvl.SPARSE) -> None:
     [2023/03/19 04:20:48] SPARSE  : "Message!"
 
     :param lvl: The log level to use.
+    :param use_queue: Whether to write the log from a background thread. See ``set_log_level``.
     """
-    add_custom_levels()
-    set_log_level(lvl)
+    set_log_level(lvl, use_queue=use_queue)
 
 
 # When this module is loaded, automatically add in the custom levels of logging.
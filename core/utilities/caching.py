@@ -0,0 +1,473 @@
+from typing import Any, Callable, Hashable, Iterator, NamedTuple, Optional
+from weakref import ref
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from hashlib import sha256
+from os import path
+from threading import RLock
+from time import monotonic, time
+import pickle
+
+from core.utilities.auto_logging import LogLvl, logging
+
+# The pickle protocol used to hash keys and store values on disk. Fixed, so that hashes are
+#  stable between Python versions.
+PICKLE_PROTOCOL = 4
+
+
+class _KwargsMark:
+    """Separates the positional arguments from the keyword arguments in a cache key."""
+
+    def __reduce__(self):
+        # Pickle as a reference to the module-level instance, so hashed keys are stable.
+        return '_KWARGS_MARK_OBJ'
+
+    def __repr__(self):
+        return '<kwargs>'
+
+
+# Ensures ``f(1, 'a', 2)`` and ``f(1, a=2)`` can never produce the same key.
+_KWARGS_MARK_OBJ = _KwargsMark()
+_KWARGS_MARK = (_KWARGS_MARK_OBJ,)
+
+
+class _SetMark:
+    """Marks the sorted members of a set, when hashing a key."""
+
+    def __reduce__(self):
+        # Pickle as a reference to the module-level instance, so hashed keys are stable.
+        return '_SET_MARK_OBJ'
+
+    def __repr__(self):
+        return '<set>'
+
+
+# Ensures a set can never produce the same hashed key as a tuple of its members.
+_SET_MARK_OBJ = _SetMark()
+
+
+def _canonical_key(key: Hashable) -> Hashable:
+    """
+    Replaces any sets in a key with their pickled members, sorted.
+
+    The order of a set's members, and so its pickle, depends on the hashes of the members,
+    which for strings change between processes. Sorting the pickled members gives the same
+    order in every process, whether or not the members themselves can be ordered. Only sets
+    in (nested) tuples are replaced, which covers the keys ``make_key`` creates.
+
+    :param key: The key to make canonical.
+    :return: The key, with any sets replaced.
+    """
+    if type(key) is tuple:
+        return tuple(map(_canonical_key, key))
+    if type(key) in (set, frozenset):
+        return (_SET_MARK_OBJ,) + tuple(sorted(pickle.dumps(_canonical_key(member), protocol=PICKLE_PROTOCOL)
+                                               for member in key))
+    return key
+
+
+class CacheInfo(NamedTuple):
+    """A snapshot of the statistics of a cache."""
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    max_size: Optional[int]
+
+
+def make_key(args: tuple, kwargs: dict[str, Any]) -> Hashable:
+    """
+    Creates a hashable cache key from the arguments of a function call.
+
+    Calls without keyword arguments use the positional arguments as-is, so existing
+    caches keyed on ``args`` remain valid. Keyword arguments are sorted by name, so
+    their order in the call doesn't matter.
+
+    :param args: The positional arguments of the call.
+    :param kwargs: The keyword arguments of the call.
+    :return: A hashable key representing the call.
+    """
+    if not kwargs:
+        return args
+    return args + _KWARGS_MARK + tuple(sorted(kwargs.items()))
+
+
+class LRUCache(MutableMapping):
+    """
+    A thread-safe, dict-like cache with an optional capacity and time-to-live.
+
+    When ``max_size`` is set, adding an entry to a full cache evicts the least recently
+    used entry. When ``ttl`` is set, entries older than ``ttl`` seconds are treated as
+    missing, and are evicted when they are next accessed.
+
+    The number of entries evicted is tracked in ``evictions``. ``len()`` may include
+    expired entries which have not yet been accessed.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = monotonic):
+        """
+        Creates an empty cache.
+
+        :param max_size: The maximum number of entries to hold. Unbounded if None.
+        :param ttl: The number of seconds an entry is valid for. Entries never expire if None.
+        :param clock: The function to get the current time from. Default is `time.monotonic`.
+        :raises ValueError: Raised if ``max_size`` or ``ttl`` are not positive.
+        """
+        if max_size is not None and max_size <= 0:
+            raise ValueError("max_size must be positive!")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive!")
+
+        self.max_size = max_size
+        self.ttl = ttl
+        self.evictions = 0
+        self._clock = clock
+        self._data: OrderedDict[Hashable, tuple[Any, Optional[float]]] = OrderedDict()
+        self._lock = RLock()
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            value, expires_at = self._data[key]
+            if expires_at is not None and expires_at <= self._clock():
+                del self._data[key]
+                self.evictions += 1
+                raise KeyError(key)
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        expires_at = None if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            if self.max_size is not None:
+                while len(self._data) > self.max_size:
+                    self._data.popitem(last=False)
+                    self.evictions += 1
+
+    def __delitem__(self, key: Hashable) -> None:
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key: Hashable) -> bool:
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[Hashable]:
+        with self._lock:
+            return iter(list(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(max_size={self.max_size}, ttl={self.ttl}, size={len(self)})"
+
+    def clear(self) -> None:
+        """Removes all entries from the cache. Does not reset ``evictions``."""
+        with self._lock:
+            self._data.clear()
+
+
+class InstanceTable:
+    """
+    A side table of cached values for objects, which is removed once the object is garbage collected.
+
+    Objects are tracked by identity through a weak reference, so they don't need to be
+    hashable, or to have a ``__dict__``; classes using ``__slots__`` only need to include
+    ``__weakref__`` in them.
+    """
+
+    def __init__(self):
+        self._data: dict[int, tuple[ref, dict[Hashable, Any]]] = dict()
+
+    def _remove(self, obj_ref: ref, obj_id: int) -> None:
+        """Removes an object's values once it's collected, unless its id has already been reused."""
+        entry = self._data.get(obj_id)
+        if entry is not None and entry[0] is obj_ref:
+            del self._data[obj_id]
+
+    def get(self, obj: Any, create: bool = True) -> Optional[dict[Hashable, Any]]:
+        """
+        Gets the dict of values cached for an object.
+
+        :param obj: The object to get the values of.
+        :param create: Whether to create the dict, if the object doesn't have one yet.
+        :return: The values of the object, or None if it has none and ``create`` is False.
+        :raises TypeError: Raised if a dict needs to be created and the object can't be weakly referenced.
+        """
+        obj_id = id(obj)
+        entry = self._data.get(obj_id)
+        if entry is not None and entry[0]() is obj:
+            return entry[1]
+        if not create:
+            return None
+
+        try:
+            obj_ref = ref(obj, lambda dead_ref: self._remove(dead_ref, obj_id))
+        except TypeError:
+            raise TypeError(f"Can't cache values for {type(obj).__name__} objects, as they can't be "
+                            f"weakly referenced. Add '__weakref__' to its __slots__.") from None
+        values = dict()
+        self._data[obj_id] = (obj_ref, values)
+        return values
+
+    def discard(self, obj: Any) -> None:
+        """Removes the values cached for an object, if it has any."""
+        entry = self._data.get(id(obj))
+        if entry is not None and entry[0]() is obj:
+            del self._data[id(obj)]
+
+    def items(self) -> Iterator[tuple[Any, dict[Hashable, Any]]]:
+        """Yields each object which is still alive, with its values."""
+        for obj_ref, values in list(self._data.values()):
+            obj = obj_ref()
+            if obj is not None:
+                yield obj, values
+
+    def clear(self) -> None:
+        """Removes the values of every object."""
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class WeakKeyCache(MutableMapping):
+    """
+    A cache for ``memoize``, which doesn't keep the first argument of a call alive.
+
+    Results are stored in an ``InstanceTable`` against the first argument of the call
+    (usually ``self``), so they're removed once that object is garbage collected. Calls
+    whose first argument can't be weakly referenced (eg. ints and strings) are cached
+    normally, with strong references.
+    """
+
+    def __init__(self):
+        self.evictions = 0
+        self._table = InstanceTable()
+        self._strong: dict[Hashable, Any] = dict()
+        self._strong_types: set[type] = set()
+
+    def _values(self, key: tuple, create: bool) -> tuple[Optional[dict[Hashable, Any]], Hashable]:
+        """Gets the dict a key's result is stored in, and the key of the result within it."""
+        if not key or type(key[0]) in self._strong_types:
+            return self._strong, key
+        try:
+            return self._table.get(key[0], create), key[1:]
+        except TypeError:
+            self._strong_types.add(type(key[0]))
+            return self._strong, key
+
+    def __getitem__(self, key: tuple) -> Any:
+        values, sub_key = self._values(key, False)
+        if values is None:
+            raise KeyError(key)
+        return values[sub_key]
+
+    def __setitem__(self, key: tuple, value: Any) -> None:
+        values, sub_key = self._values(key, True)
+        values[sub_key] = value
+
+    def __delitem__(self, key: tuple) -> None:
+        values, sub_key = self._values(key, False)
+        if values is None:
+            raise KeyError(key)
+        del values[sub_key]
+
+    def __iter__(self) -> Iterator[Hashable]:
+        for obj, values in self._table.items():
+            for sub_key in list(values):
+                yield (obj,) + sub_key
+        yield from list(self._strong)
+
+    def __len__(self) -> int:
+        return sum(len(values) for _, values in self._table.items()) + len(self._strong)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(objects={len(self._table)}, size={len(self)})"
+
+    def clear(self) -> None:
+        """Removes all entries from the cache."""
+        self._table.clear()
+        self._strong.clear()
+
+
+class SQLiteCache:
+    """
+    A persistent cache backend, which stores pickled results in a SQLite database.
+
+    Entries are grouped by a namespace (usually the qualified name of a function) and
+    keyed by a hash of the pickled key, so results survive process restarts. Entries
+    written with a different ``version`` are discarded, which allows invalidating the
+    whole cache when the cached functions change. When ``max_entries`` is set, the least
+    recently used entries are removed once the cache grows past it. To keep reads from
+    writing to the database, when an entry was last used is only tracked to within
+    ``access_resolution`` seconds.
+
+    The database can be safely shared between threads and processes.
+    """
+
+    def __init__(self, folder: str, filename: str = 'memoize.sqlite3', version: Hashable = 1,
+                 max_entries: Optional[int] = None, access_resolution: float = 60.0):
+        """
+        Opens, or creates, the database for the cache.
+
+        :param folder: The folder the database is in.
+        :param filename: The name of the database file (including filetype).
+        :param version: The version of the cached data. Entries of any other version are removed.
+        :param max_entries: The maximum number of entries to keep. Unbounded if None.
+        :param access_resolution: The number of seconds before reading an entry updates when it was last used.
+        :raises ValueError: Raised if ``max_entries`` is not positive, or ``access_resolution`` is negative.
+        """
+        if max_entries is not None and max_entries <= 0:
+            raise ValueError("max_entries must be positive!")
+        if access_resolution < 0:
+            raise ValueError("access_resolution can't be negative!")
+
+        self.filepath = path.join(folder, filename)
+        self.version = str(version)
+        self.max_entries = max_entries
+        self.access_resolution = access_resolution
+        self._lock = RLock()
+        # Imported here, so only the processes using a persistent cache pay for importing it.
+        import sqlite3
+        self._conn = sqlite3.connect(self.filepath, timeout=30, check_same_thread=False, isolation_level=None)
+        with self._lock:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, version TEXT NOT NULL, '
+                'value BLOB NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (namespace, key))'
+            )
+            self._conn.execute('CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+            self._conn.execute('DELETE FROM cache WHERE version != ?', (self.version,))
+        logging.log(LogLvl.VERBOSE, f'Cache {filename} opened with {len(self)} entries.')
+
+    @staticmethod
+    def hash_key(key: Hashable) -> str:
+        """
+        Gets a stable hash for a key, which is the same between processes.
+
+        Sets in the key are hashed by their sorted members, rather than their pickle, as
+        the order of their members changes between processes (see ``_canonical_key``).
+
+        :param key: The key to hash. Must be picklable.
+        :return: The hex digest of the key.
+        """
+        return sha256(pickle.dumps(_canonical_key(key), protocol=PICKLE_PROTOCOL)).hexdigest()
+
+    def get(self, namespace: str, key: Hashable, default: Any = None) -> Any:
+        """
+        Gets a value from the cache.
+
+        :param namespace: The namespace the key is in.
+        :param key: The key to get the value of.
+        :param default: The value to return if the key is not in the cache, or can't be pickled.
+        :return: The cached value, or the default.
+        """
+        try:
+            hashed = self.hash_key(key)
+        except Exception:
+            # A key which can't be pickled can't have been stored.
+            return default
+        return self.get_hashed(namespace, hashed, default)
+
+    def get_hashed(self, namespace: str, hashed: str, default: Any = None) -> Any:
+        """
+        Gets a value from the cache, by a key already hashed with ``hash_key``.
+
+        :param namespace: The namespace the key is in.
+        :param hashed: The hash of the key to get the value of.
+        :param default: The value to return if the key is not in the cache.
+        :return: The cached value, or the default.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, accessed FROM cache WHERE namespace = ? AND key = ? AND version = ?',
+                (namespace, hashed, self.version)
+            ).fetchone()
+            if row is None:
+                return default
+            now = time()
+            if now - row[1] >= self.access_resolution:
+                self._conn.execute('UPDATE cache SET accessed = ? WHERE namespace = ? AND key = ?',
+                                   (now, namespace, hashed))
+
+        try:
+            return pickle.loads(row[0])
+        except Exception as ex:
+            logging.error(f'Error reading cached value from {self.filepath}')
+            logging.error(ex)
+            return default
+
+    def set(self, namespace: str, key: Hashable, value: Any) -> bool:
+        """
+        Stores a value in the cache, evicting the least recently used entries if needed.
+
+        :param namespace: The namespace the key is in.
+        :param key: The key to store the value under.
+        :param value: The value to store. Must be picklable.
+        :return: Whether the value was stored.
+        """
+        try:
+            hashed = self.hash_key(key)
+        except Exception as ex:
+            logging.error(f'Error pickling key to cache in {self.filepath}')
+            logging.error(ex)
+            return False
+        return self.set_hashed(namespace, hashed, value)
+
+    def set_hashed(self, namespace: str, hashed: str, value: Any) -> bool:
+        """
+        Stores a value in the cache, by a key already hashed with ``hash_key``.
+
+        :param namespace: The namespace the key is in.
+        :param hashed: The hash of the key to store the value under.
+        :param value: The value to store. Must be picklable.
+        :return: Whether the value was stored.
+        """
+        try:
+            blob = pickle.dumps(value, protocol=PICKLE_PROTOCOL)
+        except Exception as ex:
+            logging.error(f'Error pickling value to cache in {self.filepath}')
+            logging.error(ex)
+            return False
+
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                               (namespace, hashed, self.version, blob, time()))
+            if self.max_entries is not None:
+                self._conn.execute(
+                    'DELETE FROM cache WHERE rowid IN '
+                    '(SELECT rowid FROM cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+        return True
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """
+        Removes entries from the cache.
+
+        :param namespace: The namespace to remove the entries of. Removes all entries if None.
+        """
+        with self._lock:
+            if namespace is None:
+                self._conn.execute('DELETE FROM cache')
+            else:
+                self._conn.execute('DELETE FROM cache WHERE namespace = ?', (namespace,))
+
+    def close(self) -> None:
+        """Closes the connection to the database."""
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.filepath!r}, version={self.version!r}, max_entries={self.max_entries})"
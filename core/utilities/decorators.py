@@ -1,94 +1,899 @@
-from typing import Callable, Hashable, Any
-from functools import wraps
+from typing import TYPE_CHECKING, Callable, Hashable, Any, Iterable, Iterator, Optional, Union
+from collections import deque
+from collections.abc import MutableMapping
+from concurrent.futures import Future
+from datetime import datetime
+from functools import partial, wraps
+from itertools import count, islice
+from math import ceil
+from os import cpu_count, listdir, makedirs, path, remove
 import logging
-from time import sleep, time
-from unittest import TestLoader
+import reprlib
+from random import random, uniform
+from threading import Lock, RLock
+from time import monotonic, perf_counter_ns, sleep
 
+from core.utilities.auto_logging import LogLvl
+from core.utilities.caching import CacheInfo, InstanceTable, LRUCache, SQLiteCache, WeakKeyCache, make_key
 from core.utilities.funcs import format_seconds
+from core.utilities.timing import TimingRegistry
+
+# Modules only some of the decorators need are imported when first used, to keep this module quick to import.
+if TYPE_CHECKING:
+    import asyncio
+    import cProfile
+    import tracemalloc
+
+# Marks a cache miss, as ``None`` is a valid result to cache.
+_MISSING = object()
+# Shared with the callers waiting on a coalesced call, when the caller computing it is cancelled.
+_LEADER_CANCELLED = object()
+
+# Keeps the summaries of arguments logged by ``log_execution`` short.
+_ARG_REPR = reprlib.Repr()
+_ARG_REPR.maxstring = _ARG_REPR.maxother = 40
+
+# Only one call is profiled at a time, as profilers and ``tracemalloc`` are not re-entrant.
+_PROFILE_LOCK = Lock()
+
+# The number of seconds ``parallel_map`` aims for each chunk to take, when sizing chunks. Long
+#  enough to outweigh sending the chunk to a worker, short enough to share the work out evenly.
+PARALLEL_CHUNK_SECONDS = 0.05
+PARALLEL_MAX_CHUNK_SIZE = 4096
+
+# The flag ``inspect`` uses to mark the code of coroutine functions.
+_CO_COROUTINE = 0x80
+
+# Names moved to other modules, which are still importable from here. See ``__getattr__``.
+_MOVED = {'custom_order_tests': 'core.utilities.testing'}
+
+
+def __getattr__(name: str) -> Any:
+    """Imports the names moved out of this module on first use, so their dependencies aren't loaded up front."""
+    if name in _MOVED:
+        from importlib import import_module
+        return getattr(import_module(_MOVED[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _is_coroutine_function(func: Callable) -> bool:
+    """Checks if a function is a coroutine function, as ``inspect.iscoroutinefunction`` does."""
+    while isinstance(func, partial):
+        func = func.func
+    func = getattr(func, '__func__', func)
+    code = getattr(func, '__code__', None)
+    return code is not None and bool(code.co_flags & _CO_COROUTINE)
+
+
+class RetryBudget:
+    """
+    Limits the rate of retries across every function which shares it.
+
+    Each call to a decorated function deposits ``ratio`` tokens, and the budget also
+    refills at ``min_per_second`` tokens per second, so a trickle of retries is always
+    allowed. Each retry withdraws one token. When the budget is empty, failed calls are
+    not retried, so an outage can't multiply the load on a struggling service.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 1.0, max_tokens: float = 10.0,
+                 clock: Callable[[], float] = monotonic):
+        """
+        Creates a full retry budget.
+
+        :param ratio: The number of retries allowed per call made.
+        :param min_per_second: The number of retries allowed per second, regardless of calls made.
+        :param max_tokens: The maximum number of retries which can be saved up.
+        :param clock: The function to get the current time from. Default is `time.monotonic`.
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.spent = 0
+        self.denied = 0
+        self._clock = clock
+        self._last = clock()
+        self._lock = Lock()
+
+    def _refill(self, amount: float) -> None:
+        now = self._clock()
+        amount += (now - self._last) * self.min_per_second
+        self._last = now
+        self.tokens = min(self.max_tokens, self.tokens + amount)
+
+    def record_call(self) -> None:
+        """Deposits tokens for a call being made."""
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_spend(self) -> bool:
+        """
+        Withdraws a token for a retry, if one is available.
+
+        :return: Whether the retry is allowed.
+        """
+        with self._lock:
+            self._refill(0)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.spent += 1
+                return True
+            self.denied += 1
+            return False
 
 
 # Adapted/Taken from https://towardsdatascience.com/python-decorators-for-data-science-6913f717669a
-def retry(max_tries: int, fail_delay: float):
+def retry(max_tries: int, fail_delay: float, backoff: float = 1.0, max_delay: Optional[float] = None,
+          jitter: float = 0.0, exceptions: tuple[type[Exception], ...] = (Exception,),
+          deadline: Optional[float] = None, budget: Optional[RetryBudget] = None):
     """
     A decorator which attempts to rerun a function if it fails, with a delay between each try.
 
+    The delay after the nth failure is ``fail_delay * backoff ** (n - 1)``, capped at
+    ``max_delay``. ``jitter`` randomly shortens each delay by up to that fraction, to keep
+    many callers from retrying in lockstep.
+
+    A call is not retried, and the exception is raised, if the exception is not one of
+    ``exceptions``, if the next try would start after ``deadline`` seconds since the first,
+    or if ``budget`` has no retries left.
+
+    Coroutine functions are supported, and wait between tries with ``asyncio.sleep``, so
+    the event loop isn't blocked.
+
     :param max_tries: The max number of times the function should be run.
     :param fail_delay: The delay (in seconds) between runs.
+    :param backoff: The multiplier applied to the delay after each failure. Default is 1, a fixed delay.
+    :param max_delay: The maximum delay (in seconds) between runs. Uncapped if None.
+    :param jitter: The fraction, between 0 and 1, each delay can be randomly reduced by.
+    :param exceptions: The exception types which should be retried.
+    :param deadline: The total time (in seconds) the call, including retries, may take. Unlimited if None.
+    :param budget: A budget, shared between functions, which limits the rate of retries.
     :return: Returns the parameterized decorator.
     """
     def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            tries = 0
-            while tries < max_tries:
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    tries += 1
-                    if tries == max_tries:
-                        raise e
-                    sleep(fail_delay)
+        def next_delay(tries: int, start: float) -> Optional[float]:
+            """Gets the delay before the next try, or None if the call shouldn't be retried."""
+            if tries >= max_tries:
+                return None
+
+            delay = fail_delay * backoff ** (tries - 1)
+            if max_delay is not None:
+                delay = min(delay, max_delay)
+            if jitter:
+                delay *= uniform(1 - jitter, 1)
+
+            if deadline is not None and monotonic() + delay - start >= deadline:
+                return None
+            if budget is not None and not budget.try_spend():
+                logging.debug(f"Retry budget exhausted, not retrying {func.__name__}.")
+                return None
+            return delay
+
+        if _is_coroutine_function(func):
+            import asyncio
+
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                if budget is not None:
+                    budget.record_call()
+                start = monotonic()
+                tries = 0
+                while True:
+                    try:
+                        return await func(*args, **kwargs)
+                    except exceptions:
+                        tries += 1
+                        delay = next_delay(tries, start)
+                        if delay is None:
+                            raise
+                    await asyncio.sleep(delay)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if budget is not None:
+                    budget.record_call()
+                start = monotonic()
+                tries = 0
+                while True:
+                    try:
+                        return func(*args, **kwargs)
+                    except exceptions:
+                        tries += 1
+                        delay = next_delay(tries, start)
+                        if delay is None:
+                            raise
+                    sleep(delay)
+        return wrapper
+    return decorator
+
+
+class TokenBucket:
+    """
+    A token bucket, which limits calls to a steady ``rate`` per second, with bursts of up to ``capacity``.
+
+    The bucket starts full, and refills at ``rate`` tokens per second. Each acquisition
+    reserves its tokens immediately, even if the bucket is empty, and then waits until
+    the bucket would have refilled enough to cover them. This spaces out callers evenly,
+    in the order they arrived, so the rate is never exceeded.
+
+    A bucket can be shared between functions and threads, and used from coroutines. How
+    long callers waited is tracked in ``acquired``, ``waits``, ``total_wait`` and ``max_wait``.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0, clock: Callable[[], float] = monotonic,
+                 sleep_func: Callable[[float], Any] = sleep, async_sleep_func: Optional[Callable[[float], Any]] = None):
+        """
+        Creates a full token bucket.
+
+        :param rate: The number of tokens added to the bucket per second.
+        :param capacity: The maximum number of tokens the bucket holds, which limits bursts.
+        :param clock: The function to get the current time from. Default is `time.monotonic`.
+        :param sleep_func: The function used to wait. Default is `time.sleep`.
+        :param async_sleep_func: The coroutine function used to wait in coroutines. Uses `asyncio.sleep` if None.
+        :raises ValueError: Raised if ``rate`` or ``capacity`` are not positive.
+        """
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive!")
+
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.acquired = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._clock = clock
+        self._sleep = sleep_func
+        self._async_sleep = async_sleep_func
+        self._last = clock()
+        self._lock = Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Takes tokens from the bucket, and returns how long to wait until they're available."""
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket with capacity {self.capacity}!")
+
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            self.tokens -= tokens
+
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.acquired += 1
+            if wait:
+                self.waits += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            return wait
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """
+        Takes tokens from the bucket, only if they're available now.
+
+        :param tokens: The number of tokens to take.
+        :return: Whether the tokens were taken.
+        """
+        with self._lock:
+            now = self._clock()
+            self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self.tokens < tokens:
+                return False
+            self.tokens -= tokens
+            self.acquired += 1
+            return True
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Takes tokens from the bucket, waiting until they're available.
+
+        :param tokens: The number of tokens to take.
+        :return: The time (in seconds) spent waiting.
+        """
+        wait = self._reserve(tokens)
+        if wait:
+            self._sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """
+        Takes tokens from the bucket, waiting until they're available without blocking the event loop.
+
+        :param tokens: The number of tokens to take.
+        :return: The time (in seconds) spent waiting.
+        """
+        wait = self._reserve(tokens)
+        if wait:
+            if self._async_sleep is None:
+                import asyncio
+                self._async_sleep = asyncio.sleep
+            await self._async_sleep(wait)
+        return wait
+
+    @property
+    def mean_wait(self) -> float:
+        """The mean time (in seconds) callers have waited."""
+        return self.total_wait / self.acquired if self.acquired else 0.0
+
+
+def rate_limit(bucket: TokenBucket, tokens: float = 1.0):
+    """
+    A decorator which waits for tokens from a shared bucket before each call of a function.
+
+    Coroutine functions are supported, and wait without blocking the event loop.
+
+    Example Usage::
+
+        scryfall_limit = TokenBucket(rate=10, capacity=10)
+
+        @rate_limit(scryfall_limit)
+        def get_card(name: str) -> dict:
+            ...
+
+    :param bucket: The bucket to take tokens from. Can be shared between functions.
+    :param tokens: The number of tokens each call takes.
+    :return: Returns the parameterized decorator.
+    """
+    def decorator(func: Callable):
+        if _is_coroutine_function(func):
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                await bucket.acquire_async(tokens)
+                return await func(*args, **kwargs)
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                bucket.acquire(tokens)
+                return func(*args, **kwargs)
+        wrapper.bucket = bucket
         return wrapper
     return decorator
 
 
 # Adapted/Taken from https://towardsdatascience.com/python-decorators-for-data-science-6913f717669a
-def memoize(cache_obj: dict[Hashable, Any] = None):
+def memoize(cache_obj: MutableMapping[Hashable, Any] = None, max_size: Optional[int] = None,
+            ttl: Optional[float] = None, backend: Optional[SQLiteCache] = None, coalesce: bool = False,
+            weak: bool = False):
     """
     A decorator which automatically caches the results of a function call.
 
-    :param cache_obj: The cache to place results into.
+    Results are keyed on both the positional and keyword arguments of the call. Providing
+    ``max_size`` or ``ttl`` creates an ``LRUCache`` which evicts the least recently used
+    entries once full, and treats entries older than ``ttl`` seconds as missing.
+
+    The decorated function is safe to call from multiple threads, and exposes
+    ``cache_info()`` to get the hits, misses, evictions and size of the cache, and
+    ``cache_clear()`` to empty the cache and reset those statistics.
+
+    Providing a ``backend`` persists results between processes. Results missing from
+    ``cache_obj`` are looked up in the backend under the qualified name of the function,
+    before the function is called. Clearing the cache does not clear the backend.
+
+    Setting ``coalesce`` ensures only one caller computes the result for a given key at
+    a time. Any other callers which miss the cache while it's being computed wait for,
+    and share, that result; they're counted as hits. If the call fails, the exception is
+    raised to every waiting caller, and nothing is cached. If a coroutine computing the
+    result is cancelled, one of the waiting callers computes it instead. Coroutines only
+    wait for calls made on the same event loop.
+
+    Setting ``weak`` stores results in a ``WeakKeyCache``, so they're removed once the first
+    argument of their call (eg. ``self``, when decorating a method) is garbage collected,
+    rather than keeping it alive. See ``cached_method`` to cache methods per instance.
+
+    Calls with unhashable arguments can't be cached, so are passed straight through to
+    the function, and counted as misses.
+
+    Coroutine functions are supported, and have their awaited results cached.
+
+    :param cache_obj: The cache to place results into. Cannot be used with ``max_size`` or ``ttl``.
+    :param max_size: The maximum number of results to cache. Unbounded if None.
+    :param ttl: The number of seconds a result remains cached for. Never expires if None.
+    :param backend: A persistent cache to check after ``cache_obj``, and to store results into.
+    :param coalesce: Whether concurrent calls with the same arguments should share a single call.
+    :param weak: Whether to drop results once the first argument of their call is garbage collected.
     :return: Returns the parameterized decorator.
+    :raises ValueError: Raised if ``cache_obj``, ``max_size`` or ``ttl`` are provided alongside each other,
+        or alongside ``weak``.
     """
-    if cache_obj is None:
-        cache_obj = dict()
+    if weak:
+        if cache_obj is not None or max_size is not None or ttl is not None:
+            raise ValueError("weak cannot be used with cache_obj, max_size or ttl!")
+        cache_obj = WeakKeyCache()
+    elif cache_obj is None:
+        if max_size is None and ttl is None:
+            cache_obj = dict()
+        else:
+            cache_obj = LRUCache(max_size, ttl)
+    elif max_size is not None or ttl is not None:
+        raise ValueError("max_size and ttl cannot be used with a provided cache_obj!")
 
     def decorator(func: Callable):
-        @wraps(func)
-        def wrapper(*args):
-            if args not in cache_obj:
-                result = func(*args)
-                cache_obj[args] = result
-            return cache_obj[args]
+        lock = RLock()
+        stats = {'hits': 0, 'misses': 0}
+        # Evictions are tracked by the cache, so offset them to support resetting the stats.
+        evictions_offset = getattr(cache_obj, 'evictions', 0)
+        namespace = f'{func.__module__}.{func.__qualname__}'
+        is_async = _is_coroutine_function(func)
+        if is_async:
+            import asyncio
+
+        # Keyed by the call's key, or by the event loop and key for coroutines, as futures belong to a loop.
+        in_flight: dict[Hashable, Union[Future, 'asyncio.Future']] = dict()
+
+        def backend_key(key: Hashable) -> Optional[str]:
+            """Gets the hash of a key in the backend, or None if the key can't be pickled."""
+            try:
+                return backend.hash_key(key)
+            except Exception:
+                # Arguments which can't be pickled (eg. lambdas) are only cached in memory.
+                return None
+
+        def lookup(key: Hashable) -> Any:
+            """Gets a result from the cache or the backend, returning ``_MISSING`` if neither has it."""
+            with lock:
+                result = cache_obj.get(key, _MISSING)
+                if result is not _MISSING:
+                    stats['hits'] += 1
+                    return result
+
+            hashed = backend_key(key) if backend is not None else None
+            if hashed is not None:
+                result = backend.get_hashed(namespace, hashed, _MISSING)
+                if result is not _MISSING:
+                    with lock:
+                        stats['hits'] += 1
+                        cache_obj[key] = result
+            return result
+
+        def store(key: Hashable, result: Any) -> None:
+            """Places a result into the cache and the backend."""
+            with lock:
+                cache_obj[key] = result
+            hashed = backend_key(key) if backend is not None else None
+            if hashed is not None:
+                backend.set_hashed(namespace, hashed, result)
+
+        def join_or_lead(key: Hashable, flight_key: Hashable,
+                         new_future: Callable[[], Union[Future, 'asyncio.Future']]):
+            """
+            Gets the in-flight call for a key, or registers the caller as the one computing it.
+
+            :param key: The key of the call, in the cache.
+            :param flight_key: The key of the call, in ``in_flight``.
+            :param new_future: Creates the future for the call, if the caller leads.
+            :return: The cached result, or the future to wait on / resolve, and whether the caller leads.
+            """
+            with lock:
+                # Re-check the cache, in case a leader finished between the lookup and now.
+                result = cache_obj.get(key, _MISSING)
+                if result is not _MISSING:
+                    stats['hits'] += 1
+                    return result, False
+                future = in_flight.get(flight_key)
+                if future is not None:
+                    stats['hits'] += 1
+                    return future, False
+                future = in_flight[flight_key] = new_future()
+                stats['misses'] += 1
+                return future, True
+
+        def count_miss() -> None:
+            """Records a call which wasn't cached."""
+            with lock:
+                stats['misses'] += 1
+
+        def finish(flight_key: Hashable, future: Union[Future, 'asyncio.Future'],
+                   result: Any = None, ex: Optional[BaseException] = None) -> None:
+            """Resolves an in-flight call, sharing the result or exception with any waiters."""
+            with lock:
+                in_flight.pop(flight_key, None)
+            if ex is None:
+                future.set_result(result)
+            elif is_async and isinstance(ex, asyncio.CancelledError):
+                # Only the leader was cancelled, so the waiters retry, and one of them leads instead.
+                future.set_result(_LEADER_CANCELLED)
+            else:
+                future.set_exception(ex)
+                if is_async:
+                    # Mark the exception as retrieved, so asyncio doesn't warn when nobody is waiting.
+                    future.exception()
+
+        if is_async:
+            @wraps(func)
+            async def wrapper(*args, **kwargs):
+                key = make_key(args, kwargs)
+                try:
+                    result = lookup(key)
+                except TypeError:
+                    count_miss()
+                    return await func(*args, **kwargs)
+                if result is not _MISSING:
+                    return result
+
+                if not coalesce:
+                    count_miss()
+                    result = await func(*args, **kwargs)
+                    store(key, result)
+                    return result
+
+                loop = asyncio.get_running_loop()
+                while True:
+                    future, leader = join_or_lead(key, (loop, key), loop.create_future)
+                    if leader:
+                        break
+                    if not isinstance(future, asyncio.Future):
+                        return future
+                    result = await asyncio.shield(future)
+                    if result is not _LEADER_CANCELLED:
+                        return result
+                try:
+                    result = await func(*args, **kwargs)
+                    store(key, result)
+                except BaseException as ex:
+                    finish((loop, key), future, ex=ex)
+                    raise
+                finish((loop, key), future, result)
+                return result
+        else:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                key = make_key(args, kwargs)
+                try:
+                    result = lookup(key)
+                except TypeError:
+                    # Unhashable arguments, which can't be used as a key.
+                    count_miss()
+                    return func(*args, **kwargs)
+                if result is not _MISSING:
+                    return result
+
+                if not coalesce:
+                    count_miss()
+                    result = func(*args, **kwargs)
+                    store(key, result)
+                    return result
+
+                future, leader = join_or_lead(key, key, Future)
+                if not leader:
+                    if isinstance(future, Future):
+                        return future.result()
+                    return future
+                try:
+                    result = func(*args, **kwargs)
+                    store(key, result)
+                except BaseException as ex:
+                    finish(key, future, ex=ex)
+                    raise
+                finish(key, future, result)
+                return result
+
+        def cache_info() -> CacheInfo:
+            """Returns the statistics of the cache."""
+            with lock:
+                evictions = getattr(cache_obj, 'evictions', 0) - evictions_offset
+                return CacheInfo(stats['hits'], stats['misses'], evictions, len(cache_obj),
+                                 getattr(cache_obj, 'max_size', None))
+
+        def cache_clear() -> None:
+            """Empties the cache, and resets its statistics."""
+            nonlocal evictions_offset
+            with lock:
+                cache_obj.clear()
+                stats['hits'] = stats['misses'] = 0
+                evictions_offset = getattr(cache_obj, 'evictions', 0)
+
+        wrapper.cache = cache_obj
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
         return wrapper
     return decorator
 
 
+def cached_method(func: Callable):
+    """
+    A decorator which caches the results of a method separately for each instance.
+
+    Results are keyed on the arguments of the call (other than ``self``), and kept in an
+    ``InstanceTable``, so they're removed once the instance is garbage collected, rather
+    than keeping it alive as ``memoize`` would. This works for classes which use
+    ``__slots__``, as long as they include ``__weakref__``, and for unhashable instances.
+    Calls with unhashable arguments are passed straight through to the method.
+
+    The decorated method exposes ``cache_clear(instance=None)``, to empty the cache of an
+    instance, or of every instance.
+
+    :param func: The method to cache.
+    :return: The decorated method.
+
+    Example Usage::
+
+        class Deck:
+            __slots__ = ('cards', '__weakref__')
+
+            @decorators.cached_method
+            def count(self, color: str) -> int:
+                ...
+    """
+    table = InstanceTable()
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        values = table.get(self)
+        key = make_key(args, kwargs)
+        try:
+            result = values.get(key, _MISSING)
+        except TypeError:
+            return func(self, *args, **kwargs)
+        if result is _MISSING:
+            result = values[key] = func(self, *args, **kwargs)
+        return result
+
+    def cache_clear(instance: Any = None) -> None:
+        """Empties the cache of an instance, or of every instance if None."""
+        if instance is None:
+            table.clear()
+        else:
+            table.discard(instance)
+
+    wrapper.cache_clear = cache_clear
+    return wrapper
+
+
+class cached_property:  # noqa: N801 - Named to match ``property``.
+    """
+    A decorator which turns a method into a property, which is computed once per instance.
+
+    Unlike ``functools.cached_property``, the values are kept in an ``InstanceTable``
+    rather than the instance's ``__dict__``, so this works for classes which use
+    ``__slots__`` (as long as they include ``__weakref__``). The value can be reset with
+    ``del instance.name``, so it's recomputed on the next access.
+    """
+
+    def __init__(self, func: Callable[[Any], Any]):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+        self._table = InstanceTable()
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance: Any, owner: Optional[type] = None) -> Any:
+        if instance is None:
+            return self
+        values = self._table.get(instance)
+        result = values.get(self.name, _MISSING)
+        if result is _MISSING:
+            result = values[self.name] = self.func(instance)
+        return result
+
+    def __set__(self, instance: Any, value: Any) -> None:
+        self._table.get(instance)[self.name] = value
+
+    def __delete__(self, instance: Any) -> None:
+        values = self._table.get(instance, create=False)
+        if values is not None:
+            values.pop(self.name, None)
+
+
 # Adapted/Taken from https://towardsdatascience.com/python-decorators-for-data-science-6913f717669a
-def time_execution(log_func: Callable[[str], None] = print):
+def time_execution(log_func: Callable[[str], None] = print, registry: Optional[TimingRegistry] = None,
+                   sample_rate: float = 1.0):
     """
     A decorator which times the execution of a function.
 
+    By default, a message with the duration is passed to ``log_func`` for every call.
+    If a ``registry`` is provided (usually ``timing.TIMINGS``), the duration is instead
+    recorded into the function's histogram in it, which can be summarised or exported
+    later, and ``log_func`` is not used.
+
+    ``sample_rate`` limits the overhead on hot paths, by only timing that fraction of calls.
+
     :param log_func: The function which handles the logging messages. Default is `print`.
+    :param registry: The registry to record durations into, instead of logging them.
+    :param sample_rate: The fraction of calls, between 0 and 1, to time.
     :return: Returns the parameterized decorator.
     """
     def decorator(func: Callable):
+        name = f'{func.__module__}.{func.__qualname__}'
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time()
+            if sample_rate < 1.0 and random() >= sample_rate:
+                return func(*args, **kwargs)
+
+            start_time = perf_counter_ns()
             result = func(*args, **kwargs)
-            end_time = time()
-            time_val, time_unit = format_seconds(end_time - start_time)
-            log_func(f"Function {func.__name__} took {round(time_val, 3)} {time_unit}s.")
+            elapsed = perf_counter_ns() - start_time
+            if registry is not None:
+                registry.record(name, elapsed)
+            else:
+                time_val, time_unit = format_seconds(elapsed / 1e9)
+                log_func(f"Function {func.__name__} took {round(time_val, 3)} {time_unit}s.")
             return result
         return wrapper
     return decorator
 
 
+def _rotate_profiles(folder: str, prefix: str, keep: int) -> None:
+    """Removes the oldest profiles starting with ``prefix`` in ``folder``, so only ``keep`` remain."""
+    profiles = sorted({path.splitext(name)[0] for name in listdir(folder) if name.startswith(prefix)})
+    for stem in profiles[:-keep]:
+        for ext in ('.prof', '.txt'):
+            try:
+                remove(path.join(folder, stem + ext))
+            except FileNotFoundError:
+                pass
+
+
+def _write_profile(folder: str, prefix: str, elapsed: float, profiler: Optional['cProfile.Profile'],
+                   snapshot: Optional['tracemalloc.Snapshot'], before: Optional['tracemalloc.Snapshot'],
+                   peak: int, top: int) -> None:
+    """Writes the ``.prof`` dump and the text summary of a profiled call."""
+    import pstats
+
+    time_val, time_unit = format_seconds(elapsed)
+    stem = path.join(folder, f"{prefix}{datetime.now():%Y%m%d-%H%M%S-%f}")
+    with open(stem + '.txt', 'w', encoding='utf-8') as file:
+        file.write(f"Took {round(time_val, 3)} {time_unit}s.\n\n")
+        if profiler is not None:
+            profiler.dump_stats(stem + '.prof')
+            stats = pstats.Stats(profiler, stream=file)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+        if snapshot is not None:
+            file.write(f"Peak traced memory: {peak / 1024:.1f} KiB. Top {top} allocations still held on return:\n")
+            if before is None:
+                stats = snapshot.statistics('lineno')
+            else:
+                stats = snapshot.compare_to(before, 'lineno')
+            for stat in stats[:top]:
+                file.write(f"{stat}\n")
+
+
+def profile_execution(folder: str, sample_rate: float = 1.0, threshold: Optional[float] = None,
+                      cpu: bool = True, memory: bool = False, top: int = 25, keep: int = 10):
+    """
+    A decorator which profiles a sample of the calls to a function, saving the profiles to a folder.
+
+    A sampled call is run under ``cProfile`` (if ``cpu`` is set) and ``tracemalloc`` (if
+    ``memory`` is set). Each profile is saved as a ``.prof`` file, for ``pstats`` or
+    ``snakeviz``, and a ``.txt`` summary of the slowest functions and largest allocations.
+    Only the newest ``keep`` profiles of each function are kept.
+
+    Calls which aren't sampled cost a single random number. If ``threshold`` is set, sampled
+    calls which are faster than it are discarded, so only slow calls are saved. Only one call
+    is profiled at a time; others that are sampled meanwhile are run normally.
+
+    :param folder: The folder to save the profiles in.
+    :param sample_rate: The fraction of calls, between 0 and 1, to profile.
+    :param threshold: The number of seconds a call must take for its profile to be saved.
+    :param cpu: Whether to profile the function calls with ``cProfile``.
+    :param memory: Whether to profile the memory allocations with ``tracemalloc``.
+    :param top: The number of functions and allocations to list in the summary.
+    :param keep: The number of profiles of the function to keep.
+    :return: Returns the parameterized decorator.
+    """
+    def decorator(func: Callable):
+        prefix = f"{func.__module__}.{func.__qualname__}-".replace('<', '').replace('>', '')
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if (sample_rate < 1.0 and random() >= sample_rate) or not _PROFILE_LOCK.acquire(blocking=False):
+                return func(*args, **kwargs)
+
+            try:
+                import cProfile
+                import tracemalloc
+
+                profiler = cProfile.Profile() if cpu else None
+                before = None
+                started_tracing = False
+                if memory:
+                    if tracemalloc.is_tracing():
+                        before = tracemalloc.take_snapshot()
+                        tracemalloc.reset_peak()
+                    else:
+                        tracemalloc.start()
+                        started_tracing = True
+
+                start_time = perf_counter_ns()
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+                    elapsed = (perf_counter_ns() - start_time) / 1e9
+
+                    snapshot, peak = None, 0
+                    if memory:
+                        snapshot = tracemalloc.take_snapshot()
+                        peak = tracemalloc.get_traced_memory()[1]
+                        if started_tracing:
+                            tracemalloc.stop()
+
+                    if threshold is None or elapsed >= threshold:
+                        try:
+                            makedirs(folder, exist_ok=True)
+                            _write_profile(folder, prefix, elapsed, profiler, snapshot, before, peak, top)
+                            _rotate_profiles(folder, prefix, keep)
+                        except OSError as ex:
+                            logging.error(f'Error saving profile of {func.__name__} to {folder}')
+                            logging.error(ex)
+            finally:
+                _PROFILE_LOCK.release()
+        return wrapper
+    return decorator
+
+
+def _summarise_args(args: tuple, kwargs: dict[str, Any]) -> str:
+    """Creates a short, truncated representation of the arguments of a call."""
+    summaries = [_ARG_REPR.repr(arg) for arg in args]
+    summaries += [f'{key}={_ARG_REPR.repr(val)}' for key, val in kwargs.items()]
+    return ', '.join(summaries)
+
+
 # Adapted/Taken from https://towardsdatascience.com/python-decorators-for-data-science-6913f717669a
-def log_execution(log_func: Callable[[str], None] = logging.debug):
+def log_execution(lvl: Union[LogLvl, Callable[[str], None]] = LogLvl.DEBUG, sample_every: int = 1,
+                  include_time: bool = False, include_args: bool = False,
+                  log_func: Optional[Callable[[str], None]] = None):
     """
     A decorator which logs the start and end of a function call.
 
-    :param log_func: The function which handles the logging messages. Default is `logging.debug`.
+    The messages are only built if the root logger is enabled for ``lvl``, so the
+    decorator costs very little while that level is disabled. ``sample_every`` further
+    reduces the cost on hot paths, by only logging one in every that many calls.
+
+    For backwards compatibility, a function which handles the logging messages (eg.
+    `logging.debug`) can be given as ``log_func``, or in place of ``lvl``, in which case
+    every call is logged.
+
+    :param lvl: The level to log at. Default is `LogLvl.DEBUG`.
+    :param sample_every: Log one in every this many calls.
+    :param include_time: Whether to include how long the call took.
+    :param include_args: Whether to include a short summary of the arguments of the call.
+    :param log_func: The function which handles the logging messages. Used instead of ``lvl`` if provided.
     :return: Returns the parameterized decorator.
     """
+    if log_func is not None:
+        lvl = log_func
+    if not isinstance(lvl, int):
+        log_func = lvl
+
+        def decorator(func: Callable):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                log_func(f"Executing {func.__name__}...")
+                result = func(*args, **kwargs)
+                log_func(f"Finished executing {func.__name__}...")
+                return result
+            return wrapper
+        return decorator
+
+    logger = logging.getLogger()
+
     def decorator(func: Callable):
+        name = func.__name__
+        calls = count()
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            log_func(f"Executing {func.__name__}...")
+            if not logger.isEnabledFor(lvl) or (sample_every > 1 and next(calls) % sample_every):
+                return func(*args, **kwargs)
+
+            if include_args:
+                logger.log(lvl, "Executing %s(%s)...", name, _summarise_args(args, kwargs))
+            else:
+                logger.log(lvl, "Executing %s...", name)
+            start_time = perf_counter_ns()
             result = func(*args, **kwargs)
-            log_func(f"Finished executing {func.__name__}...")
+            if include_time:
+                time_val, time_unit = format_seconds((perf_counter_ns() - start_time) / 1e9)
+                logger.log(lvl, "Finished executing %s in %.3f %ss...", name, time_val, time_unit)
+            else:
+                logger.log(lvl, "Finished executing %s...", name)
             return result
         return wrapper
     return decorator
@@ -114,85 +919,144 @@ def notify_on_failure(notifier: Callable[[Exception, str], None]):
     return decorator
 
 
-# Adapted from: https://codereview.stackexchange.com/questions/122532/controlling-the-order-of-unittest-testcases
-def custom_order_tests(loader: TestLoader, ordering_dict: dict = None):
-    """
-    Returns a parameterizable decorator which is to be placed before test functions.
+def _run_chunk(func: Callable, chunk: list) -> tuple[list, int]:
+    """Runs a function over a chunk of items in a worker, returning the results and how long it took."""
+    start_time = perf_counter_ns()
+    results = [func(item) for item in chunk]
+    return results, perf_counter_ns() - start_time
 
-    The returned function takes in an optional int, which specifies the index for
-    the test. If no index is provided, the test is assigned the maximum value among
-    indexes plus one, placing it as the last test to be run. Attempting to assign a
-    an index which is already taken will raise an AssertionError.
 
-    The returned function, itself, returns the decorator that's used. If tests only
-    need to be ran in the order they're written in the file, that decorator can
-    be extracted and used, instead of using the parameterized version.
+def _apply(func: Callable, args: tuple, kwargs: dict[str, Any], item: Any) -> Any:
+    """Calls a function with an item, followed by fixed arguments. Used as a picklable partial."""
+    return func(item, *args, **kwargs)
 
-    :param loader: The TestLoader to set the ordering for.
-    :param ordering_dict: The dictionary to contain the ordering. If not provided, will be automatically created.
-    :return: A parameterizable decorator to be placed before a test function.
 
-    Example Usage::
-
-        ordered = decorators.custom_order_tests(unittest.defaultTestLoader)
-        auto_ordered = ordered()  # Getting the underlying decorator.
+def parallel_map(func: Callable[[Any], Any], iterable: Iterable, max_workers: Optional[int] = None,
+                 chunk_size: Optional[int] = None, ordered: bool = True, max_pending: Optional[int] = None,
+                 notifier: Optional[Callable[[Exception, str], None]] = None,
+                 progress_lvl: LogLvl = LogLvl.VERBOSE, progress_interval: float = 10.0) -> Iterator:
+    """
+    Maps a function over an iterable in a pool of processes, yielding the results.
 
-        @ordered(-1)  # The parameterizable decorator, with value.
-        def test_true(self):
-            self.assertTrue(True)
+    The items are sent to the workers in chunks, reading only as many items from the
+    iterable as are needed to keep ``max_pending`` chunks queued, so large (or endless)
+    iterables are never held in memory. Unless ``chunk_size`` is given, chunks start
+    with a single item and are resized as results come back, so each takes roughly
+    ``PARALLEL_CHUNK_SECONDS`` to run.
 
-        @auto_ordered  # The 'unpacked' decorator.
-        def test_false(self):
-            self.assertFalse(False)
+    The function and items must be picklable, so the function should be defined at the
+    top level of a module. Progress is logged every ``progress_interval`` seconds while
+    results are being consumed. If a call fails, the remaining work is cancelled, the
+    exception is passed to ``notifier`` (as with ``notify_on_failure``) and re-raised.
 
-        @ordered()  # The parameterized decorator using the default.
-        def test_equal(self):
-            self.assertEqual(True, False)
+    :param func: The function to call with each item.
+    :param iterable: The items to map the function over.
+    :param max_workers: The number of processes to use. Uses the number of CPUs if None.
+    :param chunk_size: The number of items sent to a worker at a time. Sized automatically if None.
+    :param ordered: Whether to yield the results in order, rather than as they finish.
+    :param max_pending: The most chunks queued at a time. Default is twice the number of workers.
+    :param notifier: A function which takes in the exception and function name, and sends an notification.
+    :param progress_lvl: The level to log progress at. Default is `LogLvl.VERBOSE`.
+    :param progress_interval: The number of seconds between progress messages.
+    :return: An iterator of the results.
     """
-    if ordering_dict is None:
-        ordering_dict = dict()
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
-    def compare(a, b):
-        """Handles index comparisons, placing un-indexed functions last."""
-        try:
-            return ordering_dict[a] - ordering_dict[b]
-        except KeyError:  # Handles if undecorated tests are run.
-            if a in ordering_dict:
-                return -1
-            else:
-                return 1
+    inner = func.args[0] if isinstance(func, partial) and func.func is _apply else func
+    name = getattr(inner, '__name__', repr(inner))
+    workers = max_workers or cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    logger = logging.getLogger()
 
-    def custom_orderer(idx: int = None):
-        """
-        The parameterizable decorator.
+    # As with ``multiprocessing.Pool.map``, splits sized iterables into at least 4 chunks per worker.
+    max_chunk = PARALLEL_MAX_CHUNK_SIZE
+    if chunk_size is None and hasattr(iterable, '__len__'):
+        max_chunk = max(1, min(max_chunk, ceil(len(iterable) / (workers * 4))))
+    size = chunk_size or 1
 
-        :param idx: The index to assign the test.
-        :return: The decorator to apply.
-        :raises AssertionError: Raised if the ``idx`` is already in use.
-        """
-        if idx is None:
-            if ordering_dict.values():
-                idx = max(ordering_dict.values()) + 1
+    items = iter(iterable)
+    exhausted = False
+    pending: deque[Future] = deque()
+    done = 0
+    start_time = last_log = monotonic()
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                chunk = list(islice(items, size))
+                if chunk:
+                    pending.append(executor.submit(_run_chunk, func, chunk))
+                else:
+                    exhausted = True
+            if not pending:
+                break
+
+            if ordered:
+                future = pending.popleft()
             else:
-                idx = 1
-        else:
-            assert idx not in ordering_dict.values(), f"Index {idx} already taken."
+                wait(pending, return_when=FIRST_COMPLETED)
+                future = next(pending_future for pending_future in pending if pending_future.done())
+                pending.remove(future)
 
-        def apply_order(func):
-            """The decorator which applies an order to a test."""
-            logging.debug(f"Adding {func.__name__}: {idx}")
-            ordering_dict[func.__name__] = idx
+            try:
+                results, elapsed = future.result()
+            except Exception as ex:
+                logging.error(f'Error mapping {name} in a worker process.')
+                logging.error(ex)
+                if notifier is not None:
+                    notifier(ex, name)
+                raise ex
 
-            @wraps(func)
-            def wrapper(*args, **kwargs):
-                """Logs the execution of the test."""
-                logging.debug(f"Running test {idx}: {func.__name__}...")
-                result = func(*args, **kwargs)
-                return result
+            if chunk_size is None and results:
+                per_item = elapsed / 1e9 / len(results)
+                size = max(1, min(max_chunk, round(PARALLEL_CHUNK_SECONDS / per_item) if per_item else max_chunk))
+            done += len(results)
+            now = monotonic()
+            if now - last_log >= progress_interval and logger.isEnabledFor(progress_lvl):
+                last_log = now
+                logger.log(progress_lvl, "Mapping %s: %d items done (%.1f items/s)...",
+                           name, done, done / (now - start_time))
+            yield from results
+    finally:
+        executor.shutdown(cancel_futures=True)
 
-            return wrapper
+    if logger.isEnabledFor(progress_lvl):
+        time_val, time_unit = format_seconds(monotonic() - start_time)
+        logger.log(progress_lvl, "Finished mapping %s over %d items in %.3f %ss.", name, done, time_val, time_unit)
+
+
+def parallelize(max_workers: Optional[int] = None, chunk_size: Optional[int] = None, ordered: bool = True,
+                notifier: Optional[Callable[[Exception, str], None]] = None,
+                progress_lvl: LogLvl = LogLvl.VERBOSE):
+    """
+    A decorator which adds a ``map`` method to a function, to call it over many items in parallel.
+
+    The function itself is unchanged (so it can still be pickled and sent to the workers),
+    and ``func.map(items, *args, **kwargs)`` returns an iterator of
+    ``func(item, *args, **kwargs)`` for each item, using ``parallel_map``.
+
+    :param max_workers: The number of processes to use. Uses the number of CPUs if None.
+    :param chunk_size: The number of items sent to a worker at a time. Sized automatically if None.
+    :param ordered: Whether to yield the results in order, rather than as they finish.
+    :param notifier: A function which takes in the exception and function name, and sends an notification.
+    :param progress_lvl: The level to log progress at. Default is `LogLvl.VERBOSE`.
+    :return: Returns the parameterized decorator.
+
+    Example Usage::
 
-        return apply_order
+        @decorators.parallelize(max_workers=4)
+        def score_card(card, weights):
+            ...
 
-    loader.sortTestMethodsUsing = compare
-    return custom_orderer
+        scores = list(score_card.map(cards, weights))
+    """
+    def decorator(func: Callable):
+        @wraps(func, assigned=('__doc__',))
+        def map_func(iterable: Iterable, *args, **kwargs) -> Iterator:
+            target = partial(_apply, func, args, kwargs) if args or kwargs else func
+            return parallel_map(target, iterable, max_workers, chunk_size, ordered,
+                                notifier=notifier, progress_lvl=progress_lvl)
+
+        func.map = map_func
+        return func
+    return decorator
@@ -0,0 +1,349 @@
+from typing import Any, Iterable, Iterator, NamedTuple, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from hashlib import sha256
+from http.client import HTTPConnection, HTTPException, HTTPSConnection, RemoteDisconnected
+from os import makedirs, path
+from threading import Lock
+from time import time
+from urllib.parse import urlsplit
+import gzip
+
+from core.utilities import json_backend
+from core.utilities.auto_logging import LogLvl, logging
+from core.utilities.decorators import TokenBucket, retry
+from core.utilities.funcs import ENCODING, atomic_write, load_json_file, save_json_file
+
+# Statuses which mean the server is temporarily unable to respond, so the request is retried.
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+DEFAULT_HEADERS = {
+    'User-Agent': 'wubrg',
+    'Accept': 'application/json;q=0.9,*/*;q=0.8',
+    'Accept-Encoding': 'gzip',
+}
+
+
+class HTTPStatusError(Exception):
+    """Raised when a server responds with an unsuccessful status."""
+
+    def __init__(self, url: str, status: int, reason: str = ''):
+        super().__init__(f"{url} returned {status} {reason}".rstrip())
+        self.url = url
+        self.status = status
+
+
+class RetryableStatusError(HTTPStatusError):
+    """Raised when a server responds with a status in ``RETRYABLE_STATUSES``."""
+
+
+# The errors a request is retried on. Connection errors (including timeouts) are ``OSError``s.
+RETRYABLE_EXCEPTIONS = (OSError, HTTPException, RetryableStatusError)
+
+
+class FetchResult(NamedTuple):
+    """The response to a fetch."""
+    url: str
+    # The status of the response: 304 if the cached body was revalidated, or 0 if no request was made.
+    status: int
+    body: bytes
+    from_cache: bool
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of keep-alive connections, grouped by host.
+
+    Connections are taken from the pool for a request, and returned once the response
+    has been read, so later requests to the same host skip the TCP and TLS handshakes.
+    At most ``max_per_host`` idle connections are kept for each host.
+    """
+
+    def __init__(self, max_per_host: int = 8, timeout: float = 30.0):
+        """
+        Creates an empty pool.
+
+        :param max_per_host: The maximum number of idle connections to keep for each host.
+        :param timeout: The number of seconds to wait for a connection or response.
+        """
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.opened = 0
+        self._idle: dict[tuple[str, str], list[HTTPConnection]] = dict()
+        self._lock = Lock()
+
+    def get(self, scheme: str, netloc: str, fresh: bool = False) -> tuple[HTTPConnection, bool]:
+        """
+        Takes a connection to a host from the pool, opening a new one if none are idle.
+
+        :param scheme: The scheme of the url, ``http`` or ``https``.
+        :param netloc: The host (and port) to connect to.
+        :param fresh: Whether to always open a new connection.
+        :return: The connection, and whether it was reused from the pool.
+        :raises ValueError: Raised if the scheme is not supported.
+        """
+        with self._lock:
+            idle = self._idle.get((scheme, netloc))
+            if idle and not fresh:
+                return idle.pop(), True
+            self.opened += 1
+
+        if scheme == 'https':
+            return HTTPSConnection(netloc, timeout=self.timeout), False
+        if scheme == 'http':
+            return HTTPConnection(netloc, timeout=self.timeout), False
+        raise ValueError(f"Unsupported url scheme {scheme!r}!")
+
+    def put(self, scheme: str, netloc: str, conn: HTTPConnection) -> None:
+        """
+        Returns a connection to the pool, closing it if the pool is full.
+
+        :param scheme: The scheme of the url the connection was for.
+        :param netloc: The host (and port) the connection is to.
+        :param conn: The connection, which must have no unread response.
+        """
+        with self._lock:
+            idle = self._idle.setdefault((scheme, netloc), [])
+            if len(idle) < self.max_per_host:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        """Closes every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, dict()
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+class Fetcher:
+    """
+    Fetches resources over HTTP, reusing connections and caching responses on disk.
+
+    If ``cache_folder`` is set, each response is stored in it along with its ``ETag`` and
+    ``Last-Modified`` headers. Later fetches of the url send those back, so the server can
+    respond with a ``304 Not Modified`` instead of the whole body. Responses younger than
+    ``max_age`` seconds are returned from the cache without a request at all.
+
+    Failed requests (connection errors and the ``RETRYABLE_STATUSES``) are retried with
+    ``retry``, with exponential backoff. If a ``bucket`` is given, each request waits for a
+    token from it, to respect the rate limits of APIs like Scryfall's.
+
+    Example Usage::
+
+        with Fetcher('cache/scryfall', max_age=3600, bucket=TokenBucket(10, 10)) as fetcher:
+            cards = fetcher.fetch_json('https://api.scryfall.com/cards/search?q=set:neo')
+    """
+
+    def __init__(self, cache_folder: Optional[str] = None, max_age: float = 0.0, timeout: float = 30.0,
+                 max_connections: int = 8, headers: Optional[dict[str, str]] = None,
+                 max_tries: int = 3, fail_delay: float = 1.0, backoff: float = 2.0,
+                 bucket: Optional[TokenBucket] = None):
+        """
+        Creates a fetcher.
+
+        :param cache_folder: The folder to cache responses in. Responses are not cached if None.
+        :param max_age: The number of seconds a cached response is used for without revalidating it.
+        :param timeout: The number of seconds to wait for a connection or response.
+        :param max_connections: The maximum number of idle connections to keep for each host.
+        :param headers: Headers to send with every request, in addition to ``DEFAULT_HEADERS``.
+        :param max_tries: The max number of times a request is tried.
+        :param fail_delay: The delay (in seconds) before the first retry.
+        :param backoff: The multiplier applied to the delay after each failure.
+        :param bucket: A token bucket which limits the rate of requests.
+        """
+        self.cache_folder = cache_folder
+        self.max_age = max_age
+        self.headers = {**DEFAULT_HEADERS, **(headers or dict())}
+        self.bucket = bucket
+        self.pool = ConnectionPool(max_connections, timeout)
+        self._request = retry(max_tries, fail_delay, backoff, jitter=0.1,
+                              exceptions=RETRYABLE_EXCEPTIONS)(self._request_once)
+        if cache_folder is not None:
+            makedirs(cache_folder, exist_ok=True)
+
+    def _request_once(self, url: str, headers: dict[str, str]) -> tuple[int, bytes, dict[str, str]]:
+        """
+        Makes a single GET request, on a pooled connection.
+
+        :param url: The url to request.
+        :param headers: The headers to send.
+        :return: The status, (decompressed) body and headers of the response.
+        :raises RetryableStatusError: Raised if the status is one of ``RETRYABLE_STATUSES``.
+        """
+        parts = urlsplit(url)
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        if self.bucket is not None:
+            self.bucket.acquire()
+
+        conn, reused = self.pool.get(parts.scheme, parts.netloc)
+        while True:
+            try:
+                conn.request('GET', target, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+                break
+            except (RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                # The server may have closed an idle connection, so try once more on a new one.
+                if not reused:
+                    raise
+                conn, reused = self.pool.get(parts.scheme, parts.netloc, fresh=True)
+            except Exception:
+                conn.close()
+                raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self.pool.put(parts.scheme, parts.netloc, conn)
+
+        if response.getheader('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        if response.status in RETRYABLE_STATUSES:
+            raise RetryableStatusError(url, response.status, response.reason)
+        return response.status, body, dict(response.getheaders())
+
+    def _cache_paths(self, url: str) -> tuple[str, str]:
+        """Gets the paths of the cached body and metadata of a url."""
+        stem = path.join(self.cache_folder, sha256(url.encode(ENCODING)).hexdigest())
+        return stem + '.body', stem + '.json'
+
+    def _read_cache(self, url: str) -> tuple[Optional[dict[str, Any]], Optional[bytes]]:
+        """Gets the cached metadata and body of a url, or None for both if it's not cached."""
+        if self.cache_folder is None:
+            return None, None
+        body_path, meta_path = self._cache_paths(url)
+        if not path.exists(meta_path):
+            return None, None
+        meta = load_json_file(*path.split(meta_path))
+        try:
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except OSError:
+            return None, None
+        if not isinstance(meta, dict) or meta.get('url') != url:
+            return None, None
+        return meta, body
+
+    def _write_cache(self, url: str, meta: dict[str, Any], body: Optional[bytes]) -> None:
+        """Stores the metadata, and optionally the body, of a url. The body is written first."""
+        body_path, meta_path = self._cache_paths(url)
+        try:
+            if body is not None:
+                with atomic_write(body_path, binary=True) as f:
+                    f.write(body)
+            save_json_file(*path.split(meta_path), meta, indent=None)
+        except OSError as ex:
+            logging.error(f'Error caching response of {url}')
+            logging.error(ex)
+
+    def fetch(self, url: str, max_age: Optional[float] = None) -> Optional[FetchResult]:
+        """
+        Fetches a url, using the cache where possible.
+
+        :param url: The url to fetch.
+        :param max_age: The number of seconds a cached response is used for without revalidating it.
+            Uses the fetcher's ``max_age`` if None.
+        :return: The response, or None if the fetch failed.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        meta, cached = self._read_cache(url)
+        if meta is not None and time() - meta['fetched'] < max_age:
+            logging.debug(f'Using cached response of {url}.')
+            return FetchResult(url, 0, cached, True)
+
+        headers = dict(self.headers)
+        if meta is not None:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+
+        try:
+            status, body, response_headers = self._request(url, headers)
+            if status == 304 and meta is not None:
+                logging.debug(f'Cached response of {url} is still valid.')
+                # The fetch time only matters while the response is fresh, so is only saved then.
+                if max_age > 0:
+                    meta['fetched'] = time()
+                    self._write_cache(url, meta, None)
+                return FetchResult(url, status, cached, True)
+            if not 200 <= status < 300:
+                raise HTTPStatusError(url, status)
+        except Exception as ex:
+            logging.error(f'Error fetching {url}')
+            logging.error(ex)
+            return None
+
+        logging.log(LogLvl.VERBOSE, f'Fetched {url} ({len(body)} bytes).')
+        if self.cache_folder is not None:
+            response_headers = {key.lower(): val for key, val in response_headers.items()}
+            meta = {'url': url, 'fetched': time(), 'etag': response_headers.get('etag'),
+                    'last_modified': response_headers.get('last-modified')}
+            self._write_cache(url, meta, body)
+        return FetchResult(url, status, body, False)
+
+    def fetch_json(self, url: str, max_age: Optional[float] = None) -> Any:
+        """
+        Fetches a url, and parses it as json.
+
+        :param url: The url to fetch.
+        :param max_age: The number of seconds a cached response is used for without revalidating it.
+        :return: An object containing the json data, or None if the fetch or parsing failed.
+        """
+        result = self.fetch(url, max_age)
+        if result is None:
+            return None
+        try:
+            return json_backend.loads(result.body.decode(ENCODING))
+        except ValueError as ex:
+            logging.error(f'Error parsing json from {url}')
+            logging.error(ex)
+            return None
+
+    def fetch_many(self, urls: Iterable[str], max_workers: int = 8, ordered: bool = True,
+                   max_age: Optional[float] = None) -> Iterator[tuple[str, Optional[FetchResult]]]:
+        """
+        Fetches many urls concurrently, yielding each url with its response.
+
+        :param urls: The urls to fetch.
+        :param max_workers: The number of requests to make at a time.
+        :param ordered: Whether to yield the responses in order, rather than as they finish.
+        :param max_age: The number of seconds a cached response is used for without revalidating it.
+        :return: An iterator of the urls and their responses (None if the fetch failed).
+        """
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {executor.submit(self.fetch, url, max_age): url for url in urls}
+            for future in futures if ordered else as_completed(futures):
+                yield futures[future], future.result()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def fetch_json_many(self, urls: Iterable[str], max_workers: int = 8,
+                        max_age: Optional[float] = None) -> dict[str, Any]:
+        """
+        Fetches many urls concurrently, and parses them as json.
+
+        :param urls: The urls to fetch.
+        :param max_workers: The number of requests to make at a time.
+        :param max_age: The number of seconds a cached response is used for without revalidating it.
+        :return: A dict of the json data of each url (None if the fetch failed), in the order requested.
+        """
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {url: executor.submit(self.fetch_json, url, max_age) for url in urls}
+            return {url: future.result() for url, future in futures.items()}
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def close(self) -> None:
+        """Closes the pooled connections."""
+        self.pool.close()
+
+    def __enter__(self) -> 'Fetcher':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
@@ -1,20 +1,85 @@
-from typing import Union, Optional, TypeVar
-from itertools import chain
-from collections import Counter
-from os import path
+from typing import Any, Iterable, Iterator, Union, Optional, Sequence, TextIO, TypeVar
+from itertools import chain, zip_longest
+from collections import Counter, deque
+from contextlib import contextmanager
+from functools import partial
+from glob import escape, glob
+from hashlib import blake2b
+from importlib import import_module
+from os import fstat, fsync, getpid, path, remove, replace, stat, stat_result, urandom
+from sys import modules
+import gc
 import json
+import pickle
+import re
 
-from core.utilities.auto_logging import logging
+from core.utilities import json_backend
+from core.utilities.auto_logging import LogLvl, logging
 
 ENCODING = 'utf-8'
+JSON_LINES_EXTENSIONS = ('.jsonl', '.ndjson')
+COMPRESSION_EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'lzma'}
+# Bumped whenever the format of json snapshots changes, to invalidate old snapshots.
+SNAPSHOT_VERSION = 1
+# The number of json snapshots loaded, and rebuilt, by ``load_json_file`` in this process.
+SNAPSHOT_STATS = {'hits': 0, 'rebuilds': 0}
+
+# Marks a missing value, where ``None`` is valid data.
+_MISSING = object()
 
 T = TypeVar('T')
 T1 = TypeVar('T1')
 T2 = TypeVar('T2')
 
 
+def _get_numpy(*objs: Any) -> Any:
+    """
+    Gets the ``numpy`` module if any of the objects are numpy arrays, otherwise None.
+
+    If ``numpy`` hasn't been imported, no arrays can exist, so this never imports it.
+    """
+    np = modules.get('numpy')
+    if np is not None and any(isinstance(obj, np.ndarray) for obj in objs):
+        return np
+    return None
+
+
+def _np_subtract(np: Any, l_arr: Any, r_arr: Any, right_to_left: bool) -> Any:
+    """The vectorized implementation of ``subtract_lists``, for numpy arrays."""
+    l_arr, r_arr = np.asarray(l_arr), np.asarray(r_arr)
+    if not l_arr.size or not r_arr.size:
+        return l_arr.copy()
+
+    # Removing an element from the right is the same as removing it from the left of the reversed array.
+    elements = l_arr[::-1] if right_to_left else l_arr
+    uniques, inverse = np.unique(elements, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    # Find how many times each element's value has occurred before it (its rank among equal values).
+    order = np.argsort(inverse, kind='stable')
+    sorted_inverse = inverse[order]
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(order.size) - np.searchsorted(sorted_inverse, sorted_inverse, side='left')
+
+    # Find how many of each value are to be removed, and keep only the occurrences after those.
+    r_uniques, r_counts = np.unique(r_arr, return_counts=True)
+    idx = np.minimum(np.searchsorted(r_uniques, uniques), r_uniques.size - 1)
+    to_remove = np.where(r_uniques[idx] == uniques, r_counts[idx], 0)
+    out = elements[ranks >= to_remove[inverse]]
+    return out[::-1].copy() if right_to_left else out
+
+
 def flatten_lists(lst: list[list[T]]) -> list[T]:
-    """Converts a list of lists into a single list"""
+    """
+    Converts a list of lists into a single list
+
+    If given a numpy array, or a list of them, the flattened result is a numpy array.
+    """
+    np = _get_numpy(lst, *(lst[:1] if isinstance(lst, list) else ()))
+    if np:
+        if isinstance(lst, np.ndarray):
+            return lst.reshape(-1, *lst.shape[2:])
+        return np.concatenate(lst)
     return [item for sublist in lst for item in sublist]
 
 
@@ -24,6 +89,11 @@ def lists_equal(l_lst: list[T], r_lst: list[T]) -> bool:
     if len(l_lst) != len(r_lst):
         return False
 
+    # Compare numpy arrays in a single vectorized operation.
+    np = _get_numpy(l_lst, r_lst)
+    if np:
+        return bool(np.array_equal(l_lst, r_lst))
+
     # Compare each element, return False if they don't match. If we don't find mismatches, return True.
     for i in range(0, len(l_lst)):
         if l_lst[i] != r_lst[i]:
@@ -33,7 +103,16 @@ def lists_equal(l_lst: list[T], r_lst: list[T]) -> bool:
 
 # Taken from: https://stackoverflow.com/questions/3428536/how-do-i-subtract-one-list-from-another/57827145#57827145
 def subtract_lists(l_lst: list[T], r_lst: list[T], right_to_left=False) -> list[T]:
-    """Returns a copy of the left list, minus any elements in the right list."""
+    """
+    Returns a copy of the left list, minus any elements in the right list.
+
+    If either argument is a numpy array, the result is a numpy array, computed with
+    vectorized operations. The elements must then be sortable.
+    """
+    np = _get_numpy(l_lst, r_lst)
+    if np:
+        return _np_subtract(np, l_lst, r_lst, right_to_left)
+
     out = []
     remaining = Counter(r_lst)
 
@@ -57,70 +136,625 @@ def subtract_lists(l_lst: list[T], r_lst: list[T], right_to_left=False) -> list[
 
 
 def weave_lists(l1: list[T], l2: list[T]) -> list[T]:
-    """Interweaves elements of two equal-length lists into one."""
+    """
+    Interweaves elements of two equal-length lists into one.
+
+    If either argument is a numpy array, the result is a numpy array.
+    """
     if len(l1) != len(l2):
         raise ValueError("List length must be equal!")
+
+    np = _get_numpy(l1, l2)
+    if np:
+        l1, l2 = np.asarray(l1), np.asarray(l2)
+        out = np.empty((l1.shape[0] * 2, *l1.shape[1:]), dtype=np.result_type(l1, l2))
+        out[0::2], out[1::2] = l1, l2
+        return out
     return list(chain.from_iterable(zip(l1, l2)))
 
 
+def iter_flatten_lists(iterables: Iterable[Iterable[T]]) -> Iterator[T]:
+    """Lazily yields the items of each iterable in turn, as ``flatten_lists`` does."""
+    return chain.from_iterable(iterables)
+
+
+def iter_subtract_lists(l_iter: Iterable[T], r_lst: Iterable[T], right_to_left: bool = False) -> Iterator[T]:
+    """
+    Lazily yields the elements of the left iterable, minus any elements in the right one, as ``subtract_lists`` does.
+
+    Only the right iterable is read up front. When ``right_to_left`` is True, the last
+    occurrences must be removed, so an element is held back until it's known it won't
+    be one of them. Only those elements, and any after them, are held in memory.
+
+    :param l_iter: The elements to yield.
+    :param r_lst: The elements to remove.
+    :param right_to_left: Whether to remove the last occurrences of elements, rather than the first.
+    :return: An iterator of the remaining elements, in their original order.
+    """
+    remaining = Counter(r_lst)
+    if not right_to_left:
+        for val in l_iter:
+            if remaining[val]:
+                remaining[val] -= 1
+            else:
+                yield val
+        return
+
+    # Each pending entry is [value, decided]. An entry of a value in ``remaining`` is undecided
+    #  until more occurrences than will be removed follow it, at which point it's kept.
+    pending: deque[list] = deque()
+    undecided: dict[T, deque[list]] = dict()
+    for val in l_iter:
+        if not remaining[val]:
+            if not pending:
+                yield val
+            else:
+                pending.append([val, True])
+            continue
+
+        entry = [val, False]
+        pending.append(entry)
+        held = undecided.setdefault(val, deque())
+        held.append(entry)
+        if len(held) > remaining[val]:
+            held.popleft()[1] = True
+        while pending and pending[0][1]:
+            yield pending.popleft()[0]
+
+    # Any entries still undecided are the last occurrences, which are removed.
+    for val, decided in pending:
+        if decided:
+            yield val
+
+
+def iter_weave_lists(l1: Iterable[T], l2: Iterable[T], strict: bool = True) -> Iterator[T]:
+    """
+    Lazily interweaves the elements of two iterables, as ``weave_lists`` does.
+
+    :param l1: The iterable to take the first of each pair from.
+    :param l2: The iterable to take the second of each pair from.
+    :param strict: Whether to raise an error if the iterables have different lengths, rather
+        than stopping at the end of the shorter one.
+    :return: An iterator of the interwoven elements.
+    :raises ValueError: Raised, once the shorter iterable is exhausted, if ``strict`` and the lengths differ.
+    """
+    if not strict:
+        yield from chain.from_iterable(zip(l1, l2))
+        return
+
+    for left, right in zip_longest(l1, l2, fillvalue=_MISSING):
+        if left is _MISSING or right is _MISSING:
+            raise ValueError("List length must be equal!")
+        yield left
+        yield right
+
+
 def invert_dict(d: dict[T1, T2]) -> dict[T2, T1]:
     """Creates a new dictionary with the keys and values swapped."""
     return {v: k for k, v in d.items()}
 
 
-def validate_json(json_str: str) -> bool:
+def _discard(_pairs: list) -> None:
+    """An ``object_pairs_hook`` which drops each object as soon as it's parsed."""
+    return None
+
+
+# Validates json while discarding each object once parsed, so the full object tree is never built.
+_VALIDATING_DECODER = json.JSONDecoder(object_pairs_hook=_discard)
+
+
+def validate_json(json_str: str, build_tree: bool = True) -> bool:
     """
     Checks to see if a provided string is valid json.
 
+    When ``build_tree`` is False, objects are discarded as soon as they're parsed, rather
+    than building the whole object tree, which greatly reduces the memory needed to check
+    large documents.
+
     :param json_str: The string to check.
+    :param build_tree: Whether the parsed object tree can be built while checking.
     :return: Whether the string is valid json.
     """
     try:
-        json.loads(json_str)
+        if build_tree:
+            json_backend.loads(json_str)
+        else:
+            _VALIDATING_DECODER.decode(json_str)
     except ValueError:
         return False
     return True
 
 
-def load_json_file(folder: str, filename: str) -> Union[dict, list[dict], None]:
+def _get_compression(filename: str, compression: Optional[str] = None) -> Optional[str]:
+    """Gets the compression module to use for a file, inferring it from the extension if not provided."""
+    if compression is None:
+        return COMPRESSION_EXTENSIONS.get(path.splitext(filename)[1])
+    if compression not in COMPRESSION_EXTENSIONS.values():
+        raise ValueError(f"Unsupported compression {compression!r}!")
+    return compression
+
+
+def _open_text(filepath: str, mode: str, compression: Optional[str] = None) -> TextIO:
+    """Opens a file in text mode, through the given compression module if there is one."""
+    if compression is None:
+        return open(filepath, mode, encoding=ENCODING)
+    return import_module(compression).open(filepath, mode + 't', encoding=ENCODING)
+
+
+@contextmanager
+def atomic_write(filepath: str, compression: Optional[str] = None, binary: bool = False) -> Iterator[TextIO]:
+    """
+    Opens a temporary file next to ``filepath`` to write to, which replaces ``filepath`` once closed.
+
+    If an exception is raised while writing, the temporary file is removed and ``filepath``
+    is left untouched, so readers never see a partially written file.
+
+    Example Usage::
+
+        with atomic_write(path.join(folder, 'cards.json')) as f:
+            f.write(json_str)
+
+    :param filepath: The path of the file to write.
+    :param compression: The compression to write the file with (``'gzip'``, ``'bz2'`` or ``'lzma'``), if any.
+    :param binary: Whether to open the file in binary mode, rather than as (uncompressed) text.
+    :return: A context manager giving the open temporary file.
+    """
+    folder, filename = path.split(filepath)
+    tmp_path = path.join(folder, f'.{filename}.{getpid()}.{urandom(4).hex()}.tmp')
+    try:
+        with open(tmp_path, 'wb') if binary else _open_text(tmp_path, 'w', compression) as f:
+            yield f
+        with open(tmp_path, 'rb+') as f:
+            fsync(f.fileno())
+        replace(tmp_path, filepath)
+    except BaseException:
+        if path.exists(tmp_path):
+            remove(tmp_path)
+        raise
+
+
+def _indent_str(indent: Union[int, str, None]) -> Optional[str]:
+    """Gets the string used for one level of indentation, as ``json`` does."""
+    if indent is None or isinstance(indent, str):
+        return indent
+    return ' ' * indent
+
+
+def _key_str(key: Any) -> str:
+    """Converts a dictionary key to a json string, as ``json`` does."""
+    if not isinstance(key, str):
+        if key is not None and not isinstance(key, (int, float, bool)):
+            raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+        key = json.dumps(key)
+    return json.dumps(key)
+
+
+def _dump_item(item: Any, indent: Optional[str]) -> str:
+    """Serialises a nested value, indented one level deeper than the top level."""
+    if indent is None:
+        return json_backend.dumps(item)
+    return json_backend.dumps(item, indent=indent).replace('\n', '\n' + indent)
+
+
+def _write_json(f: TextIO, data: Any, indent: Union[int, str, None]) -> None:
+    """
+    Writes data as json to a file, one top-level element at a time.
+
+    With the ``json`` backend, this produces the same output as ``json.dumps``, without
+    holding the whole serialised document in memory. Iterators are written as arrays.
+    """
+    indent = _indent_str(indent)
+    item_sep, key_sep = json_backend.separators() if indent is None else (',', ': ')
+    if isinstance(data, (list, tuple, Iterator)):
+        items = (_dump_item(item, indent) for item in data)
+        brackets = '[]'
+    elif isinstance(data, dict):
+        items = (f'{_key_str(key)}{key_sep}{_dump_item(val, indent)}' for key, val in data.items())
+        brackets = '{}'
+    else:
+        f.write(json_backend.dumps(data, indent=indent))
+        return
+
+    f.write(brackets[0])
+    first = True
+    for item in items:
+        if indent is None:
+            f.write(item if first else item_sep + item)
+        else:
+            f.write(('\n' if first else ',\n') + indent + item)
+        first = False
+    if not first and indent is not None:
+        f.write('\n')
+    f.write(brackets[1])
+
+
+def _snapshot_path(filepath: str) -> str:
+    """Gets the path of the binary snapshot of a json file."""
+    folder, filename = path.split(filepath)
+    return path.join(folder, f'.{filename}.snapshot')
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    """Pauses the garbage collector, which otherwise repeatedly scans objects while many are being created."""
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def _read_snapshot(filepath: str) -> Any:
+    """
+    Loads the data from the snapshot of a json file, if the snapshot is still valid.
+
+    A snapshot is valid if the json file has the same path, size and modification time
+    it was made from. If only the modification time differs, the content hash of the file
+    is checked instead, and the snapshot is refreshed if the content is unchanged.
+
+    :return: The data of the json file, or ``_MISSING`` if there's no valid snapshot.
+    """
+    try:
+        stats = stat(filepath)
+        with open(_snapshot_path(filepath), 'rb') as f:
+            header = pickle.load(f)
+            if header.get('version') != SNAPSHOT_VERSION or header['path'] != path.abspath(filepath) \
+                    or header['size'] != stats.st_size:
+                return _MISSING
+            if header['mtime_ns'] == stats.st_mtime_ns:
+                with _gc_paused():
+                    return pickle.load(f)
+
+            with open(filepath, 'rb') as json_file:
+                digest = blake2b(json_file.read()).hexdigest()
+            if digest != header['digest']:
+                return _MISSING
+            with _gc_paused():
+                data = pickle.load(f)
+    except FileNotFoundError:
+        return _MISSING
+    except Exception as ex:
+        logging.error(f'Error reading snapshot of json file {path.basename(filepath)}')
+        logging.error(ex)
+        return _MISSING
+
+    _write_snapshot(filepath, data, stats, digest)
+    return data
+
+
+def _write_snapshot(filepath: str, data: Any, stats: stat_result, digest: str) -> None:
+    """Saves the data of a json file as a binary snapshot next to it."""
+    header = {
+        'version': SNAPSHOT_VERSION,
+        'path': path.abspath(filepath),
+        'size': stats.st_size,
+        'mtime_ns': stats.st_mtime_ns,
+        'digest': digest,
+    }
+    try:
+        with atomic_write(_snapshot_path(filepath), binary=True) as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as ex:
+        logging.error(f'Error writing snapshot of json file {path.basename(filepath)}')
+        logging.error(ex)
+
+
+def load_json_file(folder: str, filename: str, snapshot: bool = False) -> Union[dict, list[dict], None]:
     """
     Loads and returns the data from a json file.
 
+    Files with a ``.gz``, ``.bz2`` or ``.xz`` extension are decompressed while reading.
+
+    If ``snapshot`` is True, the parsed data is also stored in a pickled snapshot next to
+    the file, which is loaded instead of parsing the json on later calls. The snapshot is
+    rebuilt whenever the content of the file changes. As snapshots are unpickled, they
+    should only be used for files in trusted folders.
+
     :param folder: The folder the json file is in.
     :param filename: The name of the json file (including filetype).
+    :param snapshot: Whether to load from, and save to, a binary snapshot of the file.
     :return: An object containing the json data.
     """
     filepath = path.join(folder, filename)
 
+    if snapshot:
+        data = _read_snapshot(filepath)
+        if data is not _MISSING:
+            SNAPSHOT_STATS['hits'] += 1
+            logging.log(LogLvl.VERBOSE, f"Snapshot of {filename} loaded. "
+                                        f"({SNAPSHOT_STATS['hits']} hits, {SNAPSHOT_STATS['rebuilds']} rebuilds)")
+            return data
+
     try:
-        with open(filepath, 'r', encoding=ENCODING) as f:
-            json_str = f.read()
+        with open(filepath, 'rb') as f:
+            raw = f.read()
+            stats = fstat(f.fileno())
             f.close()
-            logging.verbose(f'File {filename} read successfully.')
-            return json.loads(json_str)
+            logging.log(LogLvl.VERBOSE, f'File {filename} read successfully.')
+        compression = _get_compression(filename)
+        json_bytes = raw if compression is None else import_module(compression).decompress(raw)
+        data = json_backend.loads(json_bytes.decode(ENCODING))
     except Exception as ex:
         logging.error(f'Error reading json file {filename}')
         logging.error(ex)
         return None
 
+    if snapshot:
+        _write_snapshot(filepath, data, stats, blake2b(raw).hexdigest())
+        SNAPSHOT_STATS['rebuilds'] += 1
+        logging.log(LogLvl.VERBOSE, f"Snapshot of {filename} rebuilt. "
+                                    f"({SNAPSHOT_STATS['hits']} hits, {SNAPSHOT_STATS['rebuilds']} rebuilds)")
+    return data
+
+
+def _load_json_chunk(folder: str, filenames: list[str], snapshot: bool) -> list[tuple[str, Any]]:
+    """Loads a chunk of json files, for a worker of ``load_json_files_iter``."""
+    return [(filename, load_json_file(folder, filename, snapshot)) for filename in filenames]
+
+
+def _list_json_files(folder: str, filenames: Union[str, Iterable[str]]) -> list[str]:
+    """Gets the filenames matching a glob pattern in a folder, or the filenames as a list."""
+    if not isinstance(filenames, str):
+        return list(filenames)
+    matches = glob(path.join(escape(folder), filenames))
+    return sorted(path.relpath(match, folder) for match in matches if path.isfile(match))
+
+
+def load_json_files_iter(folder: str, filenames: Union[str, Iterable[str]] = '*.json',
+                         max_workers: Optional[int] = None, use_processes: bool = False,
+                         chunk_size: int = 1, ordered: bool = True,
+                         snapshot: bool = False) -> Iterator[tuple[str, Any]]:
+    """
+    Loads many json files concurrently, yielding each filename with its data.
+
+    Files are loaded with ``load_json_file``, so a file which fails to load is logged
+    in the same way, and yields ``None`` as its data.
+
+    Threads suit files where reading dominates. For large files where parsing dominates,
+    ``use_processes`` loads them in separate processes, so they can be parsed in parallel.
+
+    :param folder: The folder the json files are in.
+    :param filenames: A glob pattern to match in the folder, or the names of the files to load.
+    :param max_workers: The number of threads or processes to use. Uses the executor's default if None.
+    :param use_processes: Whether to load the files in a process pool, rather than a thread pool.
+    :param chunk_size: The number of files each worker loads at a time.
+    :param ordered: Whether to yield the files in order, rather than as they finish loading.
+    :param snapshot: Whether to use binary snapshots, as in ``load_json_file``.
+    :return: An iterator of the filenames and their data.
+    """
+    # Imported here, as the executors are slow to import and most callers never need them.
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+    filenames = _list_json_files(folder, filenames)
+    chunks = [filenames[i:i + chunk_size] for i in range(0, len(filenames), chunk_size)]
+    executor_cls = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+
+    executor = executor_cls(max_workers=max_workers)
+    try:
+        futures = [executor.submit(_load_json_chunk, folder, chunk, snapshot) for chunk in chunks]
+        for future in futures if ordered else as_completed(futures):
+            yield from future.result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def load_json_files(folder: str, filenames: Union[str, Iterable[str]] = '*.json',
+                    max_workers: Optional[int] = None, use_processes: bool = False,
+                    chunk_size: int = 1, snapshot: bool = False) -> dict[str, Any]:
+    """
+    Loads many json files concurrently, returning their data keyed by filename.
+
+    See ``load_json_files_iter`` for the details of the parameters.
+
+    :param folder: The folder the json files are in.
+    :param filenames: A glob pattern to match in the folder, or the names of the files to load.
+    :param max_workers: The number of threads or processes to use. Uses the executor's default if None.
+    :param use_processes: Whether to load the files in a process pool, rather than a thread pool.
+    :param chunk_size: The number of files each worker loads at a time.
+    :param snapshot: Whether to use binary snapshots, as in ``load_json_file``.
+    :return: A dict of the data of each file (``None`` if it failed to load), in the order requested.
+    """
+    return dict(load_json_files_iter(folder, filenames, max_workers, use_processes, chunk_size,
+                                     snapshot=snapshot))
+
+
+class _JsonStreamReader:
+    """Incrementally reads json values from a file, keeping only a small window of it in memory."""
+
+    _WHITESPACE = re.compile(r'\s*')
+    _CONTAINER_SPECIAL = re.compile(r'["\[\]{}]')
+    _STRING_SPECIAL = re.compile(r'["\\]')
+    _NUMBER_CHARS = frozenset('.eE+-0123456789')
 
-def save_json_file(folder: str, filename: str, data: [dict, list[dict]], indent: Optional[int] = 4) -> bool:
+    def __init__(self, file: TextIO, chunk_size: int):
+        self._file = file
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size: Optional[int] = None) -> bool:
+        """Reads more of the file into the buffer, dropping what's been consumed. Returns False at EOF."""
+        if self._eof:
+            return False
+        chunk = self._file.read(size or self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Skips any whitespace, and returns the next character, or '' at the end of the file."""
+        while True:
+            self._pos = self._WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or not self._fill():
+                return self._buf[self._pos:self._pos + 1]
+
+    def expect(self, chars: str) -> str:
+        """Consumes the next character, which must be one of ``chars``."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r}, found {char!r}.")
+        self._pos += 1
+        return char
+
+    def decode(self) -> Any:
+        """Decodes the next json value, reading more of the file until it's complete."""
+        self.peek()
+        size = self._chunk_size
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number may be cut short by the end of the buffer, eg. '1.' of '1.5', or '2e' of '2e10'.
+                truncated = isinstance(value, (int, float)) and \
+                    (end >= len(self._buf) or self._buf[end] in self._NUMBER_CHARS)
+                if self._eof or not truncated:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            # Grow the reads, so large values don't need too many attempts to decode.
+            self._fill(size)
+            size *= 2
+
+    def skip(self) -> None:
+        """Skips over the next json value, without decoding it."""
+        if self.peek() not in '[{':
+            self.decode()
+            return
+
+        depth = 0
+        pattern = self._CONTAINER_SPECIAL
+        while True:
+            match = pattern.search(self._buf, self._pos)
+            if match is None:
+                self._pos = len(self._buf)
+                if not self._fill():
+                    raise ValueError("Unexpected end of file.")
+                continue
+
+            char = match.group()
+            self._pos = match.end()
+            if pattern is self._STRING_SPECIAL:
+                if char == '"':
+                    pattern = self._CONTAINER_SPECIAL
+                elif self._pos >= len(self._buf) and not self._fill():
+                    raise ValueError("Unexpected end of file.")
+                else:
+                    self._pos += 1  # Skip the escaped character.
+            elif char == '"':
+                pattern = self._STRING_SPECIAL
+            elif char in '[{':
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def find_key(self, key: str) -> None:
+        """Moves to the value of ``key`` in the object which starts at the current position."""
+        self.expect('{')
+        if self.peek() == '}':
+            raise KeyError(key)
+        while True:
+            name = self.decode()
+            self.expect(':')
+            if name == key:
+                return
+            self.skip()
+            if self.expect(',}') == '}':
+                raise KeyError(key)
+
+    def iter_array(self) -> Iterator[Any]:
+        """Yields each element of the array which starts at the current position."""
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.decode()
+            if self.expect(',]') == ']':
+                return
+
+
+def iter_json_file(folder: str, filename: str, key_path: Union[str, Sequence[str], None] = None,
+                   lines: Optional[bool] = None, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """
+    Lazily yields the elements of a json array from a file, one at a time.
+
+    Only the element being decoded is held in memory, rather than the whole file, which
+    allows iterating over files much larger than the available memory.
+
+    If the array isn't at the top level of the file, ``key_path`` gives the keys of the
+    nested objects to follow to reach it. Any values skipped along the way aren't decoded.
+
+    Files in the JSON Lines format yield each line's value instead. This is detected from
+    the ``.jsonl`` and ``.ndjson`` extensions, unless ``lines`` is provided. Compressed files
+    are handled as in ``load_json_file``.
+
+    Like ``load_json_file``, errors are logged rather than raised, and stop the iteration.
+
+    :param folder: The folder the json file is in.
+    :param filename: The name of the json file (including filetype).
+    :param key_path: The key, or sequence of keys, leading to the array to iterate over.
+    :param lines: Whether the file is in the JSON Lines format. Uses the extension if None.
+    :param chunk_size: The number of characters to read from the file at a time.
+    :return: An iterator over the elements of the array.
+    """
+    filepath = path.join(folder, filename)
+    compression = _get_compression(filename)
+    if lines is None:
+        base_name = path.splitext(filename)[0] if compression else filename
+        lines = base_name.endswith(JSON_LINES_EXTENSIONS)
+    if isinstance(key_path, str):
+        key_path = (key_path,)
+
+    try:
+        with _open_text(filepath, 'r', compression) as f:
+            if lines:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                reader = _JsonStreamReader(f, chunk_size)
+                for key in key_path or ():
+                    reader.find_key(key)
+                yield from reader.iter_array()
+        logging.log(LogLvl.VERBOSE, f'File {filename} read successfully.')
+    except Exception as ex:
+        logging.error(f'Error reading json file {filename}')
+        logging.error(ex)
+
+
+def save_json_file(folder: str, filename: str, data: [dict, list[dict]], indent: Optional[int] = 4,
+                   compression: Optional[str] = None) -> bool:
     """
     Saves provided data into the specified json file.
 
+    The json is streamed to a temporary file, one top-level element at a time, which then
+    replaces the original file. If writing fails, the original file is left untouched.
+
     :param folder: The folder the json file is in.
     :param filename: The name of the json file (including filetype).
     :param data: The object to be saved as json.
     :param indent: The indenting to use for the json.
+    :param compression: The compression to use, one of 'gzip', 'bz2' or 'lzma'. Uses the
+        file extension (``.gz``, ``.bz2`` or ``.xz``) if None.
     :return: Whether the save operation was successful.
     """
     filepath = path.join(folder, filename)
 
     try:
-        with open(filepath, 'w', encoding=ENCODING) as f:
-            f.write(json.dumps(data, indent=indent))
-            f.close()
-        logging.verbose(f'File {filename} written to.')
+        with atomic_write(filepath, _get_compression(filename, compression)) as f:
+            _write_json(f, data, indent)
+        logging.log(LogLvl.VERBOSE, f'File {filename} written to.')
         return True
     except Exception as ex:
         logging.error(f'Error writing to json file {filename}')
@@ -128,14 +762,116 @@ def save_json_file(folder: str, filename: str, data: [dict, list[dict]], indent:
         return False
 
 
+class JsonArrayWriter:
+    """
+    Incrementally writes records to a json array file, without holding them all in memory.
+
+    The records are written to a temporary file, which replaces the target file when the
+    writer is closed. If the writer is used as a context manager and an exception is
+    raised, the temporary file is discarded instead, and the target file is left untouched.
+
+    Example Usage::
+
+        with JsonArrayWriter(folder, 'picks.json.gz') as writer:
+            for record in generate_records():
+                writer.write(record)
+    """
+
+    def __init__(self, folder: str, filename: str, indent: Optional[int] = 4, compression: Optional[str] = None):
+        """
+        Opens the temporary file to write the records into.
+
+        :param folder: The folder the json file is in.
+        :param filename: The name of the json file (including filetype).
+        :param indent: The indenting to use for the json.
+        :param compression: The compression to use, as in ``save_json_file``.
+        """
+        self.filename = filename
+        self.count = 0
+        self._indent = _indent_str(indent)
+        self._context = atomic_write(path.join(folder, filename), _get_compression(filename, compression))
+        self._file = self._context.__enter__()
+        self._file.write('[')
+
+    def write(self, record: Any) -> None:
+        """
+        Appends a record to the array.
+
+        :param record: The object to be saved as json.
+        """
+        item = _dump_item(record, self._indent)
+        if self._indent is None:
+            self._file.write(item if not self.count else json_backend.separators()[0] + item)
+        else:
+            self._file.write(('\n' if not self.count else ',\n') + self._indent + item)
+        self.count += 1
+
+    def write_all(self, records: Iterable[Any]) -> None:
+        """
+        Appends each record from an iterable to the array.
+
+        :param records: The objects to be saved as json.
+        """
+        for record in records:
+            self.write(record)
+
+    def close(self) -> None:
+        """Finishes the array, and replaces the target file with it."""
+        if self.count and self._indent is not None:
+            self._file.write('\n')
+        self._file.write(']')
+        self._context.__exit__(None, None, None)
+        logging.log(LogLvl.VERBOSE, f'File {self.filename} written to.')
+
+    def abort(self, ex: Optional[BaseException] = None) -> None:
+        """Discards the records written, leaving the target file untouched."""
+        ex = ex or RuntimeError('Writing aborted.')
+        self._context.__exit__(type(ex), ex, ex.__traceback__)
+
+    def __enter__(self) -> 'JsonArrayWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_val is None:
+            self.close()
+        else:
+            logging.error(f'Error writing to json file {self.filename}')
+            logging.error(exc_val)
+            self.abort(exc_val)
+
+
 def reformat_json_file(folder: str, filename: str, indent: Optional[int] = 4) -> None:
     """
     Re-writes the json file in question, if it can be parsed, with the provided indents.
 
+    Files containing a top-level array are streamed element by element, so only one
+    element is held in memory at a time.
+
     :param folder: The folder the json file is in.
     :param filename: The name of the json file (including filetype).
     :param indent: The indenting to use for the json.
     """
+    filepath = path.join(folder, filename)
+    compression = _get_compression(filename)
+
+    try:
+        with _open_text(filepath, 'r', compression) as f:
+            is_array = _JsonStreamReader(f, 1 << 10).peek() == '['
+        if is_array:
+            with atomic_write(filepath, compression) as out:
+                with _open_text(filepath, 'r', compression) as f:
+                    reader = _JsonStreamReader(f, 1 << 16)
+                    _write_json(out, reader.iter_array(), indent)
+                    # Like ``load_json_file``, refuse files with anything after the array.
+                    if reader.peek():
+                        raise ValueError(f"Extra data after the array, starting with {reader.peek()!r}.")
+            logging.log(LogLvl.VERBOSE, f'File {filename} written to.')
+            return
+    except Exception as ex:
+        logging.error(f'Error reformatting json file {filename}')
+        logging.error(ex)
+        return
+
     data = load_json_file(folder, filename)
     if data:
         save_json_file(folder, filename, data, indent=indent)
@@ -164,6 +900,91 @@ def isolate_string(text: str, isolate_from: str = None, isolate_to: str = None):
     return truncated_text
 
 
+class StringExtractor:
+    """
+    Isolates several named portions of strings, using the same rules as ``isolate_string``.
+
+    The markers for each field are prepared once, and each distinct ``from`` marker is
+    only searched for once per string, even if several fields share it. This makes the
+    extractor suited to pulling many fields out of many large documents.
+
+    Example Usage::
+
+        extractor = StringExtractor({
+            'name': ('<h1>', '</h1>'),
+            'cost': ('<span class="mana">', '</span>'),
+        })
+        fields = extractor.extract(html)  # {'name': ..., 'cost': ...}
+    """
+
+    def __init__(self, fields: dict[str, tuple[Optional[str], Optional[str]]]):
+        """
+        :param fields: The names of the fields, mapped to the strings to isolate them from and to.
+        """
+        self.fields = {name: (isolate_from or None, isolate_to or None)
+                       for name, (isolate_from, isolate_to) in fields.items()}
+        self._from_markers = list(dict.fromkeys(marker for marker, _ in self.fields.values() if marker))
+
+    def _find_starts(self, text: str) -> dict[str, int]:
+        """Finds where each field starts, from the first instance of each ``from`` marker (-1 if missing)."""
+        starts = dict()
+        for marker in self._from_markers:
+            idx = text.find(marker)
+            starts[marker] = idx + len(marker) if idx >= 0 else -1
+        return starts
+
+    def extract(self, text: str, strict: bool = True) -> dict[str, Optional[str]]:
+        """
+        Isolates each field from a string.
+
+        :param text: The text to isolate the fields from.
+        :param strict: Whether to raise an error if a field's markers aren't found, rather
+            than giving the field a value of None.
+        :return: The isolated strings, keyed by the name of the field.
+        :raises ValueError: Raised if ``strict`` and a field's markers can't be found, as ``isolate_string`` does.
+        """
+        starts = self._find_starts(text)
+        out = dict()
+        for name, (isolate_from, isolate_to) in self.fields.items():
+            start_idx = starts[isolate_from] if isolate_from else None
+            try:
+                if start_idx == -1:
+                    raise ValueError('substring not found')
+                end_idx = text.index(isolate_to, start_idx) if isolate_to else None
+            except ValueError:
+                if strict:
+                    raise
+                out[name] = None
+                continue
+            out[name] = text[start_idx:end_idx].strip()
+        return out
+
+    def extract_many(self, texts: Iterable[str], strict: bool = True, max_workers: Optional[int] = 1,
+                     chunk_size: int = 16) -> Iterator[dict[str, Optional[str]]]:
+        """
+        Isolates each field from many strings, yielding the results in order.
+
+        With a ``max_workers`` other than 1, the strings are processed in parallel in a
+        process pool, which is worthwhile for many large documents. All of ``texts`` is
+        then read up front.
+
+        :param texts: The texts to isolate the fields from.
+        :param strict: Whether to raise an error if a field's markers aren't found. See ``extract``.
+        :param max_workers: The number of processes to use. Runs in this process if 1, or
+            uses the executor's default if None.
+        :param chunk_size: The number of texts sent to a process at a time.
+        :return: An iterator of the isolated strings of each text.
+        """
+        if max_workers == 1:
+            for text in texts:
+                yield self.extract(text, strict)
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            yield from executor.map(partial(self.extract, strict=strict), texts, chunksize=chunk_size)
+
+
 def format_seconds(seconds: float) -> tuple[float, str]:
     """
     Converts an amount of second to a more natural time value and unit (up to days).
@@ -0,0 +1,157 @@
+from typing import Any, Optional, Union
+from math import isfinite
+from os import environ
+import json
+
+from core.utilities.auto_logging import logging
+
+try:
+    import orjson
+except ImportError:  # pragma: nocover
+    orjson = None
+
+# The environment variable which can force a particular backend, using one of the names below.
+BACKEND_ENV_VAR = 'WUBRG_JSON_BACKEND'
+STDLIB = 'stdlib'
+ORJSON = 'orjson'
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+    _ORJSON_INDENTED_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+
+# Marks a level of indenting in orjson's output. Never in the output otherwise, as orjson escapes control characters.
+_INDENT_MARK = b'\x00'
+
+# Maps every digit to '0', so a run of digits too long for orjson to read exactly can be found with ``in``.
+_DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+_LONG_DIGITS = b'0' * 19
+
+_backend: str = STDLIB
+
+
+def available_backends() -> list[str]:
+    """Gets the names of the json backends which can be used, fastest first."""
+    backends = [STDLIB]
+    if orjson is not None:
+        backends.insert(0, ORJSON)
+    return backends
+
+
+def get_json_backend() -> str:
+    """Gets the name of the json backend currently in use."""
+    return _backend
+
+
+def set_json_backend(name: Optional[str] = None) -> str:
+    """
+    Sets the json backend used by the json helpers in ``funcs``.
+
+    ``json`` is used unless another backend is asked for. ``orjson`` is faster, and gives
+    equal objects, but the json text it writes differs in its separators, escaping and
+    float formatting.
+
+    :param name: The name of the backend to use. Uses ``json`` if None.
+    :return: The name of the backend now in use.
+    :raises ValueError: Raised if the backend is unknown or not installed.
+    """
+    global _backend
+    backends = available_backends()
+    if name is None:
+        name = STDLIB
+    elif name not in backends:
+        raise ValueError(f"Json backend {name!r} is not available! (Available: {backends})")
+    _backend = name
+    logging.debug(f'Using json backend {name}.')
+    return name
+
+
+def loads(json_str: Union[str, bytes]) -> Any:
+    """
+    Parses a json string using the current backend.
+
+    The result always matches ``json.loads``. Anything the fast backends reject (eg. ``NaN``)
+    is retried with ``json``, as is anything with a number too long for them to read exactly.
+
+    :param json_str: The json to parse.
+    :return: The parsed object.
+    :raises ValueError: Raised if the string is not valid json.
+    """
+    if _backend == ORJSON:
+        json_bytes = json_str.encode(errors='surrogatepass') if isinstance(json_str, str) else json_str
+        if _LONG_DIGITS not in json_bytes.translate(_DIGITS_TO_ZERO):
+            try:
+                return orjson.loads(json_bytes)
+            except orjson.JSONDecodeError:
+                pass
+    return json.loads(json_str)
+
+
+def _has_non_finite(obj: Any) -> bool:
+    """Whether an object, or anything in it, is a float which isn't finite (eg. ``NaN``)."""
+    if type(obj) is float:
+        return not isfinite(obj)
+    stack = [obj]
+    while stack:
+        values = stack.pop()
+        for value in values.values() if type(values) is dict else values:
+            value_type = type(value)
+            if value_type is float:
+                if not isfinite(value):
+                    return True
+            elif value_type is dict or value_type is list or value_type is tuple:
+                stack.append(value)
+    return False
+
+
+def _reindent(json_bytes: bytes, indent: Union[int, str]) -> bytes:
+    """Changes the indenting of json written by orjson, which is always 2 spaces, to that of ``json.dumps``."""
+    if isinstance(indent, int):
+        indent = ' ' * indent
+    if indent == '  ':
+        return json_bytes
+    # The indenting of each line is swapped for a mark per level, then each mark for the new indent.
+    json_bytes = json_bytes.replace(b'\n  ', b'\n' + _INDENT_MARK)
+    while _INDENT_MARK + b'  ' in json_bytes:
+        json_bytes = json_bytes.replace(_INDENT_MARK + b'  ', _INDENT_MARK * 2)
+    return json_bytes.replace(_INDENT_MARK, indent.encode())
+
+
+def dumps(obj: Any, indent: Union[int, str, None] = None) -> str:
+    """
+    Serialises an object to json using the current backend.
+
+    The output parses back to an object equal to that of ``json.dumps``, and is indented
+    the same way, but with the fast backends its text may differ. Anything they can't write
+    exactly (eg. ``NaN``, which ``orjson`` writes as ``null``) is handled by ``json``.
+
+    :param obj: The object to serialise.
+    :param indent: The indenting to use for the json.
+    :return: The json string.
+    :raises TypeError: Raised if the object can't be serialised.
+    """
+    if _backend == ORJSON:
+        try:
+            json_bytes = orjson.dumps(obj, option=_ORJSON_OPTIONS if indent is None else _ORJSON_INDENTED_OPTIONS)
+        except orjson.JSONEncodeError:
+            json_bytes = None
+        # Non-finite floats are written as null, so null can only be trusted if there are none.
+        if json_bytes is not None and (b'null' not in json_bytes or not _has_non_finite(obj)):
+            return (json_bytes if indent is None else _reindent(json_bytes, indent)).decode()
+    if indent is None and _backend == ORJSON:
+        # Matches the separators of orjson, so the output of each backend is consistent.
+        return json.dumps(obj, separators=separators())
+    return json.dumps(obj, indent=indent)
+
+
+def separators() -> tuple[str, str]:
+    """
+    Gets the separators the current backend writes between items, and between keys and values, without an indent.
+
+    :return: The item separator and the key separator.
+    """
+    if _backend == ORJSON:
+        return ',', ':'
+    return ', ', ': '
+
+
+set_json_backend(environ.get(BACKEND_ENV_VAR) or None)
@@ -0,0 +1,463 @@
+from typing import Any, BinaryIO, Callable, Hashable, Iterable, Iterator, Optional, Union
+from os import fsync, listdir, makedirs, path, remove
+from threading import Event, RLock, Thread
+import re
+
+from core.utilities import json_backend
+from core.utilities.auto_logging import LogLvl, logging
+from core.utilities.funcs import ENCODING, JsonArrayWriter, atomic_write, load_json_file, save_json_file
+
+INDEX_FILE = 'index.json'
+INDEX_VERSION = 1
+_SEGMENT_NAME = re.compile(r'^segment-(\d+)\.jsonl$')
+
+
+def _segment_name(seg_id: int) -> str:
+    """Gets the filename of a segment."""
+    return f'segment-{seg_id:06d}.jsonl'
+
+
+class RecordStore:
+    """
+    An append-only store of json records, kept in a folder of JSON Lines segments.
+
+    Appending a record writes a single line to the end of the newest segment, rather than
+    rewriting the whole dataset. Once a segment grows past ``max_segment_bytes``, a new one
+    is started.
+
+    If ``key`` is given (the name of a field, or a function of a record), the store keeps an
+    index of where the latest record of each key is, so records can be looked up by key, and
+    appending a record with an existing key replaces it. Replaced records stay on disk until
+    the store is compacted, which rewrites the live records into new segments.
+
+    The index is saved in ``index.json`` when a segment is finished, and when the store is
+    flushed, compacted or closed. When the store is opened, only the records written since
+    the index was last saved are scanned. Keys are saved as json, so should be strings or
+    numbers.
+
+    The store can be safely shared between threads, but not between processes.
+
+    Example Usage::
+
+        with RecordStore('data/drafts', key='draft_id') as store:
+            store.append({'draft_id': 'abc', 'picks': [...]})
+            draft = store.get('abc')
+            store.export('data', 'drafts.json')
+    """
+
+    def __init__(self, folder: str, key: Union[str, Callable[[Any], Hashable], None] = None,
+                 max_segment_bytes: int = 64 << 20, durable: bool = False):
+        """
+        Opens, or creates, the store in a folder.
+
+        :param folder: The folder the segments are in.
+        :param key: The field, or function, which gives the key of a record. Records are not indexed if None.
+        :param max_segment_bytes: The size a segment can grow to, before a new one is started.
+        :param durable: Whether to ``fsync`` after every append, so records survive a power loss.
+        """
+        self.folder = folder
+        self.max_segment_bytes = max_segment_bytes
+        self.durable = durable
+        if isinstance(key, str):
+            field = key
+            key = lambda record: record[field]  # noqa: E731
+        self._key = key
+
+        self._lock = RLock()
+        self._index: dict[Hashable, tuple[int, int, int]] = dict()
+        self._segment_sizes: dict[int, int] = dict()
+        self._count = 0
+        self._stale = 0
+        self._writer: Optional[BinaryIO] = None
+        self._readers: dict[int, BinaryIO] = dict()
+        self._stop_compaction: Optional[Event] = None
+        # Segments replaced by a compaction are only removed once no iteration is reading them.
+        self._iterating = 0
+        self._retired: list[int] = []
+
+        makedirs(folder, exist_ok=True)
+        self._load()
+
+    # region Opening
+    def _load(self) -> None:
+        """Loads the saved index, and scans any records written since it was saved."""
+        on_disk = sorted(int(match[1]) for match in map(_SEGMENT_NAME.match, listdir(self.folder)) if match)
+        saved = None
+        if path.exists(path.join(self.folder, INDEX_FILE)):
+            saved = load_json_file(self.folder, INDEX_FILE)
+        is_valid = isinstance(saved, dict) and saved.get('version') == INDEX_VERSION
+        if not is_valid or saved.get('keyed') != (self._key is not None):
+            saved = None
+
+        scan_from: dict[int, int] = {seg_id: 0 for seg_id in on_disk}
+        if saved is not None:
+            sizes = {int(seg_id): size for seg_id, size in saved['segments'].items()}
+            if all(seg_id in scan_from for seg_id in sizes):
+                self._count = saved['count']
+                self._stale = saved['stale']
+                self._index = {tuple(key) if isinstance(key, list) else key: (seg_id, offset, length)
+                               for key, seg_id, offset, length in saved['index']}
+                # Segments older than the saved ones were replaced by a compaction, which was interrupted.
+                first = min(sizes, default=0)
+                for seg_id in [seg_id for seg_id in on_disk if seg_id < first]:
+                    remove(path.join(self.folder, _segment_name(seg_id)))
+                    del scan_from[seg_id]
+                scan_from.update(sizes)
+            else:
+                logging.warning(f'Index of {self.folder} is out of date, rebuilding it.')
+
+        for seg_id, offset in scan_from.items():
+            self._scan(seg_id, offset)
+        logging.log(LogLvl.VERBOSE, f'Record store {self.folder} opened with {len(self)} records.')
+
+    def _scan(self, seg_id: int, offset: int) -> None:
+        """Indexes the records of a segment from an offset, truncating any partially written record."""
+        filepath = path.join(self.folder, _segment_name(seg_id))
+        with open(filepath, 'rb+') as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    logging.warning(f'Removing a partially written record from {_segment_name(seg_id)}.')
+                    f.truncate(offset)
+                    break
+                try:
+                    record = json_backend.loads(line.decode(ENCODING))
+                    key = self._key_of(record) if self._key is not None else None
+                except Exception as ex:
+                    logging.warning(f'Skipping an invalid record at {offset} of {_segment_name(seg_id)}: {ex!r}')
+                else:
+                    self._add(key, seg_id, offset, len(line))
+                offset += len(line)
+        self._segment_sizes[seg_id] = offset
+    # endregion Opening
+
+    # region Writing
+    def _key_of(self, record: Any) -> Hashable:
+        """Gets the key of a record, raising a KeyError or TypeError if it can't be indexed."""
+        key = self._key(record)
+        hash(key)
+        return key
+
+    def _add(self, key: Hashable, seg_id: int, offset: int, length: int) -> None:
+        """Adds the key of a record written at a position to the index."""
+        if self._key is None:
+            self._count += 1
+            return
+        if self._index.setdefault(key, (seg_id, offset, length)) != (seg_id, offset, length):
+            self._index[key] = (seg_id, offset, length)
+            self._stale += 1
+
+    def _active_segment(self) -> int:
+        """Gets the segment to append to, starting a new one if the newest is full."""
+        seg_id = max(self._segment_sizes, default=0)
+        finished = seg_id and self._segment_sizes[seg_id] >= self.max_segment_bytes
+        if finished or not seg_id:
+            self._close_writer()
+            seg_id += 1
+            self._segment_sizes[seg_id] = 0
+        if self._writer is None:
+            self._writer = open(path.join(self.folder, _segment_name(seg_id)), 'ab')
+        if finished:
+            self._save_index()
+        return seg_id
+
+    def append(self, record: Any) -> None:
+        """
+        Appends a record to the store, replacing any record with the same key.
+
+        :param record: The record to append. Must be serialisable as json.
+        :raises KeyError: Raised if the record has no ``key`` field.
+        :raises TypeError: Raised if the key of the record isn't hashable.
+        """
+        # Checked before writing, so a record which can't be indexed never reaches the disk.
+        key = self._key_of(record) if self._key is not None else None
+        line = json_backend.dumps(record).encode(ENCODING) + b'\n'
+        with self._lock:
+            seg_id = self._active_segment()
+            offset = self._segment_sizes[seg_id]
+            self._writer.write(line)
+            self._writer.flush()
+            if self.durable:
+                fsync(self._writer.fileno())
+            self._segment_sizes[seg_id] = offset + len(line)
+            self._add(key, seg_id, offset, len(line))
+
+    def extend(self, records: Iterable[Any]) -> int:
+        """
+        Appends many records to the store.
+
+        :param records: The records to append.
+        :return: The number of records appended.
+        """
+        count = 0
+        for record in records:
+            self.append(record)
+            count += 1
+        return count
+
+    def _close_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+    # endregion Writing
+
+    # region Reading
+    def _read(self, seg_id: int, offset: int, length: int) -> Any:
+        """Reads the record at a position."""
+        reader = self._readers.get(seg_id)
+        if reader is None:
+            reader = self._readers[seg_id] = open(path.join(self.folder, _segment_name(seg_id)), 'rb')
+        reader.seek(offset)
+        return json_backend.loads(reader.read(length).decode(ENCODING))
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Gets the latest record with a key.
+
+        :param key: The key of the record.
+        :param default: The value to return if there's no record with the key.
+        :return: The record, or the default.
+        :raises TypeError: Raised if the store has no ``key``.
+        """
+        if self._key is None:
+            raise TypeError('Records can only be looked up by key in a keyed store!')
+        with self._lock:
+            position = self._index.get(key)
+            if position is None:
+                return default
+            return self._read(*position)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index) if self._key is not None else self._count
+
+    def keys(self) -> list[Hashable]:
+        """Gets the keys of the records, in the order they were first appended."""
+        with self._lock:
+            return list(self._index)
+
+    def _iter_live(self, index: dict[Hashable, tuple[int, int, int]], sizes: dict[int, int]) -> Iterator[Any]:
+        """Yields the records which are live in an index, reading no further than the sizes of the segments."""
+        for seg_id, size in sorted(sizes.items()):
+            offset = 0
+            with open(path.join(self.folder, _segment_name(seg_id)), 'rb') as f:
+                for line in f:
+                    if offset >= size:
+                        break
+                    try:
+                        record = json_backend.loads(line.decode(ENCODING))
+                        live = self._key is None or index.get(self._key_of(record)) == (seg_id, offset, len(line))
+                    except Exception:
+                        # Skipped, and logged, when the segment was scanned.
+                        live = False
+                    if live:
+                        yield record
+                    offset += len(line)
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Yields the live records, in the order they were appended.
+
+        Records appended or replaced while iterating may or may not be included. If the
+        store is compacted while iterating, the records are still read from the old segments,
+        which are removed once every iteration over them has finished.
+        """
+        with self._lock:
+            index, sizes = self._index, dict(self._segment_sizes)
+            if self._writer is not None:
+                self._writer.flush()
+            self._iterating += 1
+        try:
+            yield from self._iter_live(index, sizes)
+        finally:
+            with self._lock:
+                self._iterating -= 1
+                if not self._iterating:
+                    self._remove_segments(self._retired)
+                    self._retired = []
+    # endregion Reading
+
+    # region Maintenance
+    def _save_index(self) -> None:
+        """Saves the index, so it doesn't need to be rebuilt when the store is next opened."""
+        save_json_file(self.folder, INDEX_FILE, {
+            'version': INDEX_VERSION,
+            'keyed': self._key is not None,
+            'count': self._count,
+            'stale': self._stale,
+            'segments': {str(seg_id): size for seg_id, size in self._segment_sizes.items()},
+            'index': [[key, *position] for key, position in self._index.items()],
+        }, indent=None)
+
+    def flush(self) -> None:
+        """Saves the index, and makes sure every record appended is written to disk."""
+        with self._lock:
+            if self._writer is not None:
+                self._writer.flush()
+                fsync(self._writer.fileno())
+            self._save_index()
+
+    @property
+    def stale_ratio(self) -> float:
+        """The fraction of the records on disk which have been replaced, and would be removed by compacting."""
+        total = len(self) + self._stale
+        return self._stale / total if total else 0.0
+
+    def _remove_segments(self, seg_ids: Iterable[int]) -> None:
+        """Removes the files of segments which are no longer in use."""
+        for seg_id in seg_ids:
+            remove(path.join(self.folder, _segment_name(seg_id)))
+
+    def compact(self) -> int:
+        """
+        Rewrites the live records into new segments, removing any replaced records.
+
+        The new segments are written before the index is switched over to them, so if
+        compaction is interrupted, the store is left as it was. Stores without a ``key``
+        never have replaced records, so are left as they are.
+
+        :return: The number of replaced records removed.
+        """
+        with self._lock:
+            removed = self._stale
+            if self._key is None or not removed:
+                return 0
+
+            self._close_writer()
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+
+            old_index, old_sizes = self._index, self._segment_sizes
+            live = self._iter_live(old_index, old_sizes)
+            self._index, self._segment_sizes, self._stale = dict(), dict(), 0
+            seg_id = max(old_sizes, default=0)
+            context = out = None
+            size = 0
+            try:
+                for record in live:
+                    line = json_backend.dumps(record).encode(ENCODING) + b'\n'
+                    if out is None or size + len(line) > self.max_segment_bytes:
+                        if context is not None:
+                            context.__exit__(None, None, None)
+                        seg_id, size = seg_id + 1, 0
+                        self._segment_sizes[seg_id] = 0
+                        context = atomic_write(path.join(self.folder, _segment_name(seg_id)), binary=True)
+                        out = context.__enter__()
+                    out.write(line)
+                    self._add(self._key_of(record), seg_id, size, len(line))
+                    size += len(line)
+                    self._segment_sizes[seg_id] = size
+                if context is not None:
+                    context.__exit__(None, None, None)
+            except BaseException as ex:
+                if context is not None:
+                    context.__exit__(type(ex), ex, ex.__traceback__)
+                for new_id in self._segment_sizes:
+                    if path.exists(path.join(self.folder, _segment_name(new_id))):
+                        remove(path.join(self.folder, _segment_name(new_id)))
+                self._index, self._segment_sizes, self._stale = old_index, old_sizes, removed
+                raise
+
+            self._save_index()
+            if self._iterating:
+                self._retired.extend(old_sizes)
+            else:
+                self._remove_segments(old_sizes)
+        logging.log(LogLvl.VERBOSE, f'Record store {self.folder} compacted, removing {removed} records.')
+        return removed
+
+    def compact_if_needed(self, min_stale_ratio: float = 0.5) -> int:
+        """
+        Compacts the store, if enough of its records have been replaced.
+
+        :param min_stale_ratio: The fraction of records which must have been replaced.
+        :return: The number of replaced records removed.
+        """
+        if self._stale and self.stale_ratio >= min_stale_ratio:
+            return self.compact()
+        return 0
+
+    def start_background_compaction(self, interval: float, min_stale_ratio: float = 0.5) -> None:
+        """
+        Starts a background thread which periodically compacts the store, if needed.
+
+        :param interval: The number of seconds between checks.
+        :param min_stale_ratio: The fraction of records which must have been replaced to compact.
+        """
+        self.stop_background_compaction()
+        stop = self._stop_compaction = Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.compact_if_needed(min_stale_ratio)
+                except Exception as ex:
+                    logging.error(f'Error compacting record store {self.folder}')
+                    logging.error(ex)
+
+        Thread(target=run, name='record-store-compaction', daemon=True).start()
+
+    def stop_background_compaction(self) -> None:
+        """Stops the background compaction, if it is running."""
+        if self._stop_compaction is not None:
+            self._stop_compaction.set()
+            self._stop_compaction = None
+    # endregion Maintenance
+
+    # region Import and Export
+    def export(self, folder: str, filename: str, indent: Optional[int] = 4,
+               compression: Optional[str] = None) -> bool:
+        """
+        Writes the live records to a regular json file, as a single array.
+
+        The file can be read with ``load_json_file`` or ``iter_json_file``, and reformatted
+        with ``reformat_json_file``.
+
+        :param folder: The folder the json file is in.
+        :param filename: The name of the json file (including filetype).
+        :param indent: The indenting to use for the json.
+        :param compression: The compression to use, as in ``save_json_file``.
+        :return: Whether the export was successful.
+        """
+        try:
+            with JsonArrayWriter(folder, filename, indent, compression) as writer:
+                for record in self:
+                    writer.write(record)
+            return True
+        except Exception:
+            # Already logged by the writer.
+            return False
+
+    def import_records(self, records: Iterable[Any]) -> int:
+        """
+        Appends the records of an existing dataset, eg. from ``iter_json_file``, then saves the index.
+
+        :param records: The records to append.
+        :return: The number of records appended.
+        """
+        count = self.extend(records)
+        self.flush()
+        return count
+    # endregion Import and Export
+
+    def close(self) -> None:
+        """Stops any background compaction, saves the index, and closes the segments."""
+        self.stop_background_compaction()
+        with self._lock:
+            self.flush()
+            self._close_writer()
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+
+    def __enter__(self) -> 'RecordStore':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.folder!r}, records={len(self)}, segments={len(self._segment_sizes)})"
@@ -0,0 +1,89 @@
+from functools import wraps
+from unittest import TestLoader
+import logging
+
+
+# Adapted from: https://codereview.stackexchange.com/questions/122532/controlling-the-order-of-unittest-testcases
+def custom_order_tests(loader: TestLoader, ordering_dict: dict = None):
+    """
+    Returns a parameterizable decorator which is to be placed before test functions.
+
+    The returned function takes in an optional int, which specifies the index for
+    the test. If no index is provided, the test is assigned the maximum value among
+    indexes plus one, placing it as the last test to be run. Attempting to assign a
+    an index which is already taken will raise an AssertionError.
+
+    The returned function, itself, returns the decorator that's used. If tests only
+    need to be ran in the order they're written in the file, that decorator can
+    be extracted and used, instead of using the parameterized version.
+
+    :param loader: The TestLoader to set the ordering for.
+    :param ordering_dict: The dictionary to contain the ordering. If not provided, will be automatically created.
+    :return: A parameterizable decorator to be placed before a test function.
+
+    Example Usage::
+
+        ordered = testing.custom_order_tests(unittest.defaultTestLoader)
+        auto_ordered = ordered()  # Getting the underlying decorator.
+
+        @ordered(-1)  # The parameterizable decorator, with value.
+        def test_true(self):
+            self.assertTrue(True)
+
+        @auto_ordered  # The 'unpacked' decorator.
+        def test_false(self):
+            self.assertFalse(False)
+
+        @ordered()  # The parameterized decorator using the default.
+        def test_equal(self):
+            self.assertEqual(True, False)
+    """
+    if ordering_dict is None:
+        ordering_dict = dict()
+
+    def compare(a, b):
+        """Handles index comparisons, placing un-indexed functions last."""
+        try:
+            return ordering_dict[a] - ordering_dict[b]
+        except KeyError:  # Handles if undecorated tests are run.
+            if a in ordering_dict:
+                return -1
+            else:
+                return 1
+
+    def custom_orderer(idx: int = None):
+        """
+        The parameterizable decorator.
+
+        :param idx: The index to assign the test.
+        :return: The decorator to apply.
+        :raises AssertionError: Raised if the ``idx`` is already in use.
+        """
+        if idx is None:
+            if ordering_dict.values():
+                idx = max(ordering_dict.values()) + 1
+            else:
+                idx = 1
+        else:
+            assert idx not in ordering_dict.values(), f"Index {idx} already taken."
+
+        def apply_order(func):
+            """The decorator which applies an order to a test."""
+            logging.debug(f"Adding {func.__name__}: {idx}")
+            ordering_dict[func.__name__] = idx
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                """Logs the execution of the test."""
+                logging.debug(f"Running test {idx}: {func.__name__}...")
+                result = func(*args, **kwargs)
+                return result
+
+            # Marks the test as ordered, so parallel runners keep it with the tests around it.
+            wrapper.test_order = idx
+            return wrapper
+
+        return apply_order
+
+    loader.sortTestMethodsUsing = compare
+    return custom_orderer
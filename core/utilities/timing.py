@@ -0,0 +1,194 @@
+from typing import Optional
+from math import ceil
+from threading import Event, Lock, Thread
+
+from core.utilities.auto_logging import LogLvl, logging
+from core.utilities.funcs import save_json_file
+
+# Each power of two is split into 2 ** SUB_BUCKET_BITS buckets, which bounds the relative
+#  error of the percentiles to about 3%, while keeping a few hundred buckets at most.
+SUB_BUCKET_BITS = 4
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+
+def _bucket_index(value: int) -> int:
+    """Gets the index of the log-linear bucket a (non-negative) value falls into."""
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKET_COUNT + (value >> shift) - SUB_BUCKET_COUNT
+
+
+def _bucket_midpoint(index: int) -> int:
+    """Gets the value in the middle of a bucket, the inverse of ``_bucket_index``."""
+    if index < SUB_BUCKET_COUNT:
+        return index
+    shift = index // SUB_BUCKET_COUNT - 1
+    lower = (index % SUB_BUCKET_COUNT + SUB_BUCKET_COUNT) << shift
+    return lower + ((1 << shift) >> 1)
+
+
+class Histogram:
+    """
+    A streaming histogram of durations in nanoseconds.
+
+    Values are counted in log-linear buckets, so memory use is constant no matter how
+    many values are recorded. The count, total, min and max are exact, while
+    percentiles are accurate to within a few percent.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+        self._buckets: dict[int, int] = dict()
+        self._lock = Lock()
+
+    def record(self, value: int) -> None:
+        """
+        Adds a value to the histogram.
+
+        :param value: The duration to add, in nanoseconds.
+        """
+        value = max(value, 0)
+        idx = _bucket_index(value)
+        with self._lock:
+            if not self.count or value < self.min:
+                self.min = value
+            if value > self.max:
+                self.max = value
+            self.count += 1
+            self.total += value
+            self._buckets[idx] = self._buckets.get(idx, 0) + 1
+
+    def percentile(self, pct: float) -> int:
+        """
+        Gets an estimate of the value at a percentile.
+
+        :param pct: The percentile to get, between 0 and 100.
+        :return: The estimated value, in nanoseconds. 0 if nothing has been recorded.
+        """
+        with self._lock:
+            if not self.count:
+                return 0
+            target = max(1, ceil(self.count * pct / 100))
+            seen = 0
+            for idx in sorted(self._buckets):
+                seen += self._buckets[idx]
+                if seen >= target:
+                    return min(max(_bucket_midpoint(idx), self.min), self.max)
+            return self.max
+
+    @property
+    def mean(self) -> float:
+        """The mean of the recorded values, in nanoseconds."""
+        return self.total / self.count if self.count else 0.0
+
+    def summary(self) -> dict[str, float]:
+        """Gets the count, mean, min, max and common percentiles of the histogram."""
+        return {
+            'count': self.count,
+            'mean_ns': self.mean,
+            'min_ns': self.min,
+            'p50_ns': self.percentile(50),
+            'p95_ns': self.percentile(95),
+            'p99_ns': self.percentile(99),
+            'max_ns': self.max,
+        }
+
+
+class TimingRegistry:
+    """
+    A collection of histograms of function durations, keyed by name.
+
+    The registry can be exported as a json snapshot, or periodically summarised to the
+    logs, rather than logging every call.
+    """
+
+    def __init__(self):
+        self._histograms: dict[str, Histogram] = dict()
+        self._lock = Lock()
+        self._stop_summary: Optional[Event] = None
+
+    def histogram(self, name: str) -> Histogram:
+        """
+        Gets the histogram for a name, creating it if needed.
+
+        :param name: The name of the histogram, usually the qualified name of a function.
+        :return: The histogram.
+        """
+        hist = self._histograms.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self._histograms.setdefault(name, Histogram())
+        return hist
+
+    def record(self, name: str, duration_ns: int) -> None:
+        """
+        Records a duration under a name.
+
+        :param name: The name to record the duration under.
+        :param duration_ns: The duration, in nanoseconds.
+        """
+        self.histogram(name).record(duration_ns)
+
+    def snapshot(self) -> dict[str, dict[str, float]]:
+        """Gets the summaries of every histogram, keyed by name."""
+        with self._lock:
+            histograms = list(self._histograms.items())
+        return {name: hist.summary() for name, hist in sorted(histograms)}
+
+    def reset(self) -> None:
+        """Removes all recorded durations."""
+        with self._lock:
+            self._histograms.clear()
+
+    def save(self, folder: str, filename: str) -> bool:
+        """
+        Saves a snapshot of the registry to a json file.
+
+        :param folder: The folder the json file is in.
+        :param filename: The name of the json file (including filetype).
+        :return: Whether the save operation was successful.
+        """
+        return save_json_file(folder, filename, self.snapshot())
+
+    def log_summary(self, lvl: LogLvl = LogLvl.SPARSE) -> None:
+        """
+        Logs one line per histogram, with its count, mean, percentiles and max.
+
+        :param lvl: The level to log at.
+        """
+        if not logging.getLogger().isEnabledFor(lvl):
+            return
+        for name, summary in self.snapshot().items():
+            logging.log(lvl, f"{name}: n={summary['count']} mean={summary['mean_ns'] / 1e6:.3f}ms "
+                             f"p50={summary['p50_ns'] / 1e6:.3f}ms p95={summary['p95_ns'] / 1e6:.3f}ms "
+                             f"p99={summary['p99_ns'] / 1e6:.3f}ms max={summary['max_ns'] / 1e6:.3f}ms")
+
+    def start_summary_logging(self, interval: float, lvl: LogLvl = LogLvl.SPARSE) -> None:
+        """
+        Starts a background thread which logs a summary of the registry periodically.
+
+        :param interval: The number of seconds between summaries.
+        :param lvl: The level to log at.
+        """
+        self.stop_summary_logging()
+        stop = self._stop_summary = Event()
+
+        def run():
+            while not stop.wait(interval):
+                self.log_summary(lvl)
+
+        Thread(target=run, name='timing-summary', daemon=True).start()
+
+    def stop_summary_logging(self) -> None:
+        """Stops the periodic summaries, if they are running."""
+        if self._stop_summary is not None:
+            self._stop_summary.set()
+            self._stop_summary = None
+
+
+# The process-wide registry, for ``time_execution`` to record into.
+TIMINGS = TimingRegistry()
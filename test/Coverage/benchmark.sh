@@ -0,0 +1,11 @@
+# Move to the root of the project, to simplify path logic.
+cd ../..
+
+# Run the benchmarks, comparing them against the committed baseline.
+#  Any arguments are passed through, eg. `-k "funcs.*"` or `--update-baseline`.
+python -m test.benchmarks "$@"
+status=$?
+
+# Check importing each module stays within its startup budget.
+python -m test.benchmarks.startup || status=1
+exit $status
@@ -7,6 +7,12 @@ coverage_file="Tests/Coverage/.${coverage_type}"
 html_out="Tests/htmlcov/${coverage_type}"
 
 # Discover any unit Tests that exist, and run them.
-coverage run --data-file="${coverage_file}" -m unittest discover
+#  If TEST_WORKERS is set, the tests are split between that many processes, and their coverage combined.
+if [ -n "${TEST_WORKERS}" ]; then
+  coverage run --parallel-mode --concurrency=multiprocessing --data-file="${coverage_file}" -m test.parallel -j "${TEST_WORKERS}"
+  coverage combine --data-file="${coverage_file}"
+else
+  coverage run --data-file="${coverage_file}" -m unittest discover
+fi
 coverage html --data-file="${coverage_file}" --directory="${html_out}"
 exit
@@ -11,10 +11,16 @@ html_out="test/htmlcov/${coverage_type}"
 
 # For each module provided, set the correct test file and run coverage.
 #  If no modules are provided, this step is inherently skipped.
+#  If TEST_WORKERS is set, the tests are split between that many processes, and their coverage combined.
 for module in "${module_names[@]}"
 do
   test_module="test.test_modules.test_${module}"
-  coverage run -a --data-file="${coverage_file}" -m unittest discover "${test_module}"
+  if [ -n "${TEST_WORKERS}" ]; then
+    coverage run --parallel-mode --concurrency=multiprocessing --data-file="${coverage_file}" -m test.parallel "${test_module}" -j "${TEST_WORKERS}"
+    coverage combine --append --data-file="${coverage_file}"
+  else
+    coverage run -a --data-file="${coverage_file}" -m unittest discover "${test_module}"
+  fi
 done
 
 # Output the coverage information to html.
@@ -22,8 +22,14 @@ else
 fi
 
 # Run the coverage program, only if a module was defined.
+#  If TEST_WORKERS is set, the tests are split between that many processes, and their coverage combined.
 if [ -n "${module_name}" ]; then
-  coverage run --data-file="${coverage_file}" -m unittest discover "${to_test}"
+  if [ -n "${TEST_WORKERS}" ]; then
+    coverage run --parallel-mode --concurrency=multiprocessing --data-file="${coverage_file}" -m test.parallel "${to_test}" -j "${TEST_WORKERS}"
+    coverage combine --data-file="${coverage_file}"
+  else
+    coverage run --data-file="${coverage_file}" -m unittest discover "${to_test}"
+  fi
   # TODO: Try and isolate only the file, and not the whole module, when file is provided.
   coverage html --data-file="${coverage_file}" --include="${target_module}","${test_log}"  --directory="${html_out}"
 fi
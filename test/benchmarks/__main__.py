@@ -0,0 +1,5 @@
+import sys
+
+from test.benchmarks.harness import main
+
+sys.exit(main())
@@ -0,0 +1,545 @@
+from typing import Any
+from functools import cmp_to_key
+from itertools import count
+from os import path
+from random import Random
+from tempfile import TemporaryDirectory
+from unittest import TestLoader
+import json
+import logging
+
+from core.utilities import caching, decorators, fetching, funcs, json_backend, record_store, testing, timing
+from core.utilities.auto_logging import LogLvl, add_custom_levels
+from test.benchmarks.harness import benchmark
+from test.helpers.json_server import JsonHandler, start_server
+
+# Seeded, so every run benchmarks the same inputs.
+_RNG = Random(17)
+# Removed automatically when the interpreter exits.
+_TMP = TemporaryDirectory(prefix='wubrg-bench-')
+_file_ids = count()
+
+try:
+    import numpy
+except ImportError:  # pragma: nocover
+    numpy = None
+
+
+def _ints(size: int, high: int = 1000) -> list[int]:
+    """Creates a list of random card IDs."""
+    return [_RNG.randrange(high) for _ in range(size)]
+
+
+def _records(size: int) -> list[dict[str, Any]]:
+    """Creates a list of records, shaped like those of 17Lands card ratings."""
+    return [{
+        'name': f'Card {i}',
+        'color': _RNG.choice(['W', 'U', 'B', 'R', 'G', 'WU', 'BR', '']),
+        'rarity': _RNG.choice(['common', 'uncommon', 'rare', 'mythic']),
+        'seen_count': _RNG.randrange(100000),
+        'avg_pick': round(_RNG.uniform(1, 14), 3),
+        'ever_drawn_win_rate': round(_RNG.uniform(0.4, 0.65), 5),
+        'url': f'https://cards.scryfall.io/large/front/{i}.jpg',
+        'types': ['Creature', 'Human', 'Wizard'],
+    } for i in range(size)]
+
+
+def _drafts(size: int) -> list[dict[str, Any]]:
+    """Creates a list of drafts, shaped like those of 17Lands draft data, with the gaps left as null."""
+    return [{
+        'draft_id': f'{_RNG.getrandbits(64):016x}',
+        'event_type': 'PremierDraft',
+        'rank': _RNG.choice(['gold', 'platinum', 'diamond', None]),
+        'user_game_win_rate_bucket': _RNG.choice([None, 0.48, 0.54, 0.6]),
+        'picks': [{
+            'pick_number': pick % 14,
+            'pick': f'Card {_RNG.randrange(300)}',
+            'pack_card_ids': _ints(14 - pick % 14, 300),
+            'pick_maindeck_rate': _RNG.choice([None, round(_RNG.uniform(0, 1), 3)]),
+        } for pick in range(42)],
+    } for _ in range(size)]
+
+
+def _json_file(data: Any, extension: str = '.json', indent: int = 4) -> tuple[str, str]:
+    """Saves data to a new json file in the temporary folder, and returns its folder and filename."""
+    filename = f'bench_{next(_file_ids)}{extension}'
+    funcs.save_json_file(_TMP.name, filename, data, indent=indent)
+    return _TMP.name, filename
+
+
+def _html(size: int) -> str:
+    """Creates a page of roughly ``size`` characters, with a few fields to isolate near the end."""
+    filler = '<div class="row"><td>filler</td></div>\n' * (size // 40)
+    return (filler + '<h1 class="card-name"> Lightning Bolt </h1>' + filler +
+            '<span class="mana">{R}</span><p class="oracle">Deals 3 damage.</p>')
+
+
+# region funcs: lists
+@benchmark('funcs.flatten_lists', 100, 10000)
+def bench_flatten_lists(size: int):
+    lists = [_ints(10) for _ in range(size // 10)]
+    return lambda: funcs.flatten_lists(lists)
+
+
+@benchmark('funcs.iter_flatten_lists', 100, 10000)
+def bench_iter_flatten_lists(size: int):
+    lists = [_ints(10) for _ in range(size // 10)]
+    return lambda: sum(1 for _ in funcs.iter_flatten_lists(lists))
+
+
+@benchmark('funcs.lists_equal', 100, 10000)
+def bench_lists_equal(size: int):
+    l_lst = _ints(size)
+    r_lst = list(l_lst)
+    return lambda: funcs.lists_equal(l_lst, r_lst)
+
+
+@benchmark('funcs.subtract_lists', 100, 10000)
+def bench_subtract_lists(size: int):
+    l_lst, r_lst = _ints(size), _ints(size // 2)
+    return lambda: funcs.subtract_lists(l_lst, r_lst)
+
+
+@benchmark('funcs.subtract_lists[right_to_left]', 100, 10000)
+def bench_subtract_lists_rtl(size: int):
+    l_lst, r_lst = _ints(size), _ints(size // 2)
+    return lambda: funcs.subtract_lists(l_lst, r_lst, right_to_left=True)
+
+
+@benchmark('funcs.iter_subtract_lists[right_to_left]', 100, 10000)
+def bench_iter_subtract_lists_rtl(size: int):
+    l_lst, r_lst = _ints(size), _ints(size // 2)
+    return lambda: sum(1 for _ in funcs.iter_subtract_lists(l_lst, r_lst, right_to_left=True))
+
+
+@benchmark('funcs.weave_lists', 100, 10000)
+def bench_weave_lists(size: int):
+    l1, l2 = _ints(size), _ints(size)
+    return lambda: funcs.weave_lists(l1, l2)
+
+
+@benchmark('funcs.iter_weave_lists', 100, 10000)
+def bench_iter_weave_lists(size: int):
+    l1, l2 = _ints(size), _ints(size)
+    return lambda: sum(1 for _ in funcs.iter_weave_lists(l1, l2))
+
+
+# Compare these against the pure-Python benchmarks of the same size, to find the crossover point.
+if numpy is not None:
+    @benchmark('funcs.flatten_lists[numpy]', 100, 1000, 10000, 100000)
+    def bench_flatten_lists_numpy(size: int):
+        arrays = [numpy.array(_ints(10)) for _ in range(size // 10)]
+        return lambda: funcs.flatten_lists(arrays)
+
+    @benchmark('funcs.lists_equal[numpy]', 100, 1000, 10000, 100000)
+    def bench_lists_equal_numpy(size: int):
+        l_arr = numpy.array(_ints(size))
+        r_arr = l_arr.copy()
+        return lambda: funcs.lists_equal(l_arr, r_arr)
+
+    @benchmark('funcs.subtract_lists[numpy]', 100, 1000, 10000, 100000)
+    def bench_subtract_lists_numpy(size: int):
+        l_arr, r_arr = numpy.array(_ints(size)), numpy.array(_ints(size // 2))
+        return lambda: funcs.subtract_lists(l_arr, r_arr, right_to_left=True)
+
+    @benchmark('funcs.weave_lists[numpy]', 100, 1000, 10000, 100000)
+    def bench_weave_lists_numpy(size: int):
+        l1, l2 = numpy.array(_ints(size)), numpy.array(_ints(size))
+        return lambda: funcs.weave_lists(l1, l2)
+
+
+@benchmark('funcs.invert_dict', 100, 10000)
+def bench_invert_dict(size: int):
+    d = {f'Card {i}': i for i in range(size)}
+    return lambda: funcs.invert_dict(d)
+# endregion funcs: lists
+
+
+# region funcs: json
+@benchmark('funcs.validate_json', 100, 10000)
+def bench_validate_json(size: int):
+    json_str = json.dumps(_records(size))
+    return lambda: funcs.validate_json(json_str)
+
+
+@benchmark('funcs.validate_json[no_tree]', 100, 10000)
+def bench_validate_json_no_tree(size: int):
+    json_str = json.dumps(_records(size))
+    return lambda: funcs.validate_json(json_str, build_tree=False)
+
+
+def _register_backend_benchmarks(backend: str) -> None:
+    """Registers benchmarks for parsing and serialising json with a particular backend."""
+    def use_backend(func):
+        def wrapper():
+            previous = json_backend.get_json_backend()
+            json_backend.set_json_backend(backend)
+            try:
+                return func()
+            finally:
+                json_backend.set_json_backend(previous)
+        return wrapper
+
+    @benchmark(f'json_backend.loads[{backend}]', 100, 10000)
+    def bench_loads(size: int):
+        json_str = json.dumps(_records(size))
+        return use_backend(lambda: json_backend.loads(json_str))
+
+    @benchmark(f'json_backend.dumps[{backend}]', 100, 10000)
+    def bench_dumps(size: int):
+        records = _records(size)
+        return use_backend(lambda: json_backend.dumps(records))
+
+    @benchmark(f'json_backend.dumps[{backend},drafts]', 10, 1000)
+    def bench_dumps_drafts(size: int):
+        drafts = _drafts(size)
+        return use_backend(lambda: json_backend.dumps(drafts))
+
+    @benchmark(f'json_backend.dumps[{backend},drafts,indent=4]', 10, 1000)
+    def bench_dumps_drafts_indented(size: int):
+        drafts = _drafts(size)
+        return use_backend(lambda: json_backend.dumps(drafts, indent=4))
+
+
+for _backend in json_backend.available_backends():
+    _register_backend_benchmarks(_backend)
+
+
+@benchmark('funcs.load_json_file', 100, 10000, io_bound=True)
+def bench_load_json_file(size: int):
+    folder, filename = _json_file(_records(size))
+    return lambda: funcs.load_json_file(folder, filename)
+
+
+@benchmark('funcs.load_json_file[snapshot]', 100, 10000, io_bound=True)
+def bench_load_json_file_snapshot(size: int):
+    folder, filename = _json_file(_records(size))
+    funcs.load_json_file(folder, filename, snapshot=True)
+    return lambda: funcs.load_json_file(folder, filename, snapshot=True)
+
+
+@benchmark('funcs.load_json_file[gzip]', 100, 10000, io_bound=True)
+def bench_load_json_file_gzip(size: int):
+    folder, filename = _json_file(_records(size), '.json.gz')
+    return lambda: funcs.load_json_file(folder, filename)
+
+
+@benchmark('funcs.iter_json_file', 100, 10000, io_bound=True)
+def bench_iter_json_file(size: int):
+    folder, filename = _json_file({'meta': {'set': 'ONE'}, 'data': _records(size)})
+    return lambda: sum(1 for _ in funcs.iter_json_file(folder, filename, 'data'))
+
+
+@benchmark('funcs.iter_json_file[lines]', 100, 10000, io_bound=True)
+def bench_iter_json_file_lines(size: int):
+    filename = f'bench_{next(_file_ids)}.jsonl'
+    with open(path.join(_TMP.name, filename), 'w', encoding=funcs.ENCODING) as f:
+        f.writelines(json.dumps(record) + '\n' for record in _records(size))
+    return lambda: sum(1 for _ in funcs.iter_json_file(_TMP.name, filename))
+
+
+@benchmark('funcs.load_json_files', 10, 100, io_bound=True)
+def bench_load_json_files(size: int):
+    filenames = [_json_file(_records(100))[1] for _ in range(size)]
+    return lambda: funcs.load_json_files(_TMP.name, filenames)
+
+
+@benchmark('funcs.save_json_file', 100, 10000, io_bound=True)
+def bench_save_json_file(size: int):
+    records = _records(size)
+    folder, filename = _json_file([])
+    return lambda: funcs.save_json_file(folder, filename, records)
+
+
+@benchmark('funcs.JsonArrayWriter', 100, 10000, io_bound=True)
+def bench_json_array_writer(size: int):
+    records = _records(size)
+    folder, filename = _json_file([])
+
+    def write():
+        with funcs.JsonArrayWriter(folder, filename) as writer:
+            writer.write_all(records)
+    return write
+
+
+@benchmark('funcs.reformat_json_file', 100, 10000, io_bound=True)
+def bench_reformat_json_file(size: int):
+    folder, filename = _json_file(_records(size), indent=None)
+    return lambda: funcs.reformat_json_file(folder, filename, indent=4)
+# endregion funcs: json
+
+
+# region funcs: strings
+@benchmark('funcs.isolate_string', 1000, 1000000)
+def bench_isolate_string(size: int):
+    text = _html(size)
+    return lambda: funcs.isolate_string(text, '<h1 class="card-name">', '</h1>')
+
+
+@benchmark('funcs.StringExtractor.extract', 1000, 1000000)
+def bench_string_extractor(size: int):
+    text = _html(size)
+    extractor = funcs.StringExtractor({
+        'name': ('<h1 class="card-name">', '</h1>'),
+        'cost': ('<span class="mana">', '</span>'),
+        'oracle': ('<p class="oracle">', '</p>'),
+    })
+    return lambda: extractor.extract(text)
+
+
+@benchmark('funcs.format_seconds', 1, 1000)
+def bench_format_seconds(size: int):
+    values = [_RNG.uniform(0, 100000) for _ in range(size)]
+    return lambda: [funcs.format_seconds(value) for value in values]
+# endregion funcs: strings
+
+
+# region decorators
+@benchmark('decorators.memoize[hit]', 100, 10000)
+def bench_memoize_hit(size: int):
+    func = decorators.memoize()(lambda x: x)
+    keys = _ints(size, size)
+    for key in keys:
+        func(key)
+    return lambda: [func(key) for key in keys]
+
+
+@benchmark('decorators.memoize[lru]', 100, 10000)
+def bench_memoize_lru(size: int):
+    func = decorators.memoize(max_size=size // 2)(lambda x: x)
+    keys = _ints(size, size)
+    return lambda: [func(key) for key in keys]
+
+
+class _Card:
+    """A card-like object, with slots, to cache methods of."""
+    __slots__ = ('cmc', '__weakref__')
+
+    def __init__(self, cmc: int):
+        self.cmc = cmc
+
+    @decorators.cached_method
+    def cost(self, discount: int) -> int:
+        return self.cmc - discount
+
+    @decorators.memoize(weak=True)
+    def weak_cost(self, discount: int) -> int:
+        return self.cmc - discount
+
+
+@benchmark('decorators.memoize[weak]', 100, 10000)
+def bench_memoize_weak(size: int):
+    cards = [_Card(cmc) for cmc in _ints(size, 10)]
+    return lambda: [card.weak_cost(1) for card in cards]
+
+
+@benchmark('decorators.cached_method', 100, 10000)
+def bench_cached_method(size: int):
+    cards = [_Card(cmc) for cmc in _ints(size, 10)]
+    return lambda: [card.cost(1) for card in cards]
+
+
+@benchmark('decorators.memoize[coalesce]', 100, 10000)
+def bench_memoize_coalesce(size: int):
+    func = decorators.memoize(max_size=size // 2, coalesce=True)(lambda x: x)
+    keys = _ints(size, size)
+    return lambda: [func(key) for key in keys]
+
+
+@benchmark('decorators.retry', 100, 10000)
+def bench_retry(size: int):
+    func = decorators.retry(3, 0, budget=decorators.RetryBudget())(lambda x: x)
+    return lambda: [func(i) for i in range(size)]
+
+
+@benchmark('decorators.rate_limit', 100, 10000)
+def bench_rate_limit(size: int):
+    bucket = decorators.TokenBucket(rate=1e12, capacity=1e12)
+    func = decorators.rate_limit(bucket)(lambda x: x)
+    return lambda: [func(i) for i in range(size)]
+
+
+@benchmark('decorators.time_execution[registry]', 100, 10000)
+def bench_time_execution(size: int):
+    func = decorators.time_execution(registry=timing.TimingRegistry())(lambda x: x)
+    return lambda: [func(i) for i in range(size)]
+
+
+@benchmark('decorators.log_execution[disabled]', 100, 10000)
+def bench_log_execution(size: int):
+    func = decorators.log_execution(LogLvl.DEBUG)(lambda x: x)
+    logging.getLogger().setLevel(LogLvl.WARNING)
+    return lambda: [func(i) for i in range(size)]
+
+
+@benchmark('decorators.notify_on_failure', 100, 10000)
+def bench_notify_on_failure(size: int):
+    func = decorators.notify_on_failure(lambda ex, name: None)(lambda x: x)
+    return lambda: [func(i) for i in range(size)]
+
+
+@benchmark('testing.custom_order_tests', 10, 1000)
+def bench_custom_order_tests(size: int):
+    loader = TestLoader()
+    ordered = testing.custom_order_tests(loader, dict())
+    names = [f'test_{i}' for i in range(size)]
+    for name in reversed(names):
+        def test():
+            pass
+        test.__name__ = name
+        ordered()(test)
+    key = cmp_to_key(loader.sortTestMethodsUsing)
+    return lambda: sorted(names, key=key)
+
+
+@benchmark('decorators.profile_execution[unsampled]', 100, 10000)
+def bench_profile_execution(size: int):
+    func = decorators.profile_execution(_TMP.name, sample_rate=0.0)(abs)
+    return lambda: [func(i) for i in range(size)]
+
+
+@benchmark('decorators.parallel_map', 100, 10000, io_bound=True)
+def bench_parallel_map(size: int):
+    values = _ints(size)
+    return lambda: list(decorators.parallel_map(abs, values, max_workers=2))
+# endregion decorators
+
+
+# region caching and timing
+@benchmark('caching.make_key', 100, 10000)
+def bench_make_key(size: int):
+    return lambda: [caching.make_key((i, 'ONE'), {'fmt': 'PremierDraft'}) for i in range(size)]
+
+
+@benchmark('caching.LRUCache', 100, 10000)
+def bench_lru_cache(size: int):
+    cache = caching.LRUCache(max_size=size // 2)
+    keys = _ints(size, size)
+
+    def run():
+        for key in keys:
+            if cache.get(key) is None:
+                cache[key] = key
+    return run
+
+
+@benchmark('caching.SQLiteCache', 10, 1000, io_bound=True)
+def bench_sqlite_cache(size: int):
+    cache = caching.SQLiteCache(_TMP.name, f'bench_{next(_file_ids)}.sqlite3', max_entries=size // 2)
+    keys = _ints(size, size)
+
+    def run():
+        for key in keys:
+            if cache.get('bench', key) is None:
+                cache.set('bench', key, key)
+    return run
+
+
+@benchmark('caching.SQLiteCache[hit]', 10, 1000, io_bound=True)
+def bench_sqlite_cache_hit(size: int):
+    cache = caching.SQLiteCache(_TMP.name, f'bench_{next(_file_ids)}.sqlite3')
+    keys = _ints(size, size)
+    for key in keys:
+        cache.set('bench', key, key)
+    return lambda: [cache.get('bench', key) for key in keys]
+
+
+@benchmark('timing.Histogram.record', 100, 10000)
+def bench_histogram_record(size: int):
+    hist = timing.Histogram()
+    values = _ints(size, 10 ** 9)
+    return lambda: [hist.record(value) for value in values]
+
+
+@benchmark('timing.Histogram.summary', 100, 10000)
+def bench_histogram_summary(size: int):
+    hist = timing.Histogram()
+    for value in _ints(size, 10 ** 9):
+        hist.record(value)
+    return hist.summary
+# endregion caching and timing
+
+
+# region record_store
+@benchmark('record_store.RecordStore.append', 100, 10000, io_bound=True)
+def bench_record_store_append(size: int):
+    records = _records(size)
+    store = record_store.RecordStore(path.join(_TMP.name, f'store-{next(_file_ids)}'), key='name')
+    return lambda: store.extend(records)
+
+
+@benchmark('record_store.RecordStore.get', 100, 10000, io_bound=True)
+def bench_record_store_get(size: int):
+    records = _records(size)
+    store = record_store.RecordStore(path.join(_TMP.name, f'store-{next(_file_ids)}'), key='name')
+    store.extend(records)
+    names = [record['name'] for record in records]
+    return lambda: [store.get(name) for name in names]
+
+
+@benchmark('record_store.RecordStore.compact', 100, 10000, io_bound=True)
+def bench_record_store_compact(size: int):
+    records = _records(size)
+    store = record_store.RecordStore(path.join(_TMP.name, f'store-{next(_file_ids)}'), key='name')
+
+    def run():
+        store.extend(records)
+        store.extend(records)
+        store.compact()
+    return run
+# endregion record_store
+
+
+# region fetching
+class _JsonHandler(JsonHandler):
+    """Serves a small json body for any path, with an ETag so it can be revalidated."""
+    body = json.dumps(_records(10)).encode()
+
+
+_server = None
+
+
+def _urls(size: int) -> list[str]:
+    """Starts the local json server if needed, and gets a url for each of a number of resources."""
+    global _server
+    if _server is None:
+        _server = start_server(_JsonHandler)
+    return [f'http://127.0.0.1:{_server.server_port}/cards/{i}' for i in range(size)]
+
+
+@benchmark('fetching.Fetcher.fetch[cached]', 10, 100, io_bound=True)
+def bench_fetch_cached(size: int):
+    urls = _urls(size)
+    fetcher = fetching.Fetcher(path.join(_TMP.name, f'fetch-{next(_file_ids)}'), max_age=3600)
+    fetcher.fetch_json_many(urls)
+    return lambda: [fetcher.fetch(url) for url in urls]
+
+
+@benchmark('fetching.Fetcher.fetch[revalidated]', 10, 100, io_bound=True)
+def bench_fetch_revalidated(size: int):
+    urls = _urls(size)
+    fetcher = fetching.Fetcher(path.join(_TMP.name, f'fetch-{next(_file_ids)}'))
+    fetcher.fetch_json_many(urls)
+    return lambda: [fetcher.fetch(url) for url in urls]
+
+
+@benchmark('fetching.Fetcher.fetch_json_many', 10, 100, io_bound=True)
+def bench_fetch_json_many(size: int):
+    urls = _urls(size)
+    fetcher = fetching.Fetcher()
+    return lambda: fetcher.fetch_json_many(urls, max_workers=4)
+# endregion fetching
+
+
+# region auto_logging
+@benchmark('auto_logging.add_custom_levels', 1)
+def bench_add_custom_levels(_size: int):
+    return add_custom_levels
+
+
+@benchmark('auto_logging.verbose[disabled]', 100, 10000)
+def bench_verbose_disabled(size: int):
+    add_custom_levels()
+    logging.getLogger().setLevel(LogLvl.WARNING)
+    return lambda: [logging.verbose('Card %s', i) for i in range(size)]
+# endregion auto_logging
@@ -0,0 +1,222 @@
+from typing import Any, Callable, Optional
+from fnmatch import fnmatch
+from os import path
+from statistics import median
+from time import perf_counter
+import argparse
+import gc
+
+from core.utilities.auto_logging import logging
+from core.utilities.funcs import load_json_file, save_json_file
+
+BENCHMARK_FOLDER = path.dirname(__file__)
+BASELINE_FILE = 'baseline.json'
+RESULTS_FILE = 'results.json'
+# The name the calibration times are stored under, alongside the benchmarks.
+CALIBRATION = '_calibration'
+
+# Each benchmark takes an input size, does any setup, and returns the function to time.
+Benchmark = Callable[[int], Callable[[], Any]]
+# The benchmark, its input sizes, and whether it's bound by I/O or other processes, keyed by name.
+BENCHMARKS: dict[str, tuple[Benchmark, tuple[int, ...], bool]] = dict()
+
+
+def benchmark(name: str, *sizes: int, io_bound: bool = False):
+    """
+    A decorator which registers a benchmark, to be run with each of the input sizes provided.
+
+    The decorated function is given an input size, and should do any setup needed,
+    then return a function which does the work to be timed.
+
+    Benchmarks whose time is mostly spent on disk, the network, or in other processes
+    should set ``io_bound``. The calibration workload can't predict how those vary between
+    runs, so they're compared against the baseline unscaled, with a looser tolerance.
+
+    :param name: The name of the benchmark. Usually the module and function being benchmarked.
+    :param sizes: The input sizes to run the benchmark with.
+    :param io_bound: Whether the benchmark is bound by I/O or other processes, rather than Python.
+    :return: The decorator which registers the benchmark.
+    :raises AssertionError: Raised if the name is already taken.
+    """
+    def decorator(func: Benchmark) -> Benchmark:
+        assert name not in BENCHMARKS, f"Benchmark {name} already registered."
+        BENCHMARKS[name] = (func, sizes, io_bound)
+        return func
+    return decorator
+
+
+def _loop_size(func: Callable[[], Any], min_time: float) -> int:
+    """Gets the number of runs of a function which take at least ``min_time``, doubling from 1."""
+    number = 1
+    while True:
+        start = perf_counter()
+        for _ in range(number):
+            func()
+        if perf_counter() - start >= min_time:
+            return number
+        number *= 2
+
+
+def time_calls(funcs: list[Callable[[], Any]], min_time: float = 0.05, repeats: int = 7) -> list[float]:
+    """
+    Times how long each of a number of functions takes to run, interleaving their timing loops.
+
+    Each function is run in a loop, whose number of runs is doubled until the loop takes at
+    least ``min_time``. The loops of the functions are then timed in turn, ``repeats`` times,
+    so each is timed under the same load, and the median of each function's loops is used.
+    This way, a single loop which was slowed, or sped up, by other processes doesn't skew
+    the result.
+
+    :param funcs: The functions to time.
+    :param min_time: The minimum time (in seconds) for each loop of runs.
+    :param repeats: The number of loops of each function to time.
+    :return: The time (in seconds) of a single run of each function.
+    """
+    numbers = [_loop_size(func, min_time) for func in funcs]
+    loops: list[list[float]] = [[] for _ in funcs]
+    for _ in range(repeats):
+        for func, number, times in zip(funcs, numbers, loops):
+            gc.collect()
+            start = perf_counter()
+            for _ in range(number):
+                func()
+            times.append((perf_counter() - start) / number)
+    return [median(times) for times in loops]
+
+
+def time_call(func: Callable[[], Any], min_time: float = 0.05, repeats: int = 7) -> float:
+    """
+    Times how long a function takes to run. See ``time_calls``.
+
+    :param func: The function to time.
+    :param min_time: The minimum time (in seconds) for each loop of runs.
+    :param repeats: The number of loops to time.
+    :return: The time (in seconds) of a single run of the function.
+    """
+    return time_calls([func], min_time, repeats)[0]
+
+
+def _calibration_workload() -> None:
+    """A fixed, pure-Python workload, to measure the speed of the machine running the benchmarks."""
+    d = dict()
+    for i in range(1000):
+        d[i % 97] = d.get(i % 97, 0) + i
+    sorted(d.values())
+
+
+def run_benchmarks(pattern: str = '*', min_time: float = 0.05, repeats: int = 7,
+                   quick: bool = False) -> dict[str, dict[str, float]]:
+    """
+    Runs each registered benchmark whose name matches the pattern.
+
+    The loops of each benchmark are interleaved with those of a fixed calibration workload,
+    and the baseline is later scaled by how much faster or slower the workload ran, so that
+    a baseline recorded on one machine (or under a different load) can be compared against
+    on another.
+
+    :param pattern: A glob pattern to match against the names of the benchmarks.
+    :param min_time: The minimum time (in seconds) for each loop of runs. See ``time_calls``.
+    :param repeats: The number of loops to time. See ``time_calls``.
+    :param quick: Whether to only run each benchmark with its smallest input size.
+    :return: The time (in seconds) of each benchmark, keyed by name and then input size.
+        The calibration times are included under ``CALIBRATION``, keyed by benchmark name.
+    """
+    results = {CALIBRATION: dict()}
+    for name, (bench, sizes, _io_bound) in BENCHMARKS.items():
+        if not fnmatch(name, pattern):
+            continue
+        results[name] = dict()
+        calibrations = []
+        for size in sizes[:1] if quick else sizes:
+            seconds, calibration = time_calls([bench(size), _calibration_workload], min_time, repeats)
+            results[name][str(size)] = seconds
+            calibrations.append(calibration)
+            print(f"{name:<48} {size:>8}: {seconds * 1e6:12.3f} µs")
+        results[CALIBRATION][name] = median(calibrations)
+    return results
+
+
+def compare_results(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]],
+                    tolerance: float, io_tolerance: float = 1.0) -> list[str]:
+    """
+    Compares benchmark results to a baseline.
+
+    Benchmarks and sizes which are missing from either are ignored. If both include a
+    calibration time for a benchmark, the baseline is scaled by the ratio of the calibration
+    times, to account for differences in the speed of the machines. Benchmarks registered
+    as ``io_bound`` aren't scaled, as the calibration can't predict the speed of I/O or other
+    processes, and use ``io_tolerance`` instead.
+
+    :param results: The results of the benchmarks.
+    :param baseline: The results to compare against.
+    :param tolerance: The fraction a result can be slower than the baseline by, before it's a regression.
+    :param io_tolerance: The tolerance for benchmarks bound by I/O or other processes.
+    :return: A description of each regression found.
+    """
+    calibrations = results.get(CALIBRATION, dict())
+    baseline_calibrations = baseline.get(CALIBRATION, dict())
+
+    regressions = []
+    for name, sizes in results.items():
+        if name == CALIBRATION:
+            continue
+        io_bound = name in BENCHMARKS and BENCHMARKS[name][2]
+        allowed = io_tolerance if io_bound else tolerance
+        scale = 1.0
+        if not io_bound and calibrations.get(name) and baseline_calibrations.get(name):
+            scale = calibrations[name] / baseline_calibrations[name]
+        for size, seconds in sizes.items():
+            expected = baseline.get(name, dict()).get(size)
+            if expected:
+                expected *= scale
+            if expected and seconds > expected * (1 + allowed):
+                regressions.append(f"{name} [{size}]: {seconds * 1e6:.3f} µs, "
+                                   f"{seconds / expected:.2f}x the baseline of {expected * 1e6:.3f} µs")
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Runs the benchmarks, saves the results, and compares them against the baseline.
+
+    :param argv: The command line arguments. Uses ``sys.argv`` if None.
+    :return: The exit code; 1 if any regressions were found, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(prog='python -m test.benchmarks', description=main.__doc__.split('\n')[1])
+    parser.add_argument('-k', '--pattern', default='*', help='A glob pattern of the benchmarks to run.')
+    parser.add_argument('-t', '--tolerance', type=float, default=0.25,
+                        help='The fraction slower than the baseline a result can be. Default is 0.25.')
+    parser.add_argument('--io-tolerance', type=float, default=1.0,
+                        help='The tolerance of benchmarks bound by I/O or other processes. Default is 1.0.')
+    parser.add_argument('--min-time', type=float, default=0.05, help='The minimum time of each timing loop.')
+    parser.add_argument('--repeats', type=int, default=7, help='The number of timing loops, to take the median of.')
+    parser.add_argument('--quick', action='store_true', help='Only run the smallest size of each benchmark.')
+    parser.add_argument('--update-baseline', action='store_true', help='Save the results as the new baseline.')
+    args = parser.parse_args(argv)
+
+    # Registers the benchmarks.
+    from test.benchmarks import bench_utilities  # noqa: F401
+
+    results = run_benchmarks(args.pattern, args.min_time, args.repeats, args.quick)
+    save_json_file(BENCHMARK_FOLDER, RESULTS_FILE, results)
+
+    has_baseline = path.exists(path.join(BENCHMARK_FOLDER, BASELINE_FILE))
+    if args.update_baseline:
+        baseline = (load_json_file(BENCHMARK_FOLDER, BASELINE_FILE) if has_baseline else None) or dict()
+        for name, sizes in results.items():
+            baseline.setdefault(name, dict()).update(sizes)
+        save_json_file(BENCHMARK_FOLDER, BASELINE_FILE, dict(sorted(baseline.items())))
+        print(f"Baseline updated with {len(results)} benchmarks.")
+        return 0
+
+    baseline = load_json_file(BENCHMARK_FOLDER, BASELINE_FILE) if has_baseline else None
+    if baseline is None:
+        logging.error('No baseline to compare against. Run with --update-baseline to create one.')
+        return 1
+
+    regressions = compare_results(results, baseline, args.tolerance, args.io_tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regressions found, with a tolerance of {args.tolerance:.0%} "
+          f"({args.io_tolerance:.0%} for I/O bound benchmarks).")
+    return 1 if regressions else 0
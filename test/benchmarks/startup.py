@@ -0,0 +1,145 @@
+from typing import Optional
+from functools import cache
+from os import path
+import argparse
+import subprocess
+import sys
+
+# The root of the project, which the imports are run from.
+PROJECT_FOLDER = path.dirname(path.dirname(path.dirname(path.abspath(__file__))))
+
+# A fixed set of imports, timed before each module so the budgets can be scaled to the speed of the
+#  machine (and its current load), as the calibration workload is for the other benchmarks.
+REFERENCE_IMPORT = 'typing, json, logging'
+REFERENCE_MS = 33.0
+
+# The most time (in milliseconds) importing each module, and everything it imports, may take when the
+#  reference imports take ``REFERENCE_MS``. Set well above the times taken when last tuned, as imports are noisy to
+#  time; the ``LAZY_MODULES`` check is what catches a heavy module creeping back in.
+STARTUP_BUDGETS_MS = {
+    'core.utilities.auto_logging': 80,
+    'core.utilities.json_backend': 100,
+    'core.utilities.funcs': 130,
+    'core.utilities.caching': 100,
+    'core.utilities.timing': 130,
+    'core.utilities.decorators': 170,
+    'core.utilities.record_store': 140,
+    'core.utilities.testing': 80,
+    'core.utilities.fetching': 220,
+}
+
+# Modules which are only needed by a few functions, so must be imported when first used.
+LAZY_MODULES = ('asyncio', 'cProfile', 'concurrent.futures.process', 'inspect', 'multiprocessing',
+                'numpy', 'pstats', 'sqlite3', 'tracemalloc', 'unittest')
+# The lazy modules a module is allowed to import, as it can't be used without them.
+ALLOWED_LAZY_MODULES = {
+    'core.utilities.testing': {'inspect', 'unittest'},
+}
+
+
+def _parse_import_times(stderr: str) -> list[tuple[str, int, int]]:
+    """
+    Parses the output of ``python -X importtime``.
+
+    :param stderr: The output of the interpreter.
+    :return: The name, depth and cumulative time (in microseconds) of each import, in the order they finished.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('imported package'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        imports.append((name.strip(), depth, int(cumulative)))
+    return imports
+
+
+def _run_import(code: str) -> list[tuple[str, int, int]]:
+    """Runs code in a fresh interpreter with ``-X importtime``, returning the imports made."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=PROJECT_FOLDER,
+                          capture_output=True, text=True, check=True)
+    return _parse_import_times(proc.stderr)
+
+
+@cache
+def _startup_modules() -> frozenset[str]:
+    """Gets the names of the modules the interpreter imports while starting up."""
+    return frozenset(name for name, _, _ in _run_import('pass'))
+
+
+def measure_import(module: str) -> tuple[float, set[str]]:
+    """
+    Measures how long it takes a fresh interpreter to import a module.
+
+    Only the imports made by the module count, not those the interpreter makes while starting up.
+
+    :param module: The name of the module (or comma separated modules) to import.
+    :return: The time (in milliseconds) taken, and the names of every module imported.
+    :raises CalledProcessError: Raised if the module can't be imported.
+    """
+    startup = _startup_modules()
+    imports = _run_import(f'import {module}')
+    total = sum(cumulative for name, depth, cumulative in imports if depth == 0 and name not in startup)
+    return total / 1000, {name for name, _, _ in imports}
+
+
+def check_startup(repeats: int = 5, scale: float = 1.0) -> list[str]:
+    """
+    Imports each module in ``STARTUP_BUDGETS_MS`` in a fresh interpreter, and checks it stays within its budget.
+
+    The fastest of the imports is used, as with the other benchmarks, and each budget is
+    scaled by how long the ``REFERENCE_IMPORT`` took compared to ``REFERENCE_MS``. A module
+    also fails the check if it imports any of the ``LAZY_MODULES``.
+
+    :param repeats: The number of times to import each module.
+    :param scale: A further multiplier applied to the budgets.
+    :return: A description of each violation found.
+    """
+    violations = []
+    for module, budget in STARTUP_BUDGETS_MS.items():
+        try:
+            # The imports are alternated, so both are timed under the same load.
+            references, times = [], []
+            for _ in range(repeats):
+                references.append(measure_import(REFERENCE_IMPORT)[0])
+                module_millis, imported = measure_import(module)
+                times.append(module_millis)
+            reference, millis = min(references), min(times)
+        except subprocess.CalledProcessError as ex:
+            error = ex.stderr.strip().splitlines()[-1] if ex.stderr.strip() else f"exit code {ex.returncode}"
+            violations.append(f"{module}: failed to import ({error})")
+            continue
+        budget *= scale * reference / REFERENCE_MS
+        print(f"{module:<48} {millis:8.1f} ms (budget {budget:.1f} ms)")
+
+        if millis > budget:
+            violations.append(f"{module}: took {millis:.1f} ms to import, over its budget of {budget:.1f} ms")
+        allowed = ALLOWED_LAZY_MODULES.get(module, set())
+        for lazy in LAZY_MODULES:
+            if lazy not in allowed and any(name == lazy or name.startswith(lazy + '.') for name in imported):
+                violations.append(f"{module}: imports {lazy}, which should only be imported when first used")
+    return violations
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Checks the time taken to import each utility module stays within its budget.
+
+    :param argv: The command line arguments. Uses ``sys.argv`` if None.
+    :return: The exit code; 1 if any violations were found, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(prog='python -m test.benchmarks.startup', description=main.__doc__.split('\n')[1])
+    parser.add_argument('--repeats', type=int, default=5, help='The number of times to import each module.')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='A further multiplier applied to the budgets. Default is 1.')
+    args = parser.parse_args(argv)
+
+    violations = check_startup(args.repeats, args.scale)
+    for violation in violations:
+        print(f"VIOLATION {violation}")
+    print(f"{len(violations)} startup violations found.")
+    return 1 if violations else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,5 @@
-from typing import Any, Callable, TypeVar, Iterable, Hashable
+from typing import Callable, TypeVar, Iterable, Hashable, Optional
 from unittest import TestCase
-from itertools import product
 
 
 T = TypeVar('T')
@@ -9,6 +8,9 @@ T = TypeVar('T')
 class ExtendedTestCase(TestCase):  # pragma: nocover
     """A TestCase class, which adds in additional tests."""
 
+    # The most mismatches listed in the failure message of a bulk assertion.
+    MAX_REPORTED_MISMATCHES = 20
+
     # TODO: Add this in a generic way. (Abstract Base Classes?)
     # ordered = custom_order_tests(unittest.defaultTestLoader)
 
@@ -173,21 +175,112 @@ class ExtendedTestCase(TestCase):  # pragma: nocover
                 self.assertEqual(obj1, obj2)
                 b_idx, u_idx = b_idx + 1, u_idx - 1
 
+    @staticmethod
+    def _gen_mismatch_msg(header: str, lines: list[str], total: int) -> str:
+        """
+        Generates a message listing the mismatches found by a bulk assertion.
+
+        :param header: The first line of the message.
+        :param lines: The description of each mismatch, up to ``MAX_REPORTED_MISMATCHES``.
+        :param total: The total number of mismatches found.
+        :return: An error message for a unit test.
+        """
+        if total > len(lines):
+            lines = lines + [f"... and {total - len(lines)} more"]
+        return '\n  '.join([header] + lines)
+
+    @staticmethod
+    def _unique_objects(objects: list[T]) -> list[T]:
+        """
+        Keeps only the first of any repeated (identical) object.
+
+        :param objects: The objects to filter.
+        :return: The distinct objects, in the order first seen.
+        """
+        seen = set()
+        unique = []
+        for obj in objects:
+            if id(obj) not in seen:
+                seen.add(id(obj))
+                unique.append(obj)
+        return unique
+
+    @classmethod
+    def _hash_buckets(cls, objects: list[T]) -> Optional[list[list[T]]]:
+        """
+        Groups objects by their hash, keeping only the first of any repeated (identical) object.
+
+        :param objects: The objects to group.
+        :return: The buckets of objects, in the order first seen. None if any object is unhashable.
+        """
+        buckets: dict[int, list[T]] = dict()
+        for obj in cls._unique_objects(objects):
+            try:
+                buckets.setdefault(hash(obj), []).append(obj)
+            except TypeError:
+                return None
+        return list(buckets.values())
+
+    @staticmethod
+    def _format_group(objects: list[T]) -> str:
+        """
+        Formats the first few objects of a group, for the failure message of a bulk assertion.
+
+        :param objects: The objects in the group.
+        :return: The reprs of the objects, separated by commas.
+        """
+        return f"{', '.join(repr(obj) for obj in objects[:5])}{', ...' if len(objects) > 5 else ''}"
+
     # noinspection PyPep8Naming
-    def assertAllEqualNonTransitive(self, objects: list[T]):
+    def assertAllEqualNonTransitive(self, objects: list[T], use_hash: bool = False):
         """
         Test that a list of objects are equal, assuming that the equality is not transitive.
 
-        Takes the cross-product of the list of objects, and checks that each pair is equal.
+        Rather than comparing every pair, each object is compared (both ways) with one
+        representative of each group of equal objects found so far, joining the first group
+        it's equal to. The objects are all equal if they form a single group, so a passing
+        assertion makes a few comparisons per object. Every group is reported in one failure.
+
+        Repeated (identical) objects are only compared once, but each is checked to be equal
+        to itself. If ``use_hash`` is set and the objects are hashable, objects with different
+        hashes also fail straight away, grouped by hash. This relies on equal objects having
+        equal hashes, so is off by default, as objects with a custom ``__eq__`` may not keep to that.
 
         :param objects: The list of objects to compare.
+        :param use_hash: Whether to use the hashes of the objects to speed up the comparison.
         """
-        pairs = list(product(objects, repeat=2))
-        for i in range(len(pairs)):
-            obj1: T
-            obj2: T
-            obj1, obj2 = pairs[i]
-            self.assertEqual(obj1, obj2)
+        buckets = self._hash_buckets(objects) if use_hash else None
+        if buckets is None:
+            objects = self._unique_objects(objects)
+        else:
+            if len(buckets) > 1:
+                lines = [f"hash {hash(bucket[0])}: {self._format_group(bucket)}" for bucket in buckets]
+                self.fail(self._gen_mismatch_msg(
+                    f"Objects have {len(buckets)} different hashes, so can't all be equal:",
+                    lines[:self.MAX_REPORTED_MISMATCHES], len(lines)))
+            objects = buckets[0] if buckets else []
+
+        unequal_to_self = []
+        groups: list[list[T]] = []
+        for obj in objects:
+            if not obj == obj:
+                unequal_to_self.append(obj)
+                continue
+            for group in groups:
+                if obj == group[0] and group[0] == obj:
+                    group.append(obj)
+                    break
+            else:
+                groups.append([obj])
+
+        lines = [f"{obj!r} != {obj!r}" for obj in unequal_to_self]
+        if len(groups) > 1:
+            lines += [f"group {i}: {self._format_group(group)}" for i, group in enumerate(groups, 1)]
+        if lines:
+            counts = ([f"{len(unequal_to_self)} unequal to themselves"] if unequal_to_self else []) \
+                + ([f"{len(groups)} groups of equal objects"] if len(groups) > 1 else [])
+            self.fail(self._gen_mismatch_msg(f"Objects are not all equal ({', '.join(counts)}):",
+                                             lines[:self.MAX_REPORTED_MISMATCHES], len(lines)))
 
     # noinspection PyPep8Naming
     def assertAllEqual(self, objects: list[T], eq_transitive: bool = True):
@@ -199,8 +292,8 @@ class ExtendedTestCase(TestCase):  # pragma: nocover
         checks their equality. Generally, this should be fine.
 
         If equality is not transitive, ``eq_transitive`` should be set to
-        ``False``, which will test the equality of each object with each
-        object in the list (including itself).
+        ``False``, which will test the equality of each object with itself,
+        and both ways with one object from each group of equal objects.
 
         :param objects: The list of objects to check are equal.
         :param eq_transitive: Whether the equality is transitive.
@@ -230,18 +323,73 @@ class EnumTestCase(ExtendedTestCase):  # pragma: nocover
 class FlagEnumTestCase(ExtendedTestCase):  # pragma: nocover
     """A TestCase class, which adds in additional tests and support for FlagEnums."""
 
+    @staticmethod
+    def _format_ranges(values: list[int]) -> str:
+        """
+        Formats a sorted list of integers, collapsing consecutive runs into ranges.
+
+        :param values: The integers to format.
+        :return: The formatted integers, eg. ``-3..-1, 4, 8..9``.
+        """
+        ranges = []
+        start = prev = values[0]
+        for value in values[1:] + [None]:
+            if value is not None and value == prev + 1:
+                prev = value
+                continue
+            ranges.append(str(start) if start == prev else f"{start}..{prev}")
+            start = prev = value
+        return ', '.join(ranges)
+
+    @staticmethod
+    def _create_flag(cls: type, value: int):
+        """
+        Creates the flag with a value, or None if the value is out of the flag's range.
+
+        :param cls: The FlagEnum class.
+        :param value: The value of the flag.
+        :return: The flag, or None if it raised a ValueError.
+        """
+        try:
+            return cls(value)
+        except ValueError:
+            return None
+
     # noinspection PyPep8Naming
     def assertStrictFlagEnumRange(self, cls: type, bit_count: int):
         """
         Tests that the FlagEnum range is limited to the bits that it uses.
 
+        The values in range are all created at once, only falling back to checking each of
+        them if one raises. As each value out of range raises an exception, which is slow,
+        those are only sampled at exponentially growing distances past either end of the
+        range. Every value that behaves incorrectly is reported in one failure.
+
         :param cls: The FlagEnum class.
         :param bit_count: The number of bits used in the flags.
         """
         abs_range = 2 ** bit_count
         test_range = abs_range + (bit_count * 10)
-        for i in range(-test_range, test_range):
-            if i < -abs_range or i > (abs_range - 1):
-                self.assertRaises(ValueError, cls, i)
-            else:
-                self.assertIsInstance(cls(i), cls)
+        valid = range(-abs_range, abs_range)
+        try:
+            flags = list(map(cls, valid))
+        except ValueError:
+            flags = [self._create_flag(cls, i) for i in valid]
+        raised = [i for i, obj in zip(valid, flags) if obj is None]
+        wrong_type = [i for i, obj in zip(valid, flags) if obj is not None and not isinstance(obj, cls)]
+        past_end = test_range - abs_range
+        distances = sorted({2 ** i - 1 for i in range(past_end.bit_length())} | {past_end - 1}) if past_end else []
+        invalid = [-abs_range - 1 - distance for distance in reversed(distances)]
+        invalid += [abs_range + distance for distance in distances]
+        not_raised = [i for i in invalid if self._create_flag(cls, i) is not None]
+
+        lines = []
+        if not_raised:
+            lines.append(f"ValueError not raised for: {self._format_ranges(not_raised)}")
+        if raised:
+            lines.append(f"ValueError raised for: {self._format_ranges(raised)}")
+        if wrong_type:
+            lines.append(f"Not an instance of {cls.__name__} for: {self._format_ranges(wrong_type)}")
+        if lines:
+            self.fail(self._gen_mismatch_msg(f"{cls.__name__} does not strictly cover {bit_count} bits:",
+                                             lines, len(lines)))
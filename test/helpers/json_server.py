@@ -0,0 +1,39 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+
+class JsonHandler(BaseHTTPRequestHandler):  # pragma: nocover
+    """Serves a json body for any path, with an ETag so it can be revalidated."""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are sent separately, which otherwise stalls on delayed ACKs.
+    disable_nagle_algorithm = True
+    body = b'[]'
+    etag = '"v1"'
+
+    def do_GET(self):
+        if self.headers.get('If-None-Match') == self.etag:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', self.etag)
+        self.send_header('Content-Length', str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(handler: type[BaseHTTPRequestHandler]) -> ThreadingHTTPServer:  # pragma: nocover
+    """
+    Starts a local server on a free port, serving requests from a background thread.
+
+    :param handler: The request handler class to use.
+    :return: The server, which should be closed with ``shutdown`` and ``server_close``.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
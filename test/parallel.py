@@ -0,0 +1,358 @@
+from typing import Iterator, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from importlib import import_module
+from os import cpu_count
+from time import perf_counter
+from traceback import format_exception
+import argparse
+import sys
+import unittest
+
+# Tests are sent to the workers as (module, class qualname, method name), in the order they're to be run.
+TestRef = tuple[str, str, str]
+# The outcome of a test: (outcome, test id, name, description, details), with the traceback or skip reason as details.
+# Each test's outcomes are between its 'start' and 'stop', with those of its failed subtests as 'subtest_*'.
+Outcome = tuple[str, str, str, Optional[str], Optional[str]]
+
+CLASS = 'class'
+MODULE = 'module'
+
+
+def _iter_tests(suite: unittest.TestSuite) -> Iterator[unittest.TestCase]:
+    """Yields the individual tests of a suite, in the order they would be run."""
+    for test in suite:
+        if isinstance(test, unittest.TestSuite):
+            yield from _iter_tests(test)
+        else:
+            yield test
+
+
+def _test_ref(test: unittest.TestCase) -> Optional[TestRef]:
+    """
+    Gets the reference a worker can rebuild a test from.
+
+    :param test: The test to get the reference to.
+    :return: The reference, or None if the test can't be imported by name (eg. a failed import).
+    """
+    cls = type(test)
+    method = getattr(test, '_testMethodName', None)
+    try:
+        owner = import_module(cls.__module__)
+        for name in cls.__qualname__.split('.'):
+            owner = getattr(owner, name)
+    except (ImportError, AttributeError):
+        return None
+    if owner is not cls or method is None:
+        return None
+    try:
+        cls(method)
+    except Exception:
+        return None
+    return cls.__module__, cls.__qualname__, method
+
+
+def _is_ordered(test: unittest.TestCase) -> bool:
+    """Whether a test was given an order with ``custom_order_tests``."""
+    method = getattr(type(test), getattr(test, '_testMethodName', ''), None)
+    return hasattr(method, 'test_order')
+
+
+def group_tests(suite: unittest.TestSuite, by: str = CLASS) -> tuple[list[list[TestRef]], list[unittest.TestCase]]:
+    """
+    Splits a suite into chains of tests, which can be run independently of each other.
+
+    Each chain holds the tests of one class (or module), in the order ``unittest`` would run
+    them. Modules with ordered tests are kept as a single chain, so tests which depend on
+    running after one another are never split between workers.
+
+    :param suite: The suite to split.
+    :param by: Whether to group the tests by ``CLASS`` or ``MODULE``.
+    :return: The chains of tests, and any tests which can only be run in this process.
+    """
+    chains: dict[tuple[str, str], list[TestRef]] = dict()
+    ordered_modules = set()
+    local = []
+    for test in _iter_tests(suite):
+        ref = _test_ref(test)
+        if ref is None:
+            local.append(test)
+            continue
+        if _is_ordered(test):
+            ordered_modules.add(ref[0])
+        chains.setdefault((ref[0], ref[1] if by == CLASS else ''), []).append(ref)
+
+    grouped: dict[tuple[str, str], list[TestRef]] = dict()
+    for (module, cls), refs in chains.items():
+        key = (module, '') if module in ordered_modules else (module, cls)
+        grouped.setdefault(key, []).extend(refs)
+    return list(grouped.values()), local
+
+
+class _RecordingResult(unittest.TestResult):
+    """A result which records the outcome of each test, in a form which can be sent between processes."""
+
+    def __init__(self, buffer: bool = False, failfast: bool = False):
+        super().__init__()
+        self.buffer = buffer
+        self.failfast = failfast
+        self.outcomes: list[Outcome] = []
+
+    def _record(self, outcome: str, test, details: Optional[str] = None) -> None:
+        self.outcomes.append((outcome, test.id(), str(test), test.shortDescription(), details))
+
+    def startTest(self, test):
+        super().startTest(test)
+        self._record('start', test)
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self._record('stop', test)
+
+    def addSuccess(self, test):
+        super().addSuccess(test)
+        self._record('success', test)
+
+    def addFailure(self, test, err):
+        super().addFailure(test, err)
+        self._record('failure', test, self.failures[-1][1])
+
+    def addError(self, test, err):
+        super().addError(test, err)
+        self._record('error', test, self.errors[-1][1])
+
+    def addSkip(self, test, reason):
+        super().addSkip(test, reason)
+        self._record('skip', test, reason)
+
+    def addExpectedFailure(self, test, err):
+        super().addExpectedFailure(test, err)
+        self._record('expected_failure', test, self.expectedFailures[-1][1])
+
+    def addUnexpectedSuccess(self, test):
+        super().addUnexpectedSuccess(test)
+        self._record('unexpected_success', test)
+
+    def addSubTest(self, test, subtest, err):
+        super().addSubTest(test, subtest, err)
+        if err is not None:
+            failed = self.failures if issubclass(err[0], test.failureException) else self.errors
+            self._record('subtest_failure' if failed is self.failures else 'subtest_error', subtest, failed[-1][1])
+
+
+def run_chain(refs: list[TestRef], buffer: bool = False, failfast: bool = False) -> list[Outcome]:
+    """
+    Runs a chain of tests in order, as a single suite so class and module fixtures are shared.
+
+    :param refs: The tests to run.
+    :param buffer: Whether to buffer the output of the tests, as ``unittest -b`` does.
+    :param failfast: Whether to stop after the first failure or error.
+    :return: The outcome of each test, in the order they were run.
+    """
+    suite = unittest.TestSuite()
+    for module, qualname, method in refs:
+        cls = import_module(module)
+        for name in qualname.split('.'):
+            cls = getattr(cls, name)
+        suite.addTest(cls(method))
+
+    result = _RecordingResult(buffer, failfast)
+    suite(result)
+    return result.outcomes
+
+
+def _chain_failed(refs: list[TestRef], ex: BaseException) -> list[Outcome]:
+    """Creates an error outcome for each test in a chain which could not be run, eg. if its worker crashed."""
+    details = ''.join(format_exception(ex))
+    outcomes = []
+    for module, qualname, method in refs:
+        test_id = f"{module}.{qualname}.{method}"
+        name = f"{method} ({test_id})"
+        outcomes += [(outcome, test_id, name, None, details if outcome == 'error' else None)
+                     for outcome in ('start', 'error', 'stop')]
+    return outcomes
+
+
+class _RemoteTest:
+    """Stands in for a test which was run in another process, when reporting its outcome."""
+
+    def __init__(self, test_id: str, name: str, description: Optional[str]):
+        self._id = test_id
+        self._name = name
+        self._description = description
+
+    def id(self) -> str:
+        return self._id
+
+    def shortDescription(self) -> Optional[str]:
+        return self._description
+
+    def __str__(self) -> str:
+        return self._name
+
+
+class ParallelTextTestResult(unittest.TextTestResult):
+    """A text result which can replay the outcomes of tests run in other processes."""
+
+    def _exc_info_to_string(self, err, test):
+        # Outcomes from other processes arrive already formatted.
+        if isinstance(err, str):
+            return err
+        return super()._exc_info_to_string(err, test)
+
+    def _add_failed_subtest(self, subtest: _RemoteTest, failed: bool, details: str) -> None:
+        """Adds a failed subtest as ``TextTestResult.addSubTest`` does, without counting it as another test."""
+        if self.showAll:
+            if not self._newline:
+                self.stream.writeln()
+            self.stream.writeln(f"  {self.getDescription(subtest)} ... {'FAIL' if failed else 'ERROR'}")
+            self._newline = True
+        elif self.dots:
+            self.stream.write('F' if failed else 'E')
+            self.stream.flush()
+        if self.failfast:
+            self.stop()
+        (self.failures if failed else self.errors).append((subtest, details))
+        self._mirrorOutput = True
+
+    def replay(self, outcomes: list[Outcome]) -> None:
+        """
+        Adds the outcomes of tests run in another process, as if they were run here.
+
+        A test with failed subtests is counted once, as ``unittest`` does, with each failed
+        subtest reported as a failure or error of its own.
+
+        :param outcomes: The outcomes to add.
+        """
+        for outcome, test_id, name, description, details in outcomes:
+            test = _RemoteTest(test_id, name, description)
+            if outcome == 'start':
+                self.startTest(test)
+            elif outcome == 'stop':
+                self.stopTest(test)
+            elif outcome in ('subtest_failure', 'subtest_error'):
+                self._add_failed_subtest(test, outcome == 'subtest_failure', details)
+            elif outcome == 'success':
+                self.addSuccess(test)
+            elif outcome == 'failure':
+                self.addFailure(test, details)
+            elif outcome == 'error':
+                self.addError(test, details)
+            elif outcome == 'skip':
+                self.addSkip(test, details)
+            elif outcome == 'expected_failure':
+                self.addExpectedFailure(test, details)
+            else:
+                self.addUnexpectedSuccess(test)
+
+
+def run_parallel(suite: unittest.TestSuite, workers: Optional[int] = None, by: str = CLASS,
+                 verbosity: int = 1, buffer: bool = False, failfast: bool = False,
+                 stream=None) -> unittest.TestResult:
+    """
+    Runs a suite across worker processes, reporting the results as ``unittest`` would.
+
+    Chains of tests (see ``group_tests``) are run in whichever worker is free, with the
+    tests within a chain always run in order, by the same worker. Outcomes are reported as
+    each chain completes. Tests which can't be rebuilt in a worker are run in this process.
+
+    :param suite: The suite to run.
+    :param workers: The number of worker processes. Uses the number of CPUs if None. Runs in this process if 1.
+    :param by: Whether to split the tests into chains by ``CLASS`` or ``MODULE``.
+    :param verbosity: The verbosity of the output, as with ``unittest``.
+    :param buffer: Whether to buffer the output of the tests, as ``unittest -b`` does.
+    :param failfast: Whether to stop after the first failure or error.
+    :param stream: The stream to report to. Default is ``sys.stderr``.
+    :return: The aggregated result of every test.
+    """
+    stream = unittest.runner._WritelnDecorator(stream or sys.stderr)
+    result = ParallelTextTestResult(stream, True, verbosity)
+    result.buffer = buffer
+    result.failfast = failfast
+
+    chains, local = group_tests(suite, by)
+    workers = workers or cpu_count() or 1
+    start = perf_counter()
+    result.startTestRun()
+    try:
+        if workers == 1 or len(chains) <= 1:
+            for chain in chains:
+                result.replay(run_chain(chain, buffer, failfast))
+                if result.shouldStop:
+                    break
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(chains))) as executor:
+                futures = {executor.submit(run_chain, chain, buffer, failfast): chain for chain in chains}
+                for future in as_completed(futures):
+                    try:
+                        outcomes = future.result()
+                    except Exception as ex:
+                        outcomes = _chain_failed(futures[future], ex)
+                    result.replay(outcomes)
+                    if result.shouldStop:
+                        for pending in futures:
+                            pending.cancel()
+                        break
+        if local and not result.shouldStop:
+            unittest.TestSuite(local)(result)
+    finally:
+        result.stopTestRun()
+    elapsed = perf_counter() - start
+
+    result.printErrors()
+    stream.writeln(result.separator2)
+    stream.writeln(f"Ran {result.testsRun} test{'' if result.testsRun == 1 else 's'} in {elapsed:.3f}s "
+                   f"({len(chains)} chains, {workers} workers)")
+    stream.writeln()
+    _write_summary(result, stream)
+    return result
+
+
+def _write_summary(result: unittest.TestResult, stream) -> None:
+    """Writes the final line of the report, matching ``unittest.TextTestRunner``."""
+    infos = []
+    if not result.wasSuccessful():
+        stream.write('FAILED')
+        if result.failures:
+            infos.append(f"failures={len(result.failures)}")
+        if result.errors:
+            infos.append(f"errors={len(result.errors)}")
+    else:
+        stream.write('OK')
+    if result.skipped:
+        infos.append(f"skipped={len(result.skipped)}")
+    if result.expectedFailures:
+        infos.append(f"expected failures={len(result.expectedFailures)}")
+    if result.unexpectedSuccesses:
+        infos.append(f"unexpected successes={len(result.unexpectedSuccesses)}")
+    stream.writeln(f" ({', '.join(infos)})" if infos else '')
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Discovers tests, and runs them across worker processes.
+
+    :param argv: The command line arguments. Uses ``sys.argv`` if None.
+    :return: The exit code; 1 if any tests failed, otherwise 0.
+    """
+    parser = argparse.ArgumentParser(prog='python -m test.parallel', description=main.__doc__.split('\n')[1])
+    parser.add_argument('start', nargs='?', default='.', help="The directory or package to start discovery in.")
+    parser.add_argument('-p', '--pattern', default='test*.py',
+                        help="The pattern test files match. Default is 'test*.py'.")
+    parser.add_argument('-t', '--top-level-directory', default=None, help='The top level directory of the project.')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='The number of worker processes. Default is the number of CPUs.')
+    parser.add_argument('--by', choices=(CLASS, MODULE), default=CLASS, help='How to split the tests between workers.')
+    parser.add_argument('-v', '--verbose', dest='verbosity', action='store_const', const=2, default=1,
+                        help='Verbose output.')
+    parser.add_argument('-q', '--quiet', dest='verbosity', action='store_const', const=0, help='Quiet output.')
+    parser.add_argument('-b', '--buffer', action='store_true', help='Buffer stdout and stderr during tests.')
+    parser.add_argument('-f', '--failfast', action='store_true', help='Stop on the first failure or error.')
+    args = parser.parse_args(argv)
+
+    suite = unittest.defaultTestLoader.discover(args.start, args.pattern, args.top_level_directory)
+    result = run_parallel(suite, args.workers, args.by, args.verbosity, args.buffer, args.failfast)
+    return 0 if result.wasSuccessful() else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+from io import StringIO
+import unittest
+
+from test.helpers.extension_classes import ExtendedTestCase
+from test.parallel import ParallelTextTestResult, _chain_failed, _RecordingResult
+
+
+def _sample_suite() -> unittest.TestSuite:
+    """Creates a suite with every kind of outcome. Defined in a function, so the tests aren't discovered."""
+    class Sample(unittest.TestCase):
+        def test_failing_subtests(self):
+            for i in range(4):
+                with self.subTest(i=i):
+                    self.assertLess(i, 2)
+
+        def test_subtest_error(self):
+            for i in range(2):
+                with self.subTest(i=i):
+                    if i:
+                        raise KeyError(i)
+
+        def test_passing_subtests(self):
+            for i in range(3):
+                with self.subTest(i=i):
+                    self.assertGreaterEqual(i, 0)
+
+        def test_failure(self):
+            self.fail('Failed.')
+
+        @unittest.skip('Skipped.')
+        def test_skip(self):
+            pass
+
+        @unittest.expectedFailure
+        def test_expected_failure(self):
+            self.fail('Expected.')
+
+    class BrokenSetUp(unittest.TestCase):
+        @classmethod
+        def setUpClass(cls):
+            raise RuntimeError('Broken.')
+
+        def test_never_run(self):
+            pass
+
+    loader = unittest.TestLoader()
+    return unittest.TestSuite([loader.loadTestsFromTestCase(Sample), loader.loadTestsFromTestCase(BrokenSetUp)])
+
+
+class TestReplay(ExtendedTestCase):
+    def _unittest_result(self, verbosity: int) -> tuple[unittest.TextTestResult, str]:
+        stream = StringIO()
+        result = unittest.TextTestResult(unittest.runner._WritelnDecorator(stream), True, verbosity)
+        _sample_suite()(result)
+        return result, stream.getvalue()
+
+    def _replayed_result(self, verbosity: int) -> tuple[ParallelTextTestResult, str]:
+        recording = _RecordingResult()
+        _sample_suite()(recording)
+        stream = StringIO()
+        result = ParallelTextTestResult(unittest.runner._WritelnDecorator(stream), True, verbosity)
+        result.replay(recording.outcomes)
+        return result, stream.getvalue()
+
+    def test_counts_match_unittest(self):
+        expected, _ = self._unittest_result(1)
+        actual, _ = self._replayed_result(1)
+        # A test with failed subtests is run once, but has a failure (or error) for each subtest.
+        self.assertEqual(actual.testsRun, 6)
+        for attr in ('testsRun', 'failures', 'errors', 'skipped', 'expectedFailures', 'unexpectedSuccesses'):
+            with self.subTest(attr):
+                if attr == 'testsRun':
+                    self.assertEqual(getattr(actual, attr), getattr(expected, attr))
+                else:
+                    self.assertListEqual([str(test) for test, _ in getattr(actual, attr)],
+                                         [str(test) for test, _ in getattr(expected, attr)])
+
+    def test_output_matches_unittest(self):
+        for verbosity in (1, 2):
+            with self.subTest(verbosity=verbosity):
+                self.assertEqual(self._replayed_result(verbosity)[1], self._unittest_result(verbosity)[1])
+
+    def test_chain_failed(self):
+        chain = [('module', 'Class', 'test_a'), ('module', 'Class', 'test_b')]
+        outcomes = _chain_failed(chain, RuntimeError('Crashed.'))
+        result = ParallelTextTestResult(unittest.runner._WritelnDecorator(StringIO()), True, 1)
+        result.replay(outcomes)
+        self.assertEqual(result.testsRun, 2)
+        self.assertListEqual([str(test) for test, _ in result.errors],
+                             ['test_a (module.Class.test_a)', 'test_b (module.Class.test_b)'])
+        self.assertIn('RuntimeError: Crashed.', result.errors[0][1])
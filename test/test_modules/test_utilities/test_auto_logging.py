@@ -0,0 +1,86 @@
+from tempfile import TemporaryDirectory
+from os import path
+import logging
+import subprocess
+import sys
+import threading
+import time
+
+from core.utilities import auto_logging
+from core.utilities.auto_logging import LogLvl, set_log_level, stop_log_queue
+from test.helpers.extension_classes import ExtendedTestCase
+
+
+class TestLogQueue(ExtendedTestCase):
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.filename = path.join(self._dir.name, 'test.log')
+        self._handlers = logging.root.handlers[:]
+        self._level = logging.root.level
+
+    def tearDown(self):
+        stop_log_queue()
+        logging.basicConfig(level=self._level, handlers=self._handlers, force=True)
+        self._dir.cleanup()
+
+    def _slow_down_listener(self) -> None:
+        """Makes the listener slower than the logging, so the queue fills up."""
+        file_handler = auto_logging._listener.handlers[0]
+        handle = file_handler.handle
+
+        def slow_handle(record):
+            time.sleep(0.002)
+            return handle(record)
+        file_handler.handle = slow_handle
+
+    def _read_lines(self) -> list[str]:
+        with open(self.filename) as f:
+            return f.read().splitlines()
+
+    def test_full_queue_flushed_at_stop(self):
+        set_log_level(LogLvl.INFO, self.filename, use_queue=True, queue_size=5)
+        self._slow_down_listener()
+        queue_handler = auto_logging._queue_handler
+        for i in range(100):
+            logging.info(f'Record {i}')
+        self.assertTrue(queue_handler.queue.full())
+
+        stop_log_queue()
+        lines = self._read_lines()
+        self.assertGreater(queue_handler.dropped, 0)
+        self.assertEqual(len(lines), 100 - queue_handler.dropped + 1)
+        self.assertIn(f'{queue_handler.dropped} log records were dropped.', lines[-1])
+        self.assertIsNone(auto_logging._listener)
+
+    def test_blocking_queue_keeps_every_record(self):
+        set_log_level(LogLvl.INFO, self.filename, use_queue=True, queue_size=5, block=True)
+        self._slow_down_listener()
+        for i in range(50):
+            logging.info(f'Record {i}')
+
+        stop_log_queue()
+        lines = self._read_lines()
+        self.assertEqual(len(lines), 50)
+        self.assertTrue(lines[-1].endswith('Record 49'))
+
+    def test_logging_after_stop_is_written(self):
+        set_log_level(LogLvl.INFO, self.filename, use_queue=True, queue_size=5, block=True)
+        logging.info('Before')
+        stop_log_queue()
+
+        thread = threading.Thread(target=lambda: [logging.info(f'After {i}') for i in range(20)], daemon=True)
+        thread.start()
+        thread.join(2)
+        self.assertFalse(thread.is_alive())
+        lines = self._read_lines()
+        self.assertEqual(len(lines), 21)
+        self.assertTrue(lines[-1].endswith('After 19'))
+        self.assertNotIn(auto_logging.DroppingQueueHandler, [type(handler) for handler in logging.root.handlers])
+
+
+class TestCustomLevels(ExtendedTestCase):
+    def test_added_on_import(self):
+        script = "import core.utilities.auto_logging, logging; print(logging.VERBOSE, logging.SPARSE, " \
+                 "callable(logging.verbose), callable(logging.getLogger('a').sparse))"
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.split(), [str(int(LogLvl.VERBOSE)), str(int(LogLvl.SPARSE)), 'True', 'True'])
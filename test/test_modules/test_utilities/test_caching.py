@@ -0,0 +1,57 @@
+from tempfile import TemporaryDirectory
+from os import environ
+import subprocess
+import sys
+
+from core.utilities.caching import SQLiteCache
+from test.helpers.extension_classes import ExtendedTestCase
+
+
+class TestSQLiteCache(ExtendedTestCase):
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.cache = SQLiteCache(self._dir.name)
+
+    def tearDown(self):
+        self.cache.close()
+        self._dir.cleanup()
+
+    def test_get_and_set(self):
+        self.assertTrue(self.cache.set('ns', ('a', 1), {'value': 2}))
+        self.assertEqual(self.cache.get('ns', ('a', 1)), {'value': 2})
+        self.assertIsNone(self.cache.get('other', ('a', 1)))
+        self.assertEqual(self.cache.get_hashed('ns', SQLiteCache.hash_key(('a', 1))), {'value': 2})
+        self.assertLengthDunderEqual(self.cache, 1)
+
+    def test_unpicklable_key(self):
+        key = (lambda: 0,)
+        self.assertEqual(self.cache.get('ns', key, 'default'), 'default')
+        with self.assertLogs(level='ERROR'):
+            self.assertFalse(self.cache.set('ns', key, 1))
+        self.assertLengthDunderEqual(self.cache, 0)
+
+    def _accessed(self, key) -> float:
+        return self.cache._conn.execute('SELECT accessed FROM cache WHERE key = ?',
+                                        (SQLiteCache.hash_key(key),)).fetchone()[0]
+
+    def test_reads_only_update_old_access_times(self):
+        self.cache.set('ns', 'key', 1)
+        accessed = self._accessed('key')
+        self.assertEqual(self.cache.get('ns', 'key'), 1)
+        self.assertEqual(self._accessed('key'), accessed)
+
+        self.cache.access_resolution = 0
+        self.assertEqual(self.cache.get('ns', 'key'), 1)
+        self.assertGreater(self._accessed('key'), accessed)
+
+    def test_hash_key_stable_between_processes(self):
+        key = ('a', frozenset({'x', 'y', 'z', ('w', frozenset({'u', 'v', 1}))}), frozenset(map(str, range(20))))
+        script = f"from core.utilities.caching import SQLiteCache; print(SQLiteCache.hash_key({key!r}))"
+        hashes = {subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                                 env={**environ, 'PYTHONHASHSEED': str(seed)}).stdout for seed in range(5)}
+        self.assertSetEqual(hashes, {SQLiteCache.hash_key(key) + '\n'})
+
+    def test_hash_key_distinguishes_sets(self):
+        self.assertEqual(SQLiteCache.hash_key(('a', 1)), SQLiteCache.hash_key(('a', 1)))
+        self.assertNotEqual(SQLiteCache.hash_key((frozenset({1, 2}),)), SQLiteCache.hash_key(((1, 2),)))
+        self.assertNotEqual(SQLiteCache.hash_key(frozenset({1})), SQLiteCache.hash_key(frozenset({2})))
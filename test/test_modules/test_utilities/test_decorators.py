@@ -0,0 +1,516 @@
+from tempfile import TemporaryDirectory
+from unittest import mock
+from weakref import ref
+import asyncio
+import gc
+import threading
+
+from core.utilities.caching import CacheInfo, LRUCache, SQLiteCache
+from core.utilities.auto_logging import LogLvl
+from core.utilities import decorators
+from core.utilities.decorators import RetryBudget, TokenBucket, cached_method, cached_property, log_execution, \
+    memoize, parallel_map, parallelize, rate_limit, retry
+from test.helpers.extension_classes import ExtendedTestCase
+
+
+class TestMemoizeCache(ExtendedTestCase):
+    def setUp(self):
+        self.calls = []
+
+    def _square(self, x, power=2):
+        self.calls.append(x)
+        return x ** power
+
+    def test_cache_info(self):
+        square = memoize()(self._square)
+        self.assertListEqual([square(2), square(3), square(2), square(2, power=3), square(2, 3)], [4, 9, 4, 8, 8])
+        self.assertListEqual(self.calls, [2, 3, 2, 2])
+        self.assertEqual(square.cache_info(), CacheInfo(hits=1, misses=4, evictions=0, size=4, max_size=None))
+
+        square.cache_clear()
+        self.assertEqual(square.cache_info(), CacheInfo(hits=0, misses=0, evictions=0, size=0, max_size=None))
+        square(2)
+        self.assertListEqual(self.calls, [2, 3, 2, 2, 2])
+
+    def test_lru_eviction_order(self):
+        square = memoize(max_size=2)(self._square)
+        square(1)
+        square(2)
+        square(1)  # 1 is now the most recently used, so 2 is evicted first.
+        square(3)
+        self.assertListEqual(list(square.cache), [(1,), (3,)])
+        square(1)
+        square(2)
+        self.assertListEqual(self.calls, [1, 2, 3, 2])
+        self.assertEqual(square.cache_info(), CacheInfo(hits=2, misses=4, evictions=2, size=2, max_size=2))
+
+        square.cache_clear()
+        self.assertEqual(square.cache_info().evictions, 0)
+
+    def test_ttl_expiry(self):
+        clock = FakeClock()
+        square = memoize(LRUCache(ttl=10, clock=clock))(self._square)
+        square(2)
+        clock.now = 9.9
+        square(2)
+        self.assertListEqual(self.calls, [2])
+        clock.now = 10
+        square(2)
+        self.assertListEqual(self.calls, [2, 2])
+        self.assertEqual(square.cache_info(), CacheInfo(hits=1, misses=2, evictions=1, size=1, max_size=None))
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            memoize(dict(), max_size=2)
+        with self.assertRaises(ValueError):
+            memoize(max_size=0)
+        with self.assertRaises(ValueError):
+            memoize(ttl=1, weak=True)
+
+    def test_unhashable_arguments(self):
+        square = memoize()(lambda values: [x * x for x in values])
+        self.assertListEqual(square([1, 2]), [1, 4])
+        self.assertEqual(square.cache_info(), CacheInfo(hits=0, misses=1, evictions=0, size=0, max_size=None))
+
+
+class Deck:
+    """A class using ``__slots__``, which can't be hashed, to cache the methods of."""
+    __slots__ = ('cards', 'counted', '__weakref__')
+    __hash__ = None
+
+    def __init__(self, cards: list[str]):
+        self.cards = cards
+        self.counted = 0
+
+    @cached_method
+    def count(self, color: str) -> int:
+        self.counted += 1
+        return sum(color in card for card in self.cards)
+
+    @cached_property
+    def size(self) -> int:
+        self.counted += 1
+        return len(self.cards)
+
+
+class UnhashableStr(str):
+    __hash__ = None
+
+
+class HashableDeck:
+    def __init__(self, cards: list[str]):
+        self.cards = cards
+        self.counted = 0
+
+    @memoize(weak=True)
+    def count(self, color: str) -> int:
+        self.counted += 1
+        return sum(color in card for card in self.cards)
+
+
+class TestWeakCaching(ExtendedTestCase):
+    def assertCollected(self, obj_ref: ref):
+        gc.collect()
+        self.assertIsNone(obj_ref())
+
+    def test_cached_method(self):
+        deck, other = Deck(['G', 'GW', 'U']), Deck(['G'])
+        self.assertListEqual([deck.count('G'), deck.count('G'), other.count('G'), deck.count(color='G')], [2, 2, 1, 2])
+        self.assertEqual((deck.counted, other.counted), (2, 1))
+        self.assertEqual(deck.count(UnhashableStr('G')), 2)
+        self.assertEqual(deck.counted, 3)
+
+        Deck.count.cache_clear(deck)
+        deck.count('G')
+        self.assertEqual(deck.counted, 4)
+
+        deck_ref = ref(deck)
+        del deck
+        self.assertCollected(deck_ref)
+        self.assertEqual(other.count('G'), 1)
+        self.assertEqual(other.counted, 1)
+
+    def test_cached_property(self):
+        deck = Deck(['G', 'U'])
+        self.assertEqual((deck.size, deck.size, deck.counted), (2, 2, 1))
+        deck.cards.append('R')
+        del deck.size
+        self.assertEqual((deck.size, deck.counted), (3, 2))
+        deck.size = 10
+        self.assertEqual(deck.size, 10)
+
+        deck_ref = ref(deck)
+        del deck
+        self.assertCollected(deck_ref)
+
+    def test_memoize_weak(self):
+        decks = [HashableDeck(['G', 'GW']), HashableDeck(['U'])]
+        self.assertListEqual([deck.count('G') for deck in decks * 2], [2, 0, 2, 0])
+        self.assertEqual(HashableDeck.count.cache_info().size, 2)
+
+        deck_ref = ref(decks[0])
+        del decks[0]
+        self.assertCollected(deck_ref)
+        self.assertEqual(HashableDeck.count.cache_info().size, 1)
+        HashableDeck.count.cache_clear()
+
+    def test_memoize_weak_strong_arguments(self):
+        square = memoize(weak=True)(lambda x: x * x)
+        self.assertListEqual([square(3), square(3)], [9, 9])
+        self.assertEqual(square.cache_info().hits, 1)
+
+
+class TestMemoizeBackend(ExtendedTestCase):
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.backend = SQLiteCache(self._dir.name)
+
+    def tearDown(self):
+        self.backend.close()
+        self._dir.cleanup()
+
+    def test_results_persist(self):
+        calls = []
+
+        def square(x):
+            calls.append(x)
+            return x * x
+
+        self.assertEqual(memoize(backend=self.backend)(square)(3), 9)
+        self.assertEqual(memoize(backend=self.backend)(square)(3), 9)
+        self.assertListEqual(calls, [3])
+
+    def test_unpicklable_arguments(self):
+        @memoize(backend=self.backend)
+        def call(func):
+            return func()
+
+        func = lambda: 7  # noqa: E731
+        self.assertEqual(call(func), 7)
+        self.assertEqual(call(func), 7)
+        self.assertEqual(call.cache_info().hits, 1)
+        self.assertLengthDunderEqual(self.backend, 0)
+
+
+class TestMemoizeCoalesce(ExtendedTestCase):
+    def test_async_calls_share_result(self):
+        calls = []
+
+        @memoize(coalesce=True)
+        async def fetch(x):
+            calls.append(x)
+            await asyncio.sleep(0.01)
+            return x * 2
+
+        async def run():
+            return await asyncio.gather(*(fetch(1) for _ in range(5)))
+
+        self.assertListEqual(asyncio.run(run()), [2] * 5)
+        self.assertListEqual(calls, [1])
+
+    def test_async_leader_cancelled(self):
+        calls = []
+
+        @memoize(coalesce=True)
+        async def fetch(x):
+            calls.append(x)
+            await asyncio.sleep(0.05)
+            return x * 2
+
+        async def run():
+            leader = asyncio.create_task(fetch(1))
+            await asyncio.sleep(0)
+            waiters = [asyncio.create_task(fetch(1)) for _ in range(3)]
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            results = await asyncio.gather(*waiters)
+            with self.assertRaises(asyncio.CancelledError):
+                await leader
+            return results
+
+        self.assertListEqual(asyncio.run(run()), [2] * 3)
+        self.assertListEqual(calls, [1, 1])
+
+    def test_async_waiter_timeout(self):
+        @memoize(coalesce=True)
+        async def fetch(x):
+            await asyncio.sleep(0.05)
+            return x * 2
+
+        async def run():
+            leader = asyncio.create_task(asyncio.wait_for(fetch(1), 0.01))
+            await asyncio.sleep(0.001)
+            waiter = asyncio.create_task(fetch(1))
+            with self.assertRaises(asyncio.TimeoutError):
+                await leader
+            return await waiter
+
+        self.assertEqual(asyncio.run(run()), 2)
+
+    def test_async_calls_on_separate_loops(self):
+        started = threading.Event()
+
+        @memoize(coalesce=True)
+        async def fetch(x):
+            started.set()
+            await asyncio.sleep(0.05)
+            return x * 2
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(asyncio.run(fetch(1))))
+        first.start()
+        started.wait(1)
+        results.append(asyncio.run(fetch(1)))
+        first.join()
+        self.assertListEqual(results, [2, 2])
+
+
+class FakeClock:
+    """A clock which only moves when slept on, or advanced."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    async def async_sleep(self, seconds: float) -> None:
+        self.sleep(seconds)
+
+
+class TestRetry(ExtendedTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.multiple(decorators, monotonic=self.clock, sleep=self.clock.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.calls = 0
+
+    def _failing(self, failures: int, exception: type[Exception] = ValueError):
+        """Creates a function which fails a number of times before it succeeds."""
+        def call():
+            self.calls += 1
+            if self.calls <= failures:
+                raise exception(self.calls)
+            return self.calls
+        return call
+
+    def test_retries_with_backoff(self):
+        call = retry(5, 1, backoff=2, max_delay=3)(self._failing(4))
+        self.assertEqual(call(), 5)
+        self.assertListEqual(self.clock.sleeps, [1, 2, 3, 3])
+
+    def test_max_tries(self):
+        call = retry(3, 1)(self._failing(10))
+        with self.assertRaises(ValueError):
+            call()
+        self.assertEqual(self.calls, 3)
+        self.assertListEqual(self.clock.sleeps, [1, 1])
+
+    def test_other_exceptions_not_retried(self):
+        call = retry(3, 1, exceptions=(KeyError,))(self._failing(1))
+        with self.assertRaises(ValueError):
+            call()
+        self.assertEqual(self.calls, 1)
+
+    def test_deadline(self):
+        # Tries start at 0, 1 and 3 seconds, and the next would start at 7, past the deadline.
+        call = retry(10, 1, backoff=2, deadline=4)(self._failing(10))
+        with self.assertRaises(ValueError):
+            call()
+        self.assertEqual(self.calls, 3)
+        self.assertListEqual(self.clock.sleeps, [1, 2])
+
+    def test_budget_exhausted(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=1, max_tokens=2, clock=self.clock)
+        call = retry(10, 0, budget=budget)(self._failing(100))
+        with self.assertRaises(ValueError):
+            call()
+        # 2 retries are saved up, and the call itself deposits half of another.
+        self.assertEqual(self.calls, 3)
+        self.assertEqual((budget.spent, budget.denied), (2, 1))
+
+        # Each call deposits half a retry, so only every other call is retried.
+        for calls, spent in ((4, 2), (6, 3), (7, 3)):
+            with self.assertRaises(ValueError):
+                call()
+            self.assertEqual(self.calls, calls)
+            self.assertEqual(budget.spent, spent)
+
+        # The budget refills over time, but never past max_tokens.
+        self.clock.now += 10
+        with self.assertRaises(ValueError):
+            call()
+        self.assertEqual(self.calls, 10)
+        self.assertEqual((budget.spent, budget.denied), (5, 5))
+
+    def test_budget_shared(self):
+        budget = RetryBudget(ratio=0, min_per_second=0, max_tokens=1, clock=self.clock)
+        first = retry(3, 0, budget=budget)(self._failing(1))
+        second = retry(3, 0, budget=budget)(self._failing(100))
+        self.assertEqual(first(), 2)
+        with self.assertRaises(ValueError):
+            second()
+        self.assertEqual(self.calls, 3)
+        self.assertEqual((budget.spent, budget.denied), (1, 1))
+
+
+class TestTokenBucket(ExtendedTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.bucket = TokenBucket(rate=2, capacity=2, clock=self.clock, sleep_func=self.clock.sleep,
+                                  async_sleep_func=self.clock.async_sleep)
+
+    def test_acquire(self):
+        waits = [self.bucket.acquire() for _ in range(6)]
+        self.assertListEqual(waits, [0.0, 0.0, 0.5, 0.5, 0.5, 0.5])
+        self.assertListEqual(self.clock.sleeps, [0.5] * 4)
+        self.assertEqual(self.clock.now, 2.0)
+
+    def test_acquire_refills(self):
+        self.bucket.acquire(2)
+        self.clock.now += 10
+        self.assertEqual(self.bucket.acquire(2), 0.0)
+        self.assertEqual(self.bucket.acquire(1), 0.5)
+        with self.assertRaises(ValueError):
+            self.bucket.acquire(3)
+
+    def test_try_acquire(self):
+        self.assertTrue(self.bucket.try_acquire())
+        self.assertTrue(self.bucket.try_acquire())
+        self.assertFalse(self.bucket.try_acquire())
+        self.clock.now += 0.25
+        self.assertFalse(self.bucket.try_acquire())
+        self.clock.now += 0.25
+        self.assertTrue(self.bucket.try_acquire())
+        self.assertEqual(self.bucket.acquired, 3)
+        self.assertListEqual(self.clock.sleeps, [])
+
+    def test_acquire_async(self):
+        @rate_limit(self.bucket)
+        async def call(x):
+            return x
+
+        async def run():
+            return [await call(i) for i in range(4)]
+
+        self.assertListEqual(asyncio.run(run()), [0, 1, 2, 3])
+        self.assertListEqual(self.clock.sleeps, [0.5, 0.5])
+
+    def test_wait_metrics(self):
+        self.assertEqual(self.bucket.mean_wait, 0.0)
+        self.bucket.acquire(2)
+        self.bucket.acquire(1)
+        self.bucket.acquire(2)
+        self.assertEqual(self.bucket.acquired, 3)
+        self.assertEqual(self.bucket.waits, 2)
+        self.assertAlmostEqual(self.bucket.total_wait, 1.5)
+        self.assertAlmostEqual(self.bucket.max_wait, 1.0)
+        self.assertAlmostEqual(self.bucket.mean_wait, 0.5)
+
+    def test_rate_limit(self):
+        @rate_limit(self.bucket, tokens=2)
+        def call(x):
+            return x
+
+        self.assertListEqual([call(i) for i in range(3)], [0, 1, 2])
+        self.assertIs(call.bucket, self.bucket)
+        self.assertListEqual(self.clock.sleeps, [1.0, 1.0])
+
+
+class TestLogExecution(ExtendedTestCase):
+    def test_logs_at_level(self):
+        @log_execution(LogLvl.INFO, include_args=True)
+        def add(x, y=1):
+            return x + y
+
+        with self.assertLogs(level='INFO') as logs:
+            self.assertEqual(add(1, y=2), 3)
+        self.assertListEqual([record.levelno for record in logs.records], [LogLvl.INFO] * 2)
+        self.assertListEqual(logs.output, ['INFO:root:Executing add(1, y=2)...', 'INFO:root:Finished executing add...'])
+
+    def test_disabled_level_not_logged(self):
+        @log_execution(LogLvl.DEBUG, include_time=True)
+        def add(x, y=1):
+            return x + y
+
+        with self.assertNoLogs(level='INFO'):
+            self.assertEqual(add(1), 2)
+        with self.assertLogs(level='DEBUG') as logs:
+            self.assertEqual(add(1), 2)
+        self.assertRegex(logs.output[1], r'^DEBUG:root:Finished executing add in [\d.]+ \w+s\.\.\.$')
+
+    def test_sample_every(self):
+        calls = []
+
+        @log_execution(LogLvl.INFO, sample_every=3)
+        def call(x):
+            calls.append(x)
+
+        with self.assertLogs(level='INFO') as logs:
+            for i in range(7):
+                call(i)
+        self.assertListEqual(calls, list(range(7)))
+        # The 1st, 4th and 7th calls are logged, with a start and end message each.
+        self.assertEqual(len(logs.records), 6)
+
+    def test_log_func(self):
+        for make_decorator in (lambda messages: log_execution(messages.append),
+                               lambda messages: log_execution(log_func=messages.append)):
+            messages = []
+
+            @make_decorator(messages)
+            def call():
+                return 1
+
+            self.assertEqual(call(), 1)
+            self.assertListEqual(messages, ['Executing call...', 'Finished executing call...'])
+
+
+# The functions mapped in worker processes must be importable, so are defined at the top level.
+def _square(x: int) -> int:
+    return x * x
+
+
+def _fail_on_13(x: int) -> int:
+    if x == 13:
+        raise ValueError(x)
+    return x
+
+
+@parallelize(max_workers=2, chunk_size=3)
+def _scale(x: int, factor: int, offset: int = 0) -> int:
+    return x * factor + offset
+
+
+class TestParallelMap(ExtendedTestCase):
+    def test_results_ordered(self):
+        expected = [x * x for x in range(200)]
+        for chunk_size in (None, 1, 7):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertListEqual(list(parallel_map(_square, range(200), 2, chunk_size)), expected)
+        # Iterables without a length are read lazily, a few chunks at a time.
+        self.assertListEqual(list(parallel_map(_square, iter(range(200)), 2, max_pending=2)), expected)
+
+    def test_results_unordered(self):
+        self.assertListEqual(sorted(parallel_map(_square, range(100), 2, 5, ordered=False)),
+                             [x * x for x in range(100)])
+
+    def test_errors_raised(self):
+        failures = []
+        results = parallel_map(_fail_on_13, range(100), 2, 4, notifier=lambda ex, name: failures.append((ex, name)))
+        with self.assertLogs(level='ERROR'), self.assertRaises(ValueError):
+            list(results)
+        self.assertEqual(len(failures), 1)
+        self.assertEqual((failures[0][0].args, failures[0][1]), ((13,), '_fail_on_13'))
+
+    def test_parallelize(self):
+        self.assertEqual(_scale(2, 3), 6)
+        self.assertListEqual(list(_scale.map(range(10), 3)), [x * 3 for x in range(10)])
+        self.assertListEqual(list(_scale.map(range(10), 3, offset=1)), [x * 3 + 1 for x in range(10)])
+        self.assertListEqual(list(_scale.map([])), [])
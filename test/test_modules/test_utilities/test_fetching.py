@@ -0,0 +1,117 @@
+from tempfile import TemporaryDirectory
+from threading import Lock
+import json
+
+from core.utilities.fetching import Fetcher
+from test.helpers.extension_classes import ExtendedTestCase
+from test.helpers.json_server import JsonHandler, start_server
+
+
+class _RecordingHandler(JsonHandler):
+    """Records the requests it serves, and responds with any queued statuses before the body."""
+    body = json.dumps([{'name': 'Llanowar Elves'}]).encode()
+    lock = Lock()
+    requests: list[dict[str, str]] = []
+    statuses: list[int] = []
+    # Whether to close the connection after responding, without telling the client.
+    drop_connections = False
+
+    def do_GET(self):
+        with self.lock:
+            self.requests.append(dict(self.headers))
+            status = self.statuses.pop(0) if self.statuses else None
+        if status is not None:
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        else:
+            super().do_GET()
+        if self.drop_connections:
+            self.close_connection = True
+
+
+class TestFetcher(ExtendedTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = start_server(_RecordingHandler)
+        cls.url = f'http://127.0.0.1:{cls.server.server_port}/cards/1'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.folder = self._dir.name
+        _RecordingHandler.requests = []
+        _RecordingHandler.statuses = []
+        _RecordingHandler.drop_connections = False
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _fetcher(self, **kwargs) -> Fetcher:
+        fetcher = Fetcher(**{'fail_delay': 0.0, **kwargs})
+        self.addCleanup(fetcher.close)
+        return fetcher
+
+    def test_fetch_json(self):
+        fetcher = self._fetcher()
+        self.assertListEqual(fetcher.fetch_json(self.url), [{'name': 'Llanowar Elves'}])
+        self.assertDictEqual(fetcher.fetch_json_many([self.url, self.url + '0']),
+                             {self.url: [{'name': 'Llanowar Elves'}], self.url + '0': [{'name': 'Llanowar Elves'}]})
+
+    def test_revalidates_cached_response(self):
+        fetcher = self._fetcher(cache_folder=self.folder)
+        first = fetcher.fetch(self.url)
+        self.assertEqual((first.status, first.from_cache), (200, False))
+
+        second = fetcher.fetch(self.url)
+        self.assertEqual((second.status, second.from_cache), (304, True))
+        self.assertEqual(second.body, first.body)
+        self.assertNotIn('If-None-Match', _RecordingHandler.requests[0])
+        self.assertEqual(_RecordingHandler.requests[1].get('If-None-Match'), JsonHandler.etag)
+
+    def test_max_age_skips_request(self):
+        fetcher = self._fetcher(cache_folder=self.folder, max_age=3600)
+        first = fetcher.fetch(self.url)
+        second = fetcher.fetch(self.url)
+        self.assertEqual((second.status, second.from_cache), (0, True))
+        self.assertEqual(second.body, first.body)
+        self.assertEqual(len(_RecordingHandler.requests), 1)
+
+        third = fetcher.fetch(self.url, max_age=0)
+        self.assertEqual(third.status, 304)
+        self.assertEqual(len(_RecordingHandler.requests), 2)
+
+    def test_stale_pooled_connection(self):
+        _RecordingHandler.drop_connections = True
+        fetcher = self._fetcher(max_tries=1)
+        self.assertIsNotNone(fetcher.fetch(self.url))
+        self.assertIsNotNone(fetcher.fetch(self.url))
+        # The pooled connection was closed by the server, so a second one is opened, without a retry.
+        self.assertEqual(fetcher.pool.opened, 2)
+        self.assertEqual(len(_RecordingHandler.requests), 2)
+
+    def test_retries_statuses(self):
+        _RecordingHandler.statuses = [429, 503]
+        fetcher = self._fetcher(max_tries=3)
+        result = fetcher.fetch(self.url)
+        self.assertEqual(result.status, 200)
+        self.assertEqual(len(_RecordingHandler.requests), 3)
+        self.assertEqual(fetcher.pool.opened, 1)
+
+    def test_gives_up_after_max_tries(self):
+        _RecordingHandler.statuses = [500, 502, 200]
+        fetcher = self._fetcher(max_tries=2)
+        with self.assertLogs(level='ERROR'):
+            self.assertIsNone(fetcher.fetch(self.url))
+        self.assertEqual(len(_RecordingHandler.requests), 2)
+
+    def test_unsuccessful_status(self):
+        _RecordingHandler.statuses = [404]
+        fetcher = self._fetcher(max_tries=3)
+        with self.assertLogs(level='ERROR'):
+            self.assertIsNone(fetcher.fetch(self.url))
+        self.assertEqual(len(_RecordingHandler.requests), 1)
@@ -0,0 +1,352 @@
+from tempfile import TemporaryDirectory
+import gzip
+import json
+import os
+import random
+import unittest
+
+from core.utilities.funcs import (SNAPSHOT_STATS, StringExtractor, flatten_lists, isolate_string,
+                                  iter_flatten_lists, iter_json_file, iter_subtract_lists, iter_weave_lists,
+                                  lists_equal, load_json_file, load_json_files, load_json_files_iter,
+                                  reformat_json_file, subtract_lists, weave_lists)
+from test.helpers.extension_classes import ExtendedTestCase
+
+try:
+    import numpy
+except ImportError:  # pragma: nocover
+    numpy = None
+
+
+class TestIterLists(ExtendedTestCase):
+    def test_iter_flatten_lists(self):
+        for lists in ([], [[]], [[1, 2], [], [3], [2, 1, 2]], [list('abc'), list('cba')]):
+            with self.subTest(lists=lists):
+                self.assertListEqual(list(iter_flatten_lists(lists)), flatten_lists(lists))
+                self.assertListEqual(list(iter_flatten_lists(iter(lst) for lst in lists)), flatten_lists(lists))
+
+    def test_iter_subtract_lists(self):
+        rng = random.Random(9)
+        cases = [([], [1]), ([1, 2, 3], []), ([1, 1, 1], [1, 1, 1, 1]), ([3, 1, 3, 2, 3, 1], [3, 3, 5]),
+                 (list('abracadabra'), list('aarc'))]
+        # Few distinct values, so there are many duplicates.
+        cases += [([rng.randrange(6) for _ in range(rng.randrange(40))],
+                   [rng.randrange(8) for _ in range(rng.randrange(20))]) for _ in range(200)]
+        for l_lst, r_lst in cases:
+            for right_to_left in (False, True):
+                with self.subTest(l_lst=l_lst, r_lst=r_lst, right_to_left=right_to_left):
+                    self.assertListEqual(list(iter_subtract_lists(iter(l_lst), iter(r_lst), right_to_left)),
+                                         subtract_lists(l_lst, r_lst, right_to_left))
+
+    def test_iter_subtract_lists_lazy(self):
+        def elements():
+            yield from (1, 2, 1)
+            raise AssertionError('Read too far.')
+
+        # Only the last occurrence of 1 is removed, so once the second is read, the first and 2 are kept.
+        remaining = iter_subtract_lists(elements(), [1], right_to_left=True)
+        self.assertListEqual([next(remaining), next(remaining)], [1, 2])
+        remaining = iter_subtract_lists(elements(), [2])
+        self.assertListEqual([next(remaining), next(remaining)], [1, 1])
+
+    def test_iter_weave_lists(self):
+        for l1, l2 in (([], []), ([1, 1], [2, 2]), (list('abc'), [1, 2, 3])):
+            with self.subTest(l1=l1, l2=l2):
+                self.assertListEqual(list(iter_weave_lists(iter(l1), iter(l2))), weave_lists(l1, l2))
+
+        self.assertListEqual(list(iter_weave_lists([1, 2, 3], [4], strict=False)), [1, 4])
+        for l1, l2 in (([1, 2, 3], [4]), ([1], [4, 5])):
+            with self.subTest(l1=l1, l2=l2):
+                with self.assertRaises(ValueError):
+                    weave_lists(l1, l2)
+                weave = iter_weave_lists(l1, l2)
+                self.assertListEqual([next(weave), next(weave)], [l1[0], l2[0]])
+                with self.assertRaises(ValueError):
+                    next(weave)
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TestNumpyLists(ExtendedTestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        # Few distinct values, so there are many duplicates.
+        self.l_lst = [rng.randrange(10) for _ in range(200)]
+        self.r_lst = [rng.randrange(12) for _ in range(60)]
+
+    def test_flatten_lists(self):
+        lists = [self.l_lst[i:i + 7] for i in range(0, len(self.l_lst), 7)]
+        self.assertListEqual(flatten_lists([numpy.array(lst) for lst in lists]).tolist(), flatten_lists(lists))
+        grid = numpy.arange(24).reshape(2, 3, 4)
+        self.assertListEqual(flatten_lists(grid).tolist(), flatten_lists(grid.tolist()))
+
+    def test_lists_equal(self):
+        arr = numpy.array(self.l_lst)
+        for other in (self.l_lst, self.l_lst[:-1], self.l_lst[:-1] + [-1], list(reversed(self.l_lst))):
+            with self.subTest(other=other[:5]):
+                self.assertIs(lists_equal(arr, numpy.array(other)), lists_equal(self.l_lst, other))
+                self.assertIs(lists_equal(arr, other), lists_equal(self.l_lst, other))
+
+    def test_subtract_lists(self):
+        cases = ((self.l_lst, self.r_lst), (self.l_lst, []), ([], self.r_lst), (self.l_lst, self.l_lst),
+                 (self.l_lst, self.l_lst * 2), ([3, 1, 3, 2, 3, 1], [3, 3, 5]))
+        for l_lst, r_lst in cases:
+            for right_to_left in (False, True):
+                with self.subTest(l_lst=l_lst[:5], r_lst=r_lst[:5], right_to_left=right_to_left):
+                    expected = subtract_lists(l_lst, r_lst, right_to_left)
+                    actual = subtract_lists(numpy.array(l_lst, dtype=int), numpy.array(r_lst, dtype=int),
+                                            right_to_left)
+                    self.assertIsInstance(actual, numpy.ndarray)
+                    self.assertListEqual(actual.tolist(), expected)
+                    self.assertListEqual(subtract_lists(numpy.array(l_lst, dtype=int), r_lst, right_to_left).tolist(),
+                                         expected)
+
+    def test_subtract_lists_strings(self):
+        l_lst, r_lst = list('abracadabra'), list('aarc')
+        for right_to_left in (False, True):
+            with self.subTest(right_to_left=right_to_left):
+                self.assertListEqual(subtract_lists(numpy.array(l_lst), numpy.array(r_lst), right_to_left).tolist(),
+                                     subtract_lists(l_lst, r_lst, right_to_left))
+
+    def test_weave_lists(self):
+        l1, l2 = self.l_lst[:60], self.r_lst
+        self.assertListEqual(weave_lists(numpy.array(l1), numpy.array(l2)).tolist(), weave_lists(l1, l2))
+        self.assertListEqual(weave_lists(numpy.array(l1), numpy.array(l2, dtype=float)).tolist(),
+                             weave_lists(l1, [float(val) for val in l2]))
+        pairs = numpy.arange(12).reshape(6, 2)
+        self.assertListEqual(weave_lists(pairs, pairs + 100).tolist(),
+                             weave_lists(pairs.tolist(), (pairs + 100).tolist()))
+        with self.assertRaises(ValueError):
+            weave_lists(numpy.array(l1), numpy.array(l2[:-1]))
+
+
+class TestIterJsonFile(ExtendedTestCase):
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.folder = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _write(self, filename: str, text: str) -> None:
+        with open(f"{self.folder}/{filename}", 'w') as f:
+            f.write(text)
+
+    def test_numbers_split_across_chunks(self):
+        rng = random.Random(17)
+        data = [rng.random() for _ in range(50)] + [rng.random() * 10 ** rng.randint(-30, 30) for _ in range(50)]
+        data += [-1.5e-7, 2E+10, 123456789, -0.0, 0, 1e5]
+        self._write('numbers.json', json.dumps(data))
+        self._write('exponents.json', '[1e5,2E-3,-4.25e+12 , 7e0,\n8.5E2]')
+        for chunk_size in range(1, 9):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertListEqual(list(iter_json_file(self.folder, 'numbers.json', chunk_size=chunk_size)), data)
+                self.assertListEqual(list(iter_json_file(self.folder, 'exponents.json', chunk_size=chunk_size)),
+                                     [1e5, 2e-3, -4.25e12, 7.0, 850.0])
+
+    def test_key_path_skips_numbers(self):
+        self._write('nested.json', '{"a": 1.25e3, "b": -7.5, "c": {"d": 2e-2}, "e": [3.5, 4e1]}')
+        for chunk_size in range(1, 9):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertListEqual(list(iter_json_file(self.folder, 'nested.json', 'e', chunk_size=chunk_size)),
+                                     [3.5, 40.0])
+
+    def test_large_float_array(self):
+        rng = random.Random(3)
+        data = [rng.random() for _ in range(20000)]
+        self._write('floats.json', json.dumps(data))
+        self.assertListEqual(list(iter_json_file(self.folder, 'floats.json')), data)
+
+
+class TestReformatJsonFile(ExtendedTestCase):
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.folder = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _write(self, filename: str, text: str) -> None:
+        with open(f"{self.folder}/{filename}", 'w') as f:
+            f.write(text)
+
+    def _read(self, filename: str) -> str:
+        with open(f"{self.folder}/{filename}") as f:
+            return f.read()
+
+    def test_reformats_array(self):
+        rng = random.Random(5)
+        data = [rng.random() for _ in range(20000)] + [{'a': [1, 2]}, 'b', None]
+        self._write('data.json', json.dumps(data))
+        reformat_json_file(self.folder, 'data.json', indent=2)
+        self.assertEqual(self._read('data.json'), json.dumps(data, indent=2))
+
+    def test_trailing_data_left_untouched(self):
+        for text in ('[1, 2] garbage', '[1, 2]]', '[1, 2] [3]', '[1, 2]\n{"a": 1}'):
+            with self.subTest(text=text):
+                self._write('data.json', text)
+                with self.assertLogs(level='ERROR'):
+                    reformat_json_file(self.folder, 'data.json')
+                self.assertEqual(self._read('data.json'), text)
+                self.assertListEqual(os.listdir(self.folder), ['data.json'])
+
+
+class TestLoadJsonFiles(ExtendedTestCase):
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.folder = self._dir.name
+        rng = random.Random(11)
+        for i in range(12):
+            with open(f"{self.folder}/{i:02}.json", 'w') as f:
+                json.dump({'id': i, 'values': [rng.random() for _ in range(rng.randrange(50))]}, f)
+        with gzip.open(f"{self.folder}/compressed.json.gz", 'wt') as f:
+            json.dump([{'a': 1}, None], f)
+        with open(f"{self.folder}/broken.json", 'w') as f:
+            f.write('{"a": ')
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _sequential(self, filenames: list[str]) -> dict:
+        with self.assertLogs(level='ERROR'):
+            return {filename: load_json_file(self.folder, filename) for filename in filenames}
+
+    def test_matches_sequential(self):
+        filenames = sorted(name for name in os.listdir(self.folder) if name.endswith('.json'))
+        expected = self._sequential(filenames)
+        self.assertIsNone(expected['broken.json'])
+        for kwargs in ({}, {'max_workers': 1}, {'max_workers': 3, 'chunk_size': 5}, {'chunk_size': 20}):
+            with self.subTest(**kwargs):
+                with self.assertLogs(level='ERROR'):
+                    actual = load_json_files(self.folder, **kwargs)
+                self.assertListEqual(list(actual.items()), list(expected.items()))
+        # A broken file would be logged by the worker process, where it can't be caught.
+        del expected['broken.json']
+        actual = load_json_files(self.folder, list(expected), use_processes=True, max_workers=2, chunk_size=4)
+        self.assertListEqual(list(actual.items()), list(expected.items()))
+
+    def test_unordered_matches_sequential(self):
+        filenames = sorted(name for name in os.listdir(self.folder) if name.endswith('.json'))
+        expected = self._sequential(filenames)
+        with self.assertLogs(level='ERROR'):
+            actual = list(load_json_files_iter(self.folder, max_workers=4, ordered=False))
+        self.assertCountEqual([name for name, _ in actual], filenames)
+        self.assertDictEqual(dict(actual), expected)
+
+    def test_filenames(self):
+        filenames = ['compressed.json.gz', '03.json', '01.json', '03.json']
+        expected = {filename: load_json_file(self.folder, filename) for filename in filenames}
+        self.assertListEqual(list(load_json_files_iter(self.folder, filenames, chunk_size=2)),
+                             [(filename, expected[filename]) for filename in filenames])
+        self.assertListEqual(list(load_json_files(self.folder, '*.gz').items()),
+                             [('compressed.json.gz', [{'a': 1}, None])])
+        self.assertDictEqual(load_json_files(self.folder, '*.missing'), {})
+
+
+class TestJsonSnapshot(ExtendedTestCase):
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.folder = self._dir.name
+        self.filepath = f"{self.folder}/data.json"
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def _write(self, data: dict, mtime_ns: int) -> None:
+        with open(self.filepath, 'w') as f:
+            json.dump(data, f)
+        os.utime(self.filepath, ns=(mtime_ns, mtime_ns))
+
+    def assertLoads(self, data: dict, rebuilt: bool):
+        before = dict(SNAPSHOT_STATS)
+        self.assertDictEqual(load_json_file(self.folder, 'data.json', snapshot=True), data)
+        self.assertDictEqual({key: SNAPSHOT_STATS[key] - before[key] for key in before},
+                             {'hits': int(not rebuilt), 'rebuilds': int(rebuilt)})
+
+    def test_rebuilt_when_source_changes(self):
+        mtime_ns = 1_700_000_000 * 10 ** 9
+        self._write({'a': 1}, mtime_ns)
+        self.assertLoads({'a': 1}, rebuilt=True)
+        self.assertTrue(os.path.isfile(f"{self.folder}/.data.json.snapshot"))
+        self.assertLoads({'a': 1}, rebuilt=False)
+
+        with self.subTest('size changed'):
+            self._write({'a': 100}, mtime_ns)
+            self.assertLoads({'a': 100}, rebuilt=True)
+            self.assertLoads({'a': 100}, rebuilt=False)
+
+        with self.subTest('modification time changed'):
+            # The size is the same, so the content hash shows the change.
+            self._write({'a': 200}, mtime_ns + 1)
+            self.assertLoads({'a': 200}, rebuilt=True)
+            self.assertLoads({'a': 200}, rebuilt=False)
+
+        with self.subTest('only modification time changed'):
+            # The content is unchanged, so the snapshot is reused and refreshed with the new time.
+            os.utime(self.filepath, ns=(mtime_ns + 2, mtime_ns + 2))
+            self.assertLoads({'a': 200}, rebuilt=False)
+            self._write({'a': 300}, mtime_ns + 3)
+            self.assertLoads({'a': 300}, rebuilt=True)
+
+    def test_rebuilt_when_snapshot_broken(self):
+        self._write({'a': 1}, 1_700_000_000 * 10 ** 9)
+        self.assertLoads({'a': 1}, rebuilt=True)
+        with open(f"{self.folder}/.data.json.snapshot", 'r+b') as f:
+            f.truncate(10)
+        with self.assertLogs(level='ERROR'):
+            self.assertLoads({'a': 1}, rebuilt=True)
+        self.assertLoads({'a': 1}, rebuilt=False)
+
+
+class TestStringExtractor(ExtendedTestCase):
+    FIELDS = {
+        'name': ('<h1>', '</h1>'),
+        'cost': ('<span>', '</span>'),
+        'second span': ('</span>', '</span>'),
+        'after name': ('</h1>', None),
+        'before name': (None, '<h1>'),
+        'whole': (None, None),
+        'empty': ('', ''),
+        'shared from': ('<span>', '<'),
+        'missing from': ('<h2>', '</h2>'),
+        'missing to': ('<h1>', '</h2>'),
+        'to before from': ('</span>', '<h1>'),
+    }
+    TEXTS = (
+        ' <h1> Card </h1>\n<span>{1}{G}</span> <span> Rare </span> ',
+        '<span>{W}</span><h1>Name</h1><h2>x</h2>',
+        '<h1></h1><h1>Twice</h1></span></span>',
+        '',
+    )
+
+    def _isolate(self, text: str, isolate_from: str, isolate_to: str):
+        try:
+            return isolate_string(text, isolate_from, isolate_to)
+        except ValueError:
+            return None
+
+    def test_matches_isolate_string(self):
+        extractor = StringExtractor(self.FIELDS)
+        for text in self.TEXTS:
+            with self.subTest(text=text):
+                self.assertDictEqual(extractor.extract(text, strict=False),
+                                     {name: self._isolate(text, *markers) for name, markers in self.FIELDS.items()})
+
+    def test_strict(self):
+        for text in self.TEXTS:
+            for name, markers in self.FIELDS.items():
+                with self.subTest(text=text, name=name):
+                    extractor = StringExtractor({name: markers})
+                    expected = self._isolate(text, *markers)
+                    if expected is None:
+                        self.assertRaises(ValueError, extractor.extract, text)
+                    else:
+                        self.assertDictEqual(extractor.extract(text), {name: expected})
+
+    def test_extract_many(self):
+        extractor = StringExtractor(self.FIELDS)
+        expected = [extractor.extract(text, strict=False) for text in self.TEXTS]
+        for max_workers in (1, 2):
+            with self.subTest(max_workers=max_workers):
+                self.assertListEqual(list(extractor.extract_many(iter(self.TEXTS), strict=False,
+                                                                 max_workers=max_workers, chunk_size=1)), expected)
+        with self.assertRaises(ValueError):
+            list(extractor.extract_many(self.TEXTS))
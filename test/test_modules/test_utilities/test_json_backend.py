@@ -0,0 +1,116 @@
+from tempfile import TemporaryDirectory
+import json
+import unittest
+
+from core.utilities import json_backend
+from core.utilities.funcs import JsonArrayWriter, load_json_file, save_json_file, validate_json
+from test.helpers.extension_classes import ExtendedTestCase
+
+
+DATA = [
+    {'name': 'Llanowar Elves', 'cmc': 1, 'colors': ['G'], 'rating': 3.75, 'text': 'T: Add {G}.'},
+    {'name': 'Æther Vial', 'cmc': 1, 'colors': [], 'rating': 1e16, 'nested': {'a': [1, {'b': 2}], 'c': {}}},
+    [123456789012345678901234567890, -9223372036854775809, 18446744073709551615, 0.1, -0.0],
+    {'nan': float('nan'), 'inf': float('inf'), '-inf': float('-inf'), 'none': None},
+    {1: 'int key', 'true': True, 'false': False},
+    'top-level string', 42, [], {},
+]
+
+
+class TestJsonBackend(ExtendedTestCase):
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.folder = self._dir.name
+        self._previous = json_backend.get_json_backend()
+
+    def tearDown(self):
+        json_backend.set_json_backend(self._previous)
+        self._dir.cleanup()
+
+    def assertJsonEquivalent(self, actual, expected):
+        """Compares objects by their ``json`` text, so that ``NaN`` compares equal to itself."""
+        self.assertEqual(json.dumps(actual), json.dumps(expected))
+
+    def _read(self, filename: str) -> str:
+        with open(f"{self.folder}/{filename}", encoding='utf-8') as f:
+            return f.read()
+
+    def test_default_backend(self):
+        self.assertEqual(json_backend.set_json_backend(), json_backend.STDLIB)
+        self.assertIn(json_backend.STDLIB, json_backend.available_backends())
+        with self.assertRaises(ValueError):
+            json_backend.set_json_backend('not-a-backend')
+
+    def test_stdlib_matches_json_exactly(self):
+        json_backend.set_json_backend(json_backend.STDLIB)
+        for indent in (None, 2, 4, '\t'):
+            with self.subTest(indent=indent):
+                self.assertTrue(save_json_file(self.folder, 'data.json', DATA, indent=indent))
+                self.assertEqual(self._read('data.json'), json.dumps(DATA, indent=indent))
+
+    def test_save_load_round_trip(self):
+        expected = json.loads(json.dumps(DATA))
+        for backend in json_backend.available_backends():
+            json_backend.set_json_backend(backend)
+            for indent in (None, 2, 4):
+                with self.subTest(backend=backend, indent=indent):
+                    self.assertTrue(save_json_file(self.folder, 'data.json', DATA, indent=indent))
+                    self.assertJsonEquivalent(json.loads(self._read('data.json')), expected)
+                    self.assertJsonEquivalent(load_json_file(self.folder, 'data.json'), expected)
+
+    def test_array_writer_round_trip(self):
+        expected = json.loads(json.dumps(DATA))
+        for backend in json_backend.available_backends():
+            json_backend.set_json_backend(backend)
+            for indent in (None, 4):
+                with self.subTest(backend=backend, indent=indent):
+                    with JsonArrayWriter(self.folder, 'data.json', indent=indent) as writer:
+                        writer.write_all(DATA)
+                    self.assertJsonEquivalent(json.loads(self._read('data.json')), expected)
+
+    def test_loads_matches_json(self):
+        texts = ['123456789012345678901234567890', '[-9223372036854775809, 18446744073709551616]',
+                 '[NaN, Infinity, -Infinity]', '{"a": 0.30000000000000004, "b": 1e400}', '"\\u00c6ther"']
+        for backend in json_backend.available_backends():
+            json_backend.set_json_backend(backend)
+            for text in texts:
+                with self.subTest(backend=backend, text=text):
+                    self.assertJsonEquivalent(json_backend.loads(text), json.loads(text))
+                    self.assertJsonEquivalent(json_backend.loads(text.encode()), json.loads(text))
+                    self.assertTrue(validate_json(text))
+
+    def test_dumps_parses_back_equal(self):
+        for backend in json_backend.available_backends():
+            json_backend.set_json_backend(backend)
+            for indent in (None, 2, 4):
+                with self.subTest(backend=backend, indent=indent):
+                    self.assertJsonEquivalent(json.loads(json_backend.dumps(DATA, indent=indent)),
+                                              json.loads(json.dumps(DATA)))
+
+    def test_consistent_separators(self):
+        data = [1, {'b': 2}, [3, 4]]
+        for backend in json_backend.available_backends():
+            json_backend.set_json_backend(backend)
+            with self.subTest(backend=backend):
+                item_sep, key_sep = json_backend.separators()
+                self.assertTrue(save_json_file(self.folder, 'data.json', data, indent=None))
+                self.assertEqual(self._read('data.json'), json_backend.dumps(data))
+                self.assertEqual(self._read('data.json'), json.dumps(data, separators=(item_sep, key_sep)))
+
+    @unittest.skipIf(json_backend.ORJSON not in json_backend.available_backends(), 'orjson is not installed')
+    def test_orjson_indents_as_json(self):
+        json_backend.set_json_backend(json_backend.ORJSON)
+        data = [DATA[0], {'nested': {'deeper': [1, [2, {'deepest': None}]], 'empty': [], 'text': '  a\n  b'}}]
+        for indent in (2, 4, '\t', 0):
+            with self.subTest(indent=indent):
+                self.assertEqual(json_backend.dumps(data, indent=indent),
+                                 json.dumps(data, indent=indent, ensure_ascii=False))
+
+    @unittest.skipIf(json_backend.ORJSON not in json_backend.available_backends(), 'orjson is not installed')
+    def test_orjson_only_falls_back_for_non_finite(self):
+        json_backend.set_json_backend(json_backend.ORJSON)
+        # orjson writes non-ASCII characters as they are, where json escapes them.
+        self.assertEqual(json_backend.dumps({'name': 'Æther', 'rating': None}), '{"name":"Æther","rating":null}')
+        self.assertEqual(json_backend.dumps([{'name': 'Æther', 'rating': float('nan')}]),
+                         '[{"name":"\\u00c6ther","rating":NaN}]')
+        self.assertEqual(json_backend.dumps(float('-inf')), '-Infinity')
@@ -0,0 +1,70 @@
+from tempfile import TemporaryDirectory
+from os import listdir, path, remove
+
+from core.utilities.record_store import INDEX_FILE, RecordStore, _segment_name
+from test.helpers.extension_classes import ExtendedTestCase
+
+
+class TestRecordStore(ExtendedTestCase):
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.folder = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_append_replaces_by_key(self):
+        with RecordStore(self.folder, key='id') as store:
+            store.extend([{'id': 1, 'v': 1}, {'id': 2, 'v': 1}, {'id': 1, 'v': 2}])
+            self.assertEqual(store.get(1), {'id': 1, 'v': 2})
+            self.assertListEqual(list(store), [{'id': 2, 'v': 1}, {'id': 1, 'v': 2}])
+            self.assertEqual(store.compact(), 1)
+        with RecordStore(self.folder, key='id') as store:
+            self.assertListEqual(store.keys(), [2, 1])
+
+    def test_unindexable_record_not_written(self):
+        store = RecordStore(self.folder, key='id')
+        store.append({'id': 1, 'v': 1})
+        with self.assertRaises(KeyError):
+            store.append({'v': 2})
+        with self.assertRaises(TypeError):
+            store.append({'id': [1, 2], 'v': 3})
+        store.append({'id': 2, 'v': 4})
+        store.close()
+
+        with open(path.join(self.folder, _segment_name(1)), 'rb') as f:
+            self.assertEqual(len(f.readlines()), 2)
+        remove(path.join(self.folder, INDEX_FILE))
+        with RecordStore(self.folder, key='id') as store:
+            self.assertListEqual(list(store), [{'id': 1, 'v': 1}, {'id': 2, 'v': 4}])
+
+    def test_invalid_lines_skipped_when_rebuilding(self):
+        with RecordStore(self.folder, key='id') as store:
+            store.append({'id': 1, 'v': 1})
+        with open(path.join(self.folder, _segment_name(1)), 'ab') as f:
+            f.write(b'{"v": 2}\n{"id": [1]}\nnot json\n{"id": 2, "v": 3}\n')
+        remove(path.join(self.folder, INDEX_FILE))
+
+        with self.assertLogs(level='WARNING') as logs:
+            store = RecordStore(self.folder, key='id')
+        self.assertEqual(len(logs.records), 3)
+        with store:
+            self.assertListEqual(list(store), [{'id': 1, 'v': 1}, {'id': 2, 'v': 3}])
+            store.append({'id': 3})
+        with RecordStore(self.folder, key='id') as store:
+            self.assertListEqual(store.keys(), [1, 2, 3])
+
+    def test_compact_while_iterating(self):
+        with RecordStore(self.folder, key='id', max_segment_bytes=64) as store:
+            for v in range(3):
+                store.extend({'id': i, 'v': v} for i in range(10))
+            segments = sorted(listdir(self.folder))
+            records = iter(store)
+            first = next(records)
+
+            self.assertEqual(store.compact(), 20)
+            self.assertTrue(all(path.exists(path.join(self.folder, name)) for name in segments))
+            rest = list(records)
+            self.assertListEqual([first] + rest, [{'id': i, 'v': 2} for i in range(10)])
+            self.assertFalse(any(path.exists(path.join(self.folder, name)) for name in segments if name != INDEX_FILE))
+            self.assertListEqual(list(store), [{'id': i, 'v': 2} for i in range(10)])
@@ -0,0 +1,98 @@
+from tempfile import TemporaryDirectory
+from math import ceil
+import random
+
+from core.utilities.decorators import time_execution
+from core.utilities.funcs import load_json_file
+from core.utilities.timing import Histogram, TimingRegistry
+from test.helpers.extension_classes import ExtendedTestCase
+
+
+class TestHistogram(ExtendedTestCase):
+    PERCENTILES = (0.1, 1, 10, 25, 50, 75, 90, 95, 99, 99.9, 100)
+
+    def assertPercentilesAccurate(self, values: list[int], rel_tol: float):
+        hist = Histogram()
+        for value in values:
+            hist.record(value)
+        reference = sorted(values)
+        for pct in self.PERCENTILES:
+            with self.subTest(pct=pct):
+                expected = reference[max(1, ceil(len(reference) * pct / 100)) - 1]
+                self.assertLessEqual(abs(hist.percentile(pct) - expected), expected * rel_tol)
+
+    def test_exact_stats(self):
+        hist = Histogram()
+        self.assertEqual(hist.percentile(50), 0)
+        self.assertEqual(hist.mean, 0.0)
+        for value in (300, 100, 200, -5):
+            hist.record(value)
+        self.assertEqual((hist.count, hist.total, hist.min, hist.max), (4, 600, 0, 300))
+        self.assertEqual(hist.mean, 150.0)
+        self.assertEqual(hist.percentile(0), 0)
+        self.assertAlmostEqual(hist.percentile(100), 300, delta=300 / 32)
+
+    def test_small_values_exact(self):
+        self.assertPercentilesAccurate([random.Random(0).randrange(16) for _ in range(1000)], 0)
+
+    def test_percentiles_accurate(self):
+        rng = random.Random(1)
+        # Each bucket is at most 1/16th of its values wide, so its midpoint is within 1/32nd of them.
+        for name, values in (('uniform', [rng.randrange(10 ** 6) for _ in range(10000)]),
+                             ('log-uniform', [int(10 ** rng.uniform(1, 10)) for _ in range(10000)]),
+                             ('heavy tail', [int(rng.paretovariate(1.2) * 1000) for _ in range(10000)])):
+            with self.subTest(name):
+                self.assertPercentilesAccurate(values, 1 / 32)
+
+    def test_summary(self):
+        hist = Histogram()
+        for value in range(1, 101):
+            hist.record(value * 1000)
+        summary = hist.summary()
+        self.assertEqual((summary['count'], summary['min_ns'], summary['max_ns']), (100, 1000, 100000))
+        self.assertEqual(summary['mean_ns'], 50500.0)
+        for key, expected in (('p50_ns', 50000), ('p95_ns', 95000), ('p99_ns', 99000)):
+            self.assertAlmostEqual(summary[key], expected, delta=expected / 32)
+
+
+class TestTimingRegistry(ExtendedTestCase):
+    def setUp(self):
+        self.registry = TimingRegistry()
+
+    def test_record_and_snapshot(self):
+        self.registry.record('b', 200)
+        self.registry.record('a', 100)
+        self.registry.record('b', 400)
+        self.assertIs(self.registry.histogram('b'), self.registry.histogram('b'))
+        snapshot = self.registry.snapshot()
+        self.assertListEqual(list(snapshot), ['a', 'b'])
+        self.assertEqual((snapshot['b']['count'], snapshot['b']['mean_ns']), (2, 300.0))
+
+        self.registry.reset()
+        self.assertDictEqual(self.registry.snapshot(), {})
+
+    def test_save(self):
+        self.registry.record('a', 100)
+        with TemporaryDirectory() as folder:
+            self.assertTrue(self.registry.save(folder, 'timings.json'))
+            self.assertDictEqual(load_json_file(folder, 'timings.json'), self.registry.snapshot())
+
+    def test_log_summary(self):
+        self.registry.record('a', 2_000_000)
+        with self.assertLogs(level='INFO') as logs:
+            self.registry.log_summary(20)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('a: n=1 mean=2.000ms', logs.output[0])
+
+    def test_time_execution(self):
+        @time_execution(registry=self.registry)
+        def call(x):
+            return x
+
+        self.assertListEqual([call(i) for i in range(5)], list(range(5)))
+        name = f'{call.__module__}.{call.__qualname__}'
+        self.assertEqual(self.registry.histogram(name).count, 5)
+
+        sampled = time_execution(registry=self.registry, sample_rate=0.0)(lambda: None)
+        sampled()
+        self.assertListEqual(list(self.registry.snapshot()), [name])